@@ -0,0 +1,251 @@
+# Throughput/latency benchmark for ingest and search against the fake Gemini
+# server and a seeded pgvector fixture (see benchmarks/pg_fixture.py for the
+# Postgres setup). Each table size runs in its own process, so peak RSS is
+# per size.
+#
+#   python -m benchmarks.bench --rows 1000,100000,1000000 --json results.json
+#   python -m benchmarks.bench --rows 1000 --baseline results.json   # fail on regressions
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+# Fails the run when p95 latency or throughput is this much worse than baseline
+REGRESSION_TOLERANCE = 0.2
+
+def _peak_rss_mb():
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def measure(name, fn, inputs, workers=1):
+    # Runs fn over inputs and summarises latency per call and throughput
+    latencies, errors = [], 0
+
+    def call(arg):
+        start = time.perf_counter()
+        try:
+            fn(arg)
+            return time.perf_counter() - start, None
+        except Exception as e:
+            return time.perf_counter() - start, e
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for seconds, error in pool.map(call, inputs):
+            latencies.append(seconds)
+            if error is not None:
+                errors += 1
+                if errors == 1:
+                    print(f"⚠️ {name}: {error}")
+    wall = time.perf_counter() - start
+    lat = np.asarray(latencies) * 1000
+    result = {
+        "op": name,
+        "calls": len(latencies),
+        "errors": errors,
+        "p50_ms": float(np.percentile(lat, 50)) if len(lat) else 0.0,
+        "p95_ms": float(np.percentile(lat, 95)) if len(lat) else 0.0,
+        "p99_ms": float(np.percentile(lat, 99)) if len(lat) else 0.0,
+        "throughput_per_s": len(latencies) / wall if wall else 0.0,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+    print(f"  {name:<22} p50 {result['p50_ms']:8.1f}ms  p95 {result['p95_ms']:8.1f}ms  "
+          f"p99 {result['p99_ms']:8.1f}ms  {result['throughput_per_s']:8.1f}/s  "
+          f"rss {result['peak_rss_mb']:.0f}MB  errors {errors}")
+    return result
+
+def run_single(args):
+    # One table size, in this process. The environment has to be set up
+    # before utils.config is imported.
+    from benchmarks.fake_gemini import start_fake_gemini
+    from benchmarks.pg_fixture import bench_env, seed, seeded_rows
+
+    os.environ.update(bench_env(args.rows))
+    os.environ["PG_VECTOR_DIMS"] = str(args.dims)
+    os.environ.setdefault("API_KEY", "bench")
+    if args.gemini_url:
+        os.environ["GEMINI_BASE_URL"] = args.gemini_url
+    else:
+        _, url = start_fake_gemini(
+            generate_latency_ms=args.generate_latency_ms, embed_latency_ms=args.embed_latency_ms,
+            error_rate=args.error_rate, rate_429=args.rate_429, dims=args.dims,
+        )
+        os.environ["GEMINI_BASE_URL"] = url
+
+    from utils.meta_extract import extract_video_metadata
+    from utils.embedding import get_gemini_embedding, get_gemini_embeddings
+    from utils.database import (
+        save_videos_bulk, save_metadata_pg, save_embedding_pg, search_similar_videos, search_fused
+    )
+
+    results = {"rows": args.rows, "dims": args.dims, "ops": []}
+    print(f"\n=== {args.rows} rows, {args.dims} dims ===")
+    if not args.no_db and (args.reseed or seeded_rows(args.rows) is None):
+        results.update(seed(args.rows, args.dims, with_parts=args.with_parts))
+        print(f"  seeded in {results['load_seconds']:.1f}s + {results['index_seconds']:.1f}s indexes")
+    ops = results["ops"]
+
+    # ---- ingest ----
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(args.videos):
+            path = os.path.join(tmp, f"bench_video_{i}.mp4")
+            with open(path, "wb") as f:
+                f.write(os.urandom(args.video_kb * 1024))
+            paths.append(path)
+        ops.append(measure("extract_metadata", lambda p: extract_video_metadata(
+            p, os.path.basename(p), use_cache=False, preprocess=False), paths, args.workers))
+
+    texts = [f"benchmark summary {i}" for i in range(args.videos)]
+    ops.append(measure("embed_single", get_gemini_embedding, texts, args.workers))
+    batches = [texts[i:i + args.batch_size] for i in range(0, len(texts), args.batch_size)]
+    ops.append(measure("embed_batch", get_gemini_embeddings, batches))
+
+    if args.no_db:
+        results["peak_rss_mb"] = _peak_rss_mb()
+        return results
+
+    rng = np.random.default_rng(1)
+    from benchmarks.fake_gemini import fake_metadata
+
+    def synthetic(i, prefix):
+        vec = rng.standard_normal(args.dims).astype(np.float32)
+        name = f"{prefix}_{i}.mp4"
+        return name, vec / np.linalg.norm(vec), fake_metadata(name)
+
+    store_batches = [
+        [synthetic(i * args.batch_size + j, f"bench_new_{time.time_ns()}") for j in range(args.batch_size)]
+        for i in range(max(1, args.videos // args.batch_size))
+    ]
+    ops.append(measure("save_videos_bulk", save_videos_bulk, store_batches))
+    singles = [synthetic(i, f"bench_single_{time.time_ns()}") for i in range(args.videos)]
+
+    def store_single(item):
+        name, emb, meta = item
+        save_embedding_pg(name, emb, meta)
+        save_metadata_pg(name, meta)
+    ops.append(measure("save_single", store_single, singles, args.workers))
+
+    # ---- search ----
+    queries = rng.standard_normal((args.queries, args.dims)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    for recall in ("fast", "balanced", "accurate"):
+        ops.append(measure(f"search_{recall}", lambda q: search_similar_videos(q, 10, recall), queries, args.workers))
+    filters = {"qc_decision": ["ACCEPT", "MANUAL_REVIEW"], "tags": {"any": ["Villa", "Pool"]}}
+    ops.append(measure("search_filtered", lambda q: search_similar_videos(q, 10, "balanced", filters), queries, args.workers))
+    if args.with_parts:
+        ops.append(measure("search_fused", lambda q: search_fused(q, 10), queries, args.workers))
+
+    # ---- in-memory search (utils/memindex.py), with recall@10 against exact search ----
+    from utils.memindex import MemoryIndex, QUANTIZATIONS, recall_at_k
+    sample = queries[:min(len(queries), 50)]
+    exact = MemoryIndex("float32")
+    exact.sync()
+    truth = exact.search_batch(sample, 10)
+    for op in ops:
+        if op["op"].startswith("search_") and op["op"] not in ("search_filtered", "search_fused"):
+            recall = op["op"][len("search_"):]
+            op["recall_at_10"] = recall_at_k([search_similar_videos(q, 10, recall) for q in sample], truth)
+    for quantization in QUANTIZATIONS:
+        index = exact if quantization == "float32" else MemoryIndex(quantization)
+        if index is not exact:
+            index.sync()
+        op = measure(f"memory_{quantization}", lambda q: index.search(q, 10), queries, args.workers)
+        op["recall_at_10"] = recall_at_k(index.search_batch(sample, 10), truth)
+        ops.append(op)
+    ops.append(measure("memory_batched", lambda batch: exact.search_batch(batch, 10),
+                       [queries[i:i + 32] for i in range(0, len(queries), 32)]))
+    for op in ops:
+        if "recall_at_10" in op:
+            print(f"  {op['op']:<22} recall@10 {op['recall_at_10']:.3f}")
+
+    results["peak_rss_mb"] = _peak_rss_mb()
+    return results
+
+def compare(results, baseline):
+    # Returns a list of human-readable regressions
+    previous = {(r["rows"], op["op"]): op for r in baseline for op in r["ops"]}
+    regressions = []
+    for r in results:
+        for op in r["ops"]:
+            old = previous.get((r["rows"], op["op"]))
+            if old is None:
+                continue
+            if old["p95_ms"] and op["p95_ms"] > old["p95_ms"] * (1 + REGRESSION_TOLERANCE):
+                regressions.append(f"{r['rows']} rows {op['op']}: p95 {old['p95_ms']:.1f} → {op['p95_ms']:.1f}ms")
+            if op["throughput_per_s"] < old["throughput_per_s"] * (1 - REGRESSION_TOLERANCE):
+                regressions.append(f"{r['rows']} rows {op['op']}: throughput "
+                                   f"{old['throughput_per_s']:.1f} → {op['throughput_per_s']:.1f}/s")
+    return regressions
+
+def _strip_options(argv, names):
+    # argv without the given options (and their values)
+    kept, skip = [], False
+    for arg in argv:
+        if skip:
+            skip = False
+        elif arg in names:
+            skip = True
+        elif not arg.startswith(tuple(f"{n}=" for n in names)):
+            kept.append(arg)
+    return kept
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark ingest and search against fake Gemini + pgvector")
+    parser.add_argument("--rows", default="1000", help="comma-separated table sizes, e.g. 1000,100000,1000000")
+    parser.add_argument("--dims", type=int, default=int(os.getenv("PG_VECTOR_DIMS", "3072")))
+    parser.add_argument("--videos", type=int, default=50, help="videos per ingest benchmark")
+    parser.add_argument("--video-kb", type=int, default=512)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=25)
+    parser.add_argument("--with-parts", action="store_true", help="seed tag/transcript vectors and time fused search")
+    parser.add_argument("--no-db", action="store_true", help="only benchmark the Gemini calls")
+    parser.add_argument("--reseed", action="store_true", help="rebuild the fixture even if it exists")
+    parser.add_argument("--gemini-url", help="use an already running (fake) Gemini instead of starting one")
+    parser.add_argument("--generate-latency-ms", type=float, default=1500)
+    parser.add_argument("--embed-latency-ms", type=float, default=60)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="compare against an earlier --json file and exit 1 on regressions")
+    parser.add_argument("--single", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        args.rows = int(args.rows)
+        print("RESULT " + json.dumps(run_single(args)))
+        sys.exit(0)
+
+    results = []
+    passthrough = _strip_options(sys.argv[1:], ("--rows", "--json", "--baseline"))
+    for rows in [int(r) for r in args.rows.split(",") if r.strip()]:
+        cmd = [sys.executable, "-m", "benchmarks.bench", "--single", "--rows", str(rows), *passthrough]
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+        for line in proc.stdout:
+            if line.startswith("RESULT "):
+                results.append(json.loads(line[len("RESULT "):]))
+            else:
+                print(line, end="", flush=True)
+        if proc.wait() != 0:
+            print(f"❌ Benchmark for {rows} rows failed (exit {proc.returncode})")
+            sys.exit(proc.returncode)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Results written to {args.json}")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f))
+        for line in regressions:
+            print(f"❌ Regression: {line}")
+        if regressions:
+            sys.exit(1)
+        print("✅ No regressions against baseline")
@@ -0,0 +1,293 @@
+# Local stand-in for the parts of the Gemini API this app uses
+# (generateContent, streamGenerateContent, embedContent, batchEmbedContents
+# and the File API), with
+# configurable latency and failure rates. Embeddings and metadata are
+# deterministic functions of the request, so runs are comparable.
+#
+#   python -m benchmarks.fake_gemini --port 8765 --generate-latency-ms 1500 --rate-429 0.02
+#   GEMINI_BASE_URL=http://127.0.0.1:8765 streamlit run main.py
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+import numpy as np
+
+DEFAULTS = {
+    "generate_latency_ms": 1500.0,
+    "embed_latency_ms": 60.0,
+    "files_latency_ms": 30.0,
+    "jitter": 0.3,          # latency is uniform in ±jitter of the mean
+    "error_rate": 0.0,      # share of requests answered with a 500
+    "rate_429": 0.0,        # share answered with 429 + Retry-After
+    "retry_after": 1,
+    "dims": 3072,
+    "unsafe_rate": 0.0,       # share of videos whose metadata flags adult content
+    "stream_chunk_chars": 200,  # text per streamed event; the generate latency is spread over them
+}
+
+CHOICES = {
+    "category": ["Property", "Lifestyle", "Other"],
+    "is_real_estate_related": ["Yes", "Yes", "No"],
+    "main_topic_category": ["Real Estate", "Lifestyle", "Travel"],
+    "uae_related": ["Yes", "Yes", "No"],
+    "uae_sentiment": ["Positive", "Neutral", "Negative"],
+    "property_type": ["Villa", "Apartment", "Townhouse", "Penthouse"],
+    "location": ["Dubai Marina", "Downtown Dubai", "Abu Dhabi", "Sharjah", "Palm Jumeirah"],
+    "clarity_of_speech": ["Clear", "Clear", "Muffled"],
+    "volume_balance": ["Balanced", "Music-dominant"],
+    "mood_of_visuals": ["Bright and Modern", "Luxury", "Dark"],
+    "lifestyle_emphasis": ["Luxury Family Living", "Urban", ""],
+    "subtitles_present": ["Yes", "No"],
+    "technical_glitches": ["None", "None", "Minor", "Severe"],
+    "event_driven": ["No", "No", "Yes"],
+    "ai_generated_extent": ["None", "None", "Partial"],
+}
+TAGS = ["Dubai", "Luxury", "Villa", "Pool", "Sea View", "Modern", "Family", "Investment", "Garden", "Gym"]
+ROOMS = ["Living Room", "Kitchen", "Bedroom", "Bathroom", "Terrace", "Balcony"]
+
+def _seed(*parts):
+    return int.from_bytes(hashlib.sha256("|".join(map(str, parts)).encode("utf-8")).digest()[:8], "big")
+
+def fake_embedding(text, dims=DEFAULTS["dims"]):
+    # Unit vector seeded by the text: same text, same embedding
+    vec = np.random.default_rng(_seed(text)).standard_normal(dims).astype(np.float32)
+    return vec / np.linalg.norm(vec)
+
+SAFETY_FIELDS = [
+    f"{category}_{suffix}"
+    for category in ["adult_content", "violence", "substance_use", "hate_speech", "disturbing_content"]
+    for suffix in ["presence", "type"]
+]
+
+def fake_metadata(key, unsafe_rate=0.0):
+    rng = random.Random(_seed(key))
+    unsafe = rng.random() < unsafe_rate
+    meta = {field: rng.choice(values) for field, values in CHOICES.items()}
+    meta.update({
+        "title": f"{meta['property_type']} in {meta['location']}",
+        "tags": rng.sample(TAGS, 4),
+        "rooms_shown": rng.sample(ROOMS, rng.randint(0, 4)),
+        "summary": f"A {meta['property_type'].lower()} tour in {meta['location']} ({key[:8]}).",
+        "transcript": f"Welcome to this {meta['property_type'].lower()} in {meta['location']}.",
+        "if_event_yes_time": "2030-01-01T18:00:00" if meta["event_driven"] == "Yes" else "",
+        "video_duration": f"{rng.randint(0, 3)}m {rng.randint(0, 59)}s",
+    })
+    # Safety fields first, in the order the prompt asks for
+    ordered = {field: [] if field.endswith("_type") else "No" for field in SAFETY_FIELDS}
+    if unsafe:
+        ordered.update({"adult_content_presence": "Yes", "adult_content_type": ["Nudity"]})
+    ordered.update(meta)
+    return ordered
+
+class FakeGeminiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = dict(DEFAULTS)
+    stats = {}
+    stats_lock = threading.Lock()
+    files = {}
+
+    def log_message(self, *args):
+        pass
+
+    # ---------------- plumbing ----------------
+    def _count(self, route, status):
+        with self.stats_lock:
+            key = f"{route}:{status}"
+            self.stats[key] = self.stats.get(key, 0) + 1
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send(self, status, payload=None, headers=None):
+        body = json.dumps(payload if payload is not None else {}).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _simulate(self, route, latency_key, scale=1.0):
+        # Sleeps for the configured latency (times `scale`); returns False
+        # (after replying) if this request was picked to fail
+        cfg = self.config
+        jitter = cfg["jitter"]
+        if latency_key:
+            time.sleep(cfg[latency_key] * scale / 1000 * random.uniform(1 - jitter, 1 + jitter))
+        roll = random.random()
+        if roll < cfg["rate_429"]:
+            self._count(route, 429)
+            self._send(429, {"error": {"code": 429, "status": "RESOURCE_EXHAUSTED", "message": "Fake quota exceeded"}},
+                       {"Retry-After": str(cfg["retry_after"])})
+            return False
+        if roll < cfg["rate_429"] + cfg["error_rate"]:
+            self._count(route, 500)
+            self._send(500, {"error": {"code": 500, "status": "INTERNAL", "message": "Fake server error"}})
+            return False
+        return True
+
+    def _base_url(self):
+        return f"http://{self.headers.get('Host')}"
+
+    def _generated_text(self, body):
+        # Answers only the fields the prompt asks for, so a short triage prompt
+        # gets a short answer; returns (text, share of the full answer's size)
+        parts = json.loads(body)["contents"][0]["parts"]
+        video = next((p for p in parts if "inlineData" in p or "fileData" in p), {})
+        prompt = "".join(p.get("text", "") for p in parts)
+        key = hashlib.sha256(json.dumps(video, sort_keys=True).encode("utf-8")).hexdigest()
+        meta = fake_metadata(key, self.config["unsafe_rate"])
+        full = json.dumps(meta, indent=2)
+        asked = {field: value for field, value in meta.items() if f'"{field}"' in prompt} or meta
+        text = json.dumps(asked, indent=2)
+        return "```json\n" + text + "\n```", len(text) / len(full)
+
+    def _stream_generate(self, body):
+        # Server-sent events, one text delta each; a client that hangs up
+        # stops the generation (counted as stream:cancelled)
+        cfg = self.config
+        if not self._simulate("stream", None):
+            return
+        text, scale = self._generated_text(body)
+        size = max(1, int(cfg["stream_chunk_chars"]))
+        chunks = [text[i:i + size] for i in range(0, len(text), size)]
+        delay = cfg["generate_latency_ms"] * scale / 1000 / len(chunks)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        sent = 0
+        try:
+            for i, chunk in enumerate(chunks):
+                time.sleep(delay * random.uniform(1 - cfg["jitter"], 1 + cfg["jitter"]))
+                event = {"candidates": [{"content": {"parts": [{"text": chunk}], "role": "model"}}]}
+                if i == len(chunks) - 1:
+                    event["candidates"][0]["finishReason"] = "STOP"
+                    event["usageMetadata"] = {"promptTokenCount": len(body) // 4, "candidatesTokenCount": len(text) // 4}
+                self.wfile.write(f"data: {json.dumps(event)}\r\n\r\n".encode("utf-8"))
+                self.wfile.flush()
+                sent += len(chunk)
+        except (BrokenPipeError, ConnectionResetError):
+            self._count("stream", "cancelled")
+        else:
+            self._count("stream", 200)
+        with self.stats_lock:
+            self.stats["stream_chars"] = self.stats.get("stream_chars", 0) + sent
+
+    # ---------------- routes ----------------
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == "/stats":
+            with self.stats_lock:
+                return self._send(200, dict(self.stats))
+        match = re.fullmatch(r"/v1beta/(files/[\w-]+)", path)
+        if match and match.group(1) in self.files:
+            if self._simulate("files.get", "files_latency_ms"):
+                self._count("files.get", 200)
+                self._send(200, self.files[match.group(1)])
+            return
+        self._send(404, {"error": {"code": 404, "message": f"Unknown path {path}"}})
+
+    def do_DELETE(self):
+        path = urlparse(self.path).path
+        match = re.fullmatch(r"/v1beta/(files/[\w-]+)", path)
+        if match:
+            self.files.pop(match.group(1), None)
+            self._count("files.delete", 200)
+            return self._send(200, {})
+        self._send(404, {"error": {"code": 404, "message": f"Unknown path {path}"}})
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        body = self._body()
+
+        if path.endswith(":streamGenerateContent"):
+            return self._stream_generate(body)
+
+        if path.endswith(":generateContent"):
+            # Generation time follows the length of the answer
+            text, scale = self._generated_text(body)
+            if not self._simulate("generate", "generate_latency_ms", scale):
+                return
+            self._count("generate", 200)
+            return self._send(200, {
+                "candidates": [{"content": {"parts": [{"text": text}], "role": "model"}, "finishReason": "STOP"}],
+                "usageMetadata": {"promptTokenCount": len(body) // 4, "candidatesTokenCount": len(text) // 4},
+            })
+
+        if path.endswith(":batchEmbedContents"):
+            if not self._simulate("batch_embed", "embed_latency_ms"):
+                return
+            requests_ = json.loads(body)["requests"]
+            self._count("batch_embed", 200)
+            return self._send(200, {"embeddings": [
+                {"values": fake_embedding(r["content"]["parts"][0]["text"], self.config["dims"]).tolist()}
+                for r in requests_
+            ]})
+
+        if path.endswith(":embedContent"):
+            if not self._simulate("embed", "embed_latency_ms"):
+                return
+            text = json.loads(body)["content"]["parts"][0]["text"]
+            self._count("embed", 200)
+            return self._send(200, {"embedding": {"values": fake_embedding(text, self.config["dims"]).tolist()}})
+
+        if path == "/upload/v1beta/files":
+            if not self._simulate("files.start", "files_latency_ms"):
+                return
+            session = uuid.uuid4().hex
+            self._count("files.start", 200)
+            return self._send(200, {}, {"X-Goog-Upload-URL": f"{self._base_url()}/upload/v1beta/files/sessions/{session}"})
+
+        if path.startswith("/upload/v1beta/files/sessions/"):
+            if not self._simulate("files.upload", "files_latency_ms"):
+                return
+            self._count("files.upload", 200)
+            if "finalize" not in (self.headers.get("X-Goog-Upload-Command") or ""):
+                return self._send(200, {})
+            name = f"files/{uuid.uuid4().hex[:12]}"
+            file = {"name": name, "uri": f"{self._base_url()}/v1beta/{name}", "mimeType": "video/mp4", "state": "ACTIVE"}
+            self.files[name] = file
+            return self._send(200, {"file": file})
+
+        self._send(404, {"error": {"code": 404, "message": f"Unknown path {path}"}})
+
+def start_fake_gemini(host="127.0.0.1", port=0, **config):
+    # Starts the server on a background thread; returns (server, base_url)
+    handler = type("Handler", (FakeGeminiHandler,), {
+        "config": {**DEFAULTS, **config}, "stats": {}, "files": {}, "stats_lock": threading.Lock(),
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+def server_stats(server):
+    handler = server.RequestHandlerClass
+    with handler.stats_lock:
+        return dict(handler.stats)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Gemini API server for local benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    for key, value in DEFAULTS.items():
+        parser.add_argument(f"--{key.replace('_', '-')}", type=type(value), default=value)
+    args = vars(parser.parse_args())
+    host, port = args.pop("host"), args.pop("port")
+
+    server, url = start_fake_gemini(host, port, **args)
+    print(f"✅ Fake Gemini listening on {url} (set GEMINI_BASE_URL={url})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
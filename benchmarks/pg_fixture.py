@@ -0,0 +1,190 @@
+# Seeds a scratch schema in a local Postgres + pgvector with N synthetic videos
+# (embeddings, typed metadata and, optionally, tag/transcript vectors), then
+# builds the same indexes production uses. For example:
+#
+#   docker run -d -p 5433:5432 -e POSTGRES_PASSWORD=bench pgvector/pgvector:pg16
+#   PG_HOST=localhost PG_PORT=5433 PG_DBNAME=postgres PG_USER=postgres PG_PASSWORD=bench \
+#       python -m benchmarks.pg_fixture --rows 100000
+#
+# Everything lives in schema qc_bench_<rows>; utils/* is pointed at it through
+# PG_OPTIONS="-c search_path=qc_bench_<rows>,public" (see bench_env).
+import argparse
+import io
+import json
+import os
+import time
+import numpy as np
+
+SEED_CHUNK = 5000
+
+def bench_schema(rows):
+    return f"qc_bench_{int(rows)}"
+
+def bench_env(rows):
+    # Must be applied before anything from utils is imported
+    return {"PG_OPTIONS": f"-c search_path={bench_schema(rows)},public"}
+
+def _raw_connection():
+    import psycopg2
+    from utils.config import PG_CONN
+    return psycopg2.connect(**{k: v for k, v in PG_CONN.items() if k != "options"})
+
+def _copy_rows(cur, table, columns, lines):
+    buf = io.StringIO("".join(lines))
+    cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", buf)
+
+def _copy_text(value):
+    # COPY text format escaping
+    if value is None:
+        return "\\N"
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+def _pg_array(values):
+    return "{" + ",".join('"' + str(v).replace("\\", "\\\\").replace('"', '\\"') + '"' for v in values) + "}"
+
+def _vector_text(fmt, row):
+    return fmt % tuple(row.tolist())
+
+def _create_tables(cur, schema, dims):
+    from utils.database import METADATA_COLUMNS, BOOL_FIELDS, ARRAY_FIELDS
+
+    def column_type(col):
+        if col in BOOL_FIELDS:
+            return "BOOLEAN"
+        if col in ARRAY_FIELDS:
+            return "TEXT[]"
+        if col == "created_at":
+            return "TIMESTAMP"
+        return "TEXT"
+
+    cur.execute("CREATE EXTENSION IF NOT EXISTS vector")
+    cur.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+    cur.execute(f"CREATE SCHEMA {schema}")
+    cur.execute(f"""
+        CREATE TABLE {schema}.video_embeddings (
+            id BIGSERIAL PRIMARY KEY,
+            video_name TEXT NOT NULL,
+            embedding vector({int(dims)}) NOT NULL,
+            metadata JSONB
+        )
+    """)
+    cur.execute(f"""
+        CREATE TABLE {schema}.video_metadata (
+            id BIGSERIAL PRIMARY KEY,
+            {", ".join(f"{col} {column_type(col)}" for col in METADATA_COLUMNS)}
+        )
+    """)
+
+def seed(rows, dims, with_parts=False, seed_value=0):
+    # Returns the seconds spent loading rows and building indexes
+    from benchmarks.fake_gemini import fake_metadata
+    from utils.database import METADATA_COLUMNS, _metadata_row
+    from utils.qc_batch import qc_score_batch
+    from utils.schema import (
+        PART_KINDS, create_ann_index, create_dedup_table, create_filter_indexes,
+        create_parts_table, create_rescore_columns,
+    )
+
+    schema = bench_schema(rows)
+    rng = np.random.default_rng(seed_value)
+    fmt = "[" + ",".join(["%.7g"] * dims) + "]"
+    start = time.perf_counter()
+
+    conn = _raw_connection()
+    try:
+        with conn.cursor() as cur:
+            _create_tables(cur, schema, dims)
+            conn.commit()
+            for offset in range(0, rows, SEED_CHUNK):
+                n = min(SEED_CHUNK, rows - offset)
+                vectors = rng.standard_normal((n, dims)).astype(np.float32)
+                vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+                emb_lines, meta_lines = [], []
+                names = [f"bench_{offset + i:07d}.mp4" for i in range(n)]
+                metas = [fake_metadata(name) for name in names]
+                for meta, result in zip(metas, qc_score_batch(metas)):
+                    meta.update(result)
+                for i, (name, meta) in enumerate(zip(names, metas)):
+                    emb_lines.append(f"{name}\t{_vector_text(fmt, vectors[i])}\t{_copy_text(json.dumps(meta))}\n")
+                    values = _metadata_row(METADATA_COLUMNS, name, meta)
+                    meta_lines.append("\t".join(
+                        _copy_text(_pg_array(v) if isinstance(v, list) else v) for v in values
+                    ) + "\n")
+                _copy_rows(cur, f"{schema}.video_embeddings", ["video_name", "embedding", "metadata"], emb_lines)
+                _copy_rows(cur, f"{schema}.video_metadata", METADATA_COLUMNS, meta_lines)
+                conn.commit()
+                print(f"… seeded {offset + n}/{rows} videos")
+    finally:
+        conn.close()
+    load_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    create_ann_index()
+    create_filter_indexes()
+    create_dedup_table()
+    create_rescore_columns()
+    if with_parts:
+        _seed_parts(schema, rows, dims, fmt, rng, PART_KINDS)
+        create_parts_table()
+    index_seconds = time.perf_counter() - start
+
+    conn = _raw_connection()
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute(f"ANALYZE {schema}.video_embeddings")
+        cur.execute(f"ANALYZE {schema}.video_metadata")
+    conn.close()
+    return {"load_seconds": load_seconds, "index_seconds": index_seconds}
+
+def _seed_parts(schema, rows, dims, fmt, rng, kinds):
+    conn = _raw_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"""
+                CREATE TABLE IF NOT EXISTS {schema}.video_embedding_parts (
+                    video_name TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    embedding vector({int(dims)}) NOT NULL,
+                    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                    PRIMARY KEY (video_name, kind)
+                )
+            """)
+            for kind in kinds:
+                for offset in range(0, rows, SEED_CHUNK):
+                    n = min(SEED_CHUNK, rows - offset)
+                    vectors = rng.standard_normal((n, dims)).astype(np.float32)
+                    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+                    lines = [
+                        f"bench_{offset + i:07d}.mp4\t{kind}\t{_vector_text(fmt, vectors[i])}\n"
+                        for i in range(n)
+                    ]
+                    _copy_rows(cur, f"{schema}.video_embedding_parts", ["video_name", "kind", "embedding"], lines)
+                    conn.commit()
+    finally:
+        conn.close()
+
+def seeded_rows(rows):
+    # Row count of an existing fixture, or None if there is none
+    conn = _raw_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT to_regclass(%s)", (f"{bench_schema(rows)}.video_embeddings",))
+            if cur.fetchone()[0] is None:
+                return None
+            cur.execute(f"SELECT count(*) FROM {bench_schema(rows)}.video_embeddings")
+            return cur.fetchone()[0]
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed a pgvector benchmark fixture")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--dims", type=int, default=int(os.getenv("PG_VECTOR_DIMS", "3072")))
+    parser.add_argument("--with-parts", action="store_true", help="also seed tag/transcript vectors")
+    args = parser.parse_args()
+
+    os.environ.update(bench_env(args.rows))
+    os.environ["PG_VECTOR_DIMS"] = str(args.dims)
+    timings = seed(args.rows, args.dims, args.with_parts)
+    print(f"✅ Seeded {bench_schema(args.rows)}: {args.rows} videos "
+          f"(load {timings['load_seconds']:.1f}s, indexes {timings['index_seconds']:.1f}s)")
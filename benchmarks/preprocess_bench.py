@@ -0,0 +1,84 @@
+# Compares sending original videos to Gemini against the downscale and
+# keyframe preprocessing modes: bytes sent, latency and how closely the
+# extracted metadata agrees with the full-resolution result.
+#
+#   python -m benchmarks.preprocess_bench video1.mp4 video2.mp4 ...
+import argparse
+import os
+import time
+from utils.meta_extract import _request_metadata
+from utils.preprocess import preprocess_video
+
+MODES = ["off", "downscale", "keyframes"]
+
+# Free-text and per-run fields that are expected to differ
+IGNORED_FIELDS = {"title", "summary", "first_5s_focus", "uploaded_by", "created_at", "speakers"}
+
+def _normalize(value):
+    if isinstance(value, list):
+        return frozenset(str(v).strip().lower() for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, str(v).strip().lower()) for k, v in value.items()))
+    return str(value).strip().lower()
+
+def agreement(reference: dict, candidate: dict):
+    fields = [k for k in reference if k not in IGNORED_FIELDS]
+    if not fields:
+        return 0.0
+    score = 0.0
+    for field in fields:
+        a, b = _normalize(reference.get(field)), _normalize(candidate.get(field))
+        if isinstance(a, frozenset) and isinstance(b, frozenset):
+            score += len(a & b) / len(a | b) if a | b else 1.0
+        else:
+            score += float(a == b)
+    return score / len(fields)
+
+def run(paths):
+    rows = []
+    for path in paths:
+        name = os.path.basename(path)
+        reference = None
+        for mode in MODES:
+            start = time.perf_counter()
+            send_path = preprocess_video(path, mode)
+            prep_time = time.perf_counter() - start
+            sent_bytes = os.path.getsize(send_path)
+
+            start = time.perf_counter()
+            metadata, error = _request_metadata(send_path, name)
+            gemini_time = time.perf_counter() - start
+            if send_path != path:
+                os.remove(send_path)
+
+            if error is not None:
+                print(f"❌ {name} [{mode}]: {error['summary']}")
+                continue
+            if mode == "off":
+                reference = metadata
+            rows.append({
+                "video": name,
+                "mode": mode,
+                "bytes": sent_bytes,
+                "preprocess_s": prep_time,
+                "gemini_s": gemini_time,
+                "agreement": agreement(reference, metadata) if reference else float("nan"),
+            })
+    return rows
+
+def print_report(rows):
+    print(f"{'video':30} {'mode':10} {'MB sent':>9} {'prep s':>8} {'gemini s':>9} {'agree':>7}")
+    for r in rows:
+        print(f"{r['video'][:30]:30} {r['mode']:10} {r['bytes'] / 1e6:9.2f} "
+              f"{r['preprocess_s']:8.2f} {r['gemini_s']:9.2f} {r['agreement']:7.1%}")
+    for mode in MODES:
+        subset = [r for r in rows if r["mode"] == mode]
+        if subset:
+            print(f"{'TOTAL':30} {mode:10} {sum(r['bytes'] for r in subset) / 1e6:9.2f} "
+                  f"{sum(r['preprocess_s'] for r in subset):8.2f} {sum(r['gemini_s'] for r in subset):9.2f} "
+                  f"{sum(r['agreement'] for r in subset) / len(subset):7.1%}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark video preprocessing modes against Gemini")
+    parser.add_argument("videos", nargs="+")
+    print_report(run(parser.parse_args().videos))
@@ -0,0 +1,224 @@
+# Headless bulk ingestion: extract → QC → embed → store for a directory of
+# videos or a manifest, without the Streamlit uploader.
+#
+#   python ingest.py videos/ --workers 8
+#   python ingest.py manifest.jsonl --checkpoint runs/march.jsonl
+#
+# A manifest is either a text file with one video path per line or a JSONL
+# file of {"path": ..., "video_name": ...} objects. Every finished video is
+# appended to the checkpoint file, so re-running the same command resumes
+# where the last run stopped (metadata already extracted by an interrupted
+# run comes back from the local cache).
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import numpy as np
+from utils.pipeline import analyze_video
+from utils.embedding import embed_videos
+from utils.database import save_videos_bulk, save_embedding_parts
+from utils.dedup import save_signatures_pg
+from utils.meta_extract import extraction_report, format_extraction_report
+from utils.metrics import start_metrics_server
+from utils.config import ANALYSIS_WORKERS, INGEST_BATCH_SIZE, INGEST_CHECKPOINT_PATH, METRICS_PORT
+
+VIDEO_EXTENSIONS = {".mp4", ".mov", ".avi"}
+
+def list_videos(source):
+    # [(video_name, path)] from a directory (recursive) or a manifest file
+    if os.path.isdir(source):
+        paths = [
+            os.path.join(root, f)
+            for root, _, files in os.walk(source)
+            for f in sorted(files)
+            if os.path.splitext(f)[1].lower() in VIDEO_EXTENSIONS
+        ]
+        entries = [(os.path.basename(p), p) for p in sorted(paths)]
+    else:
+        base = os.path.dirname(os.path.abspath(source))
+        entries = []
+        with open(source, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                if line.startswith("{"):
+                    entry = json.loads(line)
+                    path = entry["path"]
+                    name = entry.get("video_name") or os.path.basename(path)
+                else:
+                    path, name = line, os.path.basename(line)
+                entries.append((name, os.path.join(base, path)))
+
+    videos, seen = [], set()
+    for name, path in entries:
+        if name in seen:
+            print(f"⚠️ Skipping {path}: another video is already named {name}")
+            continue
+        seen.add(name)
+        videos.append((name, path))
+    return videos
+
+def load_checkpoint(path, retry_failed=False):
+    # Names already handled by an earlier run (last status wins)
+    done = {}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # torn last line from an interrupted run
+                done[entry["video_name"]] = entry["status"]
+    return {name for name, status in done.items() if status != "failed" or not retry_failed}
+
+class Checkpoint:
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.file = open(path, "a", encoding="utf-8")
+
+    def record(self, entries):
+        for entry in entries:
+            self.file.write(json.dumps(entry) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+def store_batch(batch, stats):
+    # batch: [(video_name, metadata)] of analysed, non-duplicate videos.
+    # Returns {video_name: error} for videos that were not stored.
+    embeddings, seconds = _timed(embed_videos, batch)
+    stats["embed"].extend([seconds / len(batch)] * len(batch))
+
+    start = time.perf_counter()
+    failures = save_videos_bulk(
+        (name, embs.get("summary"), metadata) for (name, metadata), embs in zip(batch, embeddings)
+    )
+    stored = [(name, metadata, embs) for (name, metadata), embs in zip(batch, embeddings) if name not in failures]
+    try:
+        save_embedding_parts(
+            (name, kind, emb) for name, _, embs in stored for kind, emb in embs.items() if kind != "summary"
+        )
+        save_signatures_pg((name, metadata.get("video_signature")) for name, metadata, _ in stored)
+    except Exception as e:
+        print(f"⚠️ Stored videos but not their extra embeddings/signatures: {e}")
+    seconds = time.perf_counter() - start
+    stats["store"].extend([seconds / len(batch)] * len(batch))
+    return failures
+
+def _latency(values):
+    if not values:
+        return "-"
+    values = np.asarray(values)
+    return f"avg {values.mean():.2f}s  p50 {np.percentile(values, 50):.2f}s  p95 {np.percentile(values, 95):.2f}s"
+
+def print_summary(stats, elapsed):
+    processed = sum(stats["status"].values())
+    print("\n---------------- INGEST SUMMARY ----------------")
+    print(f"Videos: {processed} in {elapsed:.1f}s  " + "  ".join(f"{k}={v}" for k, v in sorted(stats["status"].items())))
+    print(f"Throughput: {processed / elapsed * 60 if elapsed else 0:.1f} videos/min, "
+          f"{stats['bytes'] / elapsed / 1e6 if elapsed else 0:.2f} MB/s")
+    for stage in ("analyze", "embed", "store"):
+        print(f"{stage:>8}: {_latency(stats[stage])}")
+    report = extraction_report(stats["extraction"])
+    if report["videos"]:
+        print(format_extraction_report(report))
+
+def ingest(source, workers=ANALYSIS_WORKERS, batch_size=INGEST_BATCH_SIZE,
+           checkpoint_path=INGEST_CHECKPOINT_PATH, retry_failed=False):
+    videos = list_videos(source)
+    done = load_checkpoint(checkpoint_path, retry_failed)
+    pending = [(name, path) for name, path in videos if name not in done]
+    print(f"Found {len(videos)} videos, {len(videos) - len(pending)} already done, {len(pending)} to ingest")
+
+    stats = {"analyze": [], "embed": [], "store": [], "bytes": 0, "status": {}, "extraction": []}
+    checkpoint = Checkpoint(checkpoint_path)
+    start = time.perf_counter()
+
+    def finish(entries):
+        checkpoint.record(entries)
+        for entry in entries:
+            stats["status"][entry["status"]] = stats["status"].get(entry["status"], 0) + 1
+            if entry["status"] == "failed":
+                print(f"❌ {entry['video_name']}: {entry['error']}")
+
+    def flush(batch):
+        if not batch:
+            return
+        try:
+            failures = store_batch(batch, stats)
+        except Exception as e:
+            failures = {name: str(e) for name, _ in batch}
+        finish([
+            {"video_name": name, "status": "failed", "stage": "store", "error": failures[name]}
+            if name in failures else
+            {"video_name": name, "status": "stored", "qc_decision": metadata.get("qc_decision")}
+            for name, metadata in batch
+        ])
+        batch.clear()
+
+    # Only a bounded number of videos is in flight at a time; analysed results
+    # are stored in batches from this thread while the workers keep going.
+    batch = []
+    queue = iter(pending)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        in_flight = {}
+
+        def submit_next():
+            for name, path in queue:
+                in_flight[pool.submit(_timed, analyze_video, path, name)] = (name, path)
+                return
+
+        for _ in range(workers * 2):
+            submit_next()
+        while in_flight:
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name, path = in_flight.pop(future)
+                submit_next()
+                try:
+                    metadata, seconds = future.result()
+                except Exception as e:
+                    finish([{"video_name": name, "status": "failed", "stage": "analyze", "error": str(e)}])
+                    continue
+                stats["analyze"].append(seconds)
+                stats["bytes"] += os.path.getsize(path)
+                stats["extraction"].append({"extraction": metadata.get("extraction")})
+                if "error" in metadata:
+                    # Extraction failed; keep it retryable rather than storing a placeholder
+                    message = metadata["error"].get("message", "Metadata extraction failed")
+                    finish([{"video_name": name, "status": "failed", "stage": "analyze", "error": message}])
+                    continue
+                if metadata.get("qc_decision") == "DUPLICATE":
+                    finish([{"video_name": name, "status": "duplicate", "duplicate_of": metadata.get("duplicate_of")}])
+                    continue
+                batch.append((name, metadata))
+                if len(batch) >= batch_size:
+                    flush(batch)
+        flush(batch)
+
+    checkpoint.close()
+    elapsed = time.perf_counter() - start
+    print_summary(stats, elapsed)
+    return stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest a directory or manifest of videos")
+    parser.add_argument("source", help="directory of videos, or a manifest (.txt paths or .jsonl objects)")
+    parser.add_argument("--workers", type=int, default=ANALYSIS_WORKERS, help="videos analysed concurrently")
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE, help="videos embedded and stored per batch")
+    parser.add_argument("--checkpoint", default=INGEST_CHECKPOINT_PATH, help="JSONL progress file used to resume")
+    parser.add_argument("--retry-failed", action="store_true", help="retry videos that failed in an earlier run")
+    args = parser.parse_args()
+
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT)
+    ingest(args.source, args.workers, args.batch_size, args.checkpoint, args.retry_failed)
@@ -1,9 +1,15 @@
 import streamlit as st
+import os
+import shutil
 import tempfile
-from utils.meta_extract import extract_video_metadata
-from utils.embedding import get_gemini_embedding
-from utils.database import save_embedding_pg, save_metadata_pg
-from utils.qc import qc_score
+from utils.pipeline import analyze_videos
+from utils.embedding import embed_videos
+from utils.database import save_embedding_pg, save_metadata_pg, save_videos_bulk, save_embedding_parts
+from utils.dedup import save_signatures_pg
+from utils.jobs import enqueue_videos, job_status
+from utils.meta_extract import extraction_report, format_extraction_report
+from utils.metrics import stage_summary
+from utils.config import USE_JOB_QUEUE
 
 st.set_page_config(page_title="Video Embeddings & QC")
 st.title("Video Embeddings + QC")
@@ -29,31 +35,91 @@ if clear_cache_btn:
     st.session_state.session_metadata = {}
     st.success("Cleared generated metadata cache.")    
 
+def show_timings(timings):
+    if not timings:
+        return
+    with st.expander(f"Timing breakdown ({timings.get('analyze_video', 0):.1f}s)"):
+        stages = {k: v for k, v in timings.items() if not k.endswith("_bytes") and k != "analyze_video"}
+        st.bar_chart(stages, horizontal=True)
+        sizes = {k[:-len("_bytes")]: v for k, v in timings.items() if k.endswith("_bytes")}
+        if sizes:
+            st.caption("Payload: " + ", ".join(f"{k} {v / 1e6:.1f} MB" for k, v in sizes.items()))
+
+with st.sidebar.expander("Pipeline metrics (this process)"):
+    summary = stage_summary()
+    if summary:
+        st.dataframe(
+            [{"stage": stage, **values} for stage, values in sorted(summary.items())],
+            hide_index=True,
+        )
+    else:
+        st.caption("Nothing measured yet.")
+
+if USE_JOB_QUEUE:
+    # Work is done by worker.py processes; this page only enqueues and polls,
+    # so closing the tab loses nothing
+    if uploaded_videos and generate_btn:
+        st.session_state.batch_id = enqueue_videos((v.name, v) for v in uploaded_videos)
+        st.success(f"Queued {len(uploaded_videos)} videos (batch {st.session_state.batch_id}).")
+
+    st.write("### Queued jobs")
+    only_batch = st.session_state.get("batch_id") and st.checkbox("Only this session's batch", value=True)
+    st.button("Refresh status")
+    jobs = job_status(st.session_state.batch_id if only_batch else None)
+    for job in jobs:
+        line = f"**{job['video_name']}** — {job['stage']}"
+        if job["qc_decision"]:
+            line += f" | QC Score: {job['qc_score']} | Decision: {job['qc_decision']}"
+        if job["last_error"]:
+            line += f" | attempt {job['attempts']}: {job['last_error']}"
+        st.write(line)
+    if not jobs:
+        st.caption("No jobs yet.")
+    st.stop()
+
 if uploaded_videos and generate_btn:
     progress = st.progress(0)
     total = len(uploaded_videos)
-    st.session_state.session_metadata = {}  
-    for i, video_file in enumerate(uploaded_videos):
-        with st.spinner(f"Analyzing {video_file.name} ({i + 1}/{total})..."):
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".mp4") as tmp:
-                tmp.write(video_file.read())
-                video_path = tmp.name
-            try:
-                metadata = extract_video_metadata(video_path, video_file.name)
-                qc = qc_score(metadata)
-                metadata.update(qc)
-                st.session_state.session_metadata[video_file.name] = metadata
-                st.subheader(video_file.name)
-                # st.json(metadata)
-                st.info(f"QC Score: {qc['qc_score']} | Decision: {qc['qc_decision']}")
-                st.caption("Reasons: " + "; ".join(qc["qc_reasons"]))
+    st.session_state.session_metadata = {}
 
-            except Exception as e:
-                st.error(f"❌ Error processing {video_file.name}: {e}")
+    # Each upload gets its own file in a per-run directory, removed even if
+    # analysis fails; repeated file names are told apart with a suffix
+    tmp_dir = tempfile.mkdtemp(prefix="uploads_")
+    video_paths = {}
+    try:
+        for i, video_file in enumerate(uploaded_videos):
+            stem, ext = os.path.splitext(video_file.name)
+            video_name, n = video_file.name, 1
+            while video_name in video_paths:
+                n += 1
+                video_name = f"{stem} ({n}){ext}"
+            path = os.path.join(tmp_dir, f"{i}{ext or '.mp4'}")
+            with open(path, "wb") as tmp:
+                shutil.copyfileobj(video_file, tmp)
+            video_paths[video_name] = path
 
-            progress.progress((i + 1) / total)
+        with st.spinner(f"Analyzing {total} videos..."):
+            for done, (video_name, metadata, error) in enumerate(analyze_videos(video_paths.items()), 1):
+                if error is not None:
+                    st.error(f"❌ Error processing {video_name}: {error}")
+                else:
+                    st.session_state.session_metadata[video_name] = metadata
+                    st.subheader(video_name)
+                    # st.json(metadata)
+                    st.info(f"QC Score: {metadata['qc_score']} | Decision: {metadata['qc_decision']}")
+                    st.caption("Reasons: " + "; ".join(metadata["qc_reasons"]))
+                    if metadata.get("duplicate_of"):
+                        st.warning(f"⚠️ Near-duplicate of: {', '.join(metadata['duplicate_of'])}")
+                    show_timings(metadata.get("timings"))
+
+                progress.progress(done / total)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
 
     st.success("Metadata & QC Score generated. Use 'Store All' or per-video buttons below to save.")
+    report = extraction_report(st.session_state.session_metadata.values())
+    if report["videos"]:
+        st.caption(format_extraction_report(report))
 
 if st.session_state.session_metadata:
     st.write("### Generated Metadata:")
@@ -68,10 +134,19 @@ if st.session_state.session_metadata:
 
         if store_one:
             try:
-                emb = get_gemini_embedding(meta.get("summary", name))
+                embeddings = embed_videos([(name, meta)])[0]
+                emb = embeddings.pop("summary", None)
                 if emb is not None:
                     save_embedding_pg(name, emb, meta)
                     save_metadata_pg(name, meta)
+                    try:
+                        save_embedding_parts((name, kind, e) for kind, e in embeddings.items())
+                    except Exception as e:
+                        st.warning(f"⚠️ Could not store tag/transcript embeddings: {e}")
+                    try:
+                        save_signatures_pg([(name, meta.get("video_signature"))])
+                    except Exception as e:
+                        st.warning(f"⚠️ Could not store duplicate-detection signature: {e}")
                     st.success(f"Stored: {name}")
                 else:
                     st.warning(f"⚠️ Skipped {name} due to embedding issue.")
@@ -79,22 +154,48 @@ if st.session_state.session_metadata:
                 st.error(f"❌ Error storing {name}: {e}")
 
 if st.session_state.session_metadata and store_all_btn:
-    progress = st.progress(0)
-    items = list(st.session_state.session_metadata.items())
+    # Near-duplicates are only stored through their per-video button
+    items = [
+        (video_name, metadata) for video_name, metadata in st.session_state.session_metadata.items()
+        if metadata.get("qc_decision") != "DUPLICATE"
+    ]
+    skipped = len(st.session_state.session_metadata) - len(items)
+    if skipped:
+        st.info(f"Skipping {skipped} near-duplicate video(s).")
     total = len(items)
 
-    for i, (video_name, metadata) in enumerate(items):
-        with st.spinner(f"Storing {video_name} ({i + 1}/{total})..."):
-            try:
-                emb = get_gemini_embedding(metadata.get("summary", video_name))
-                if emb is not None:
-                    save_embedding_pg(video_name, emb, metadata)
-                    save_metadata_pg(video_name, metadata)
-                    st.success(f"✅ Stored: {video_name}")
-                else:
-                    st.warning(f"⚠️ Skipped {video_name} due to embedding issue.")
-            except Exception as e:
-                st.error(f"❌ Error storing {video_name}: {e}")
-        progress.progress((i + 1) / total)
+    with st.spinner(f"Embedding {total} videos..."):
+        embeddings = embed_videos(items)
+
+    with st.spinner(f"Storing {total} videos..."):
+        try:
+            failures = save_videos_bulk(
+                (video_name, embs.get("summary"), metadata)
+                for (video_name, metadata), embs in zip(items, embeddings)
+            )
+        except Exception as e:
+            failures = None
+            st.error(f"❌ Error storing videos: {e}")
 
-    st.success("All videos stored successfully!")
+    if failures is not None:
+        try:
+            save_embedding_parts(
+                (video_name, kind, emb)
+                for (video_name, _), embs in zip(items, embeddings) if video_name not in failures
+                for kind, emb in embs.items() if kind != "summary"
+            )
+        except Exception as e:
+            st.warning(f"⚠️ Could not store tag/transcript embeddings: {e}")
+        try:
+            save_signatures_pg(
+                (video_name, metadata.get("video_signature"))
+                for video_name, metadata in items if video_name not in failures
+            )
+        except Exception as e:
+            st.warning(f"⚠️ Could not store duplicate-detection signatures: {e}")
+        for video_name, error in failures.items():
+            st.warning(f"⚠️ Skipped {video_name}: {error}")
+        if failures:
+            st.success(f"Stored {total - len(failures)} of {total} videos.")
+        else:
+            st.success("All videos stored successfully!")
@@ -1,6 +1,10 @@
+import datetime
 import streamlit as st
-from utils.embedding import get_gemini_embedding
-from utils.database import search_similar_videos
+from utils.embedding import get_query_embedding
+from utils.database import search_fused
+from utils.memindex import search_videos
+from utils.dedup import collapse_duplicates
+from utils.config import MEMORY_INDEX_ENABLED
 
 # ---------------- STREAMLIT UI ----------------
 st.set_page_config(page_title="Video Search", layout="centered")
@@ -23,6 +27,13 @@ with st.container():
 
     top_k = st.text_input("Enter number of results to show", value="3")
 
+    recall = st.select_slider(
+        "Search mode",
+        options=["fast", "balanced", "accurate"],
+        value="balanced",
+        help="Higher recall searches more of the index at the cost of latency"
+    )
+
     # top_k = st.selectbox(
     #     "Number of results to show",
     #     options=[1, 3, 5, 7, 10],
@@ -30,6 +41,47 @@ with st.container():
     #     help="Select how many top results to display"
     # )
 
+    rankings = {
+        "Summary + tags + transcript (rank fusion)": "rrf",
+        "Summary + tags + transcript (weighted)": "weighted",
+        "Summary only": None,
+    }
+    # The in-memory index only serves summary-only search; fusion runs on pgvector
+    ranking = rankings[st.selectbox(
+        "Ranking", list(rankings), index=2 if MEMORY_INDEX_ENABLED else 0,
+        help="Only 'Summary only' uses the in-memory index" if MEMORY_INDEX_ENABLED else None,
+    )]
+    # RRF sums 1/(k + rank) per source (roughly 0-0.05), it isn't a similarity
+    score_label = {"rrf": "Rank Fusion Score", "weighted": "Weighted Similarity"}.get(ranking, "Similarity Score")
+
+    collapse = st.checkbox("Collapse near-duplicate videos", value=True)
+
+    with st.expander("Filters"):
+        decisions = st.multiselect("QC decision", ["ACCEPT", "MANUAL_REVIEW", "REJECT", "ERROR"])
+        location = st.text_input("Location contains", placeholder="e.g. Dubai")
+        property_type = st.text_input("Property type contains", placeholder="e.g. villa")
+        tags = st.text_input("Any of these tags (comma separated)")
+        rooms = st.text_input("Shows all of these rooms (comma separated)")
+        yes_no = {"Any": None, "Yes": True, "No": False}
+        subtitles = st.selectbox("Subtitles", list(yes_no))
+        real_estate = st.selectbox("Real estate related", list(yes_no))
+        uploaded = st.date_input("Uploaded between", value=[])
+
+    def split(text):
+        return [v.strip() for v in text.split(",") if v.strip()]
+
+    filters = {
+        "qc_decision": decisions,
+        "location": {"contains": location.strip()} if location.strip() else None,
+        "property_type": {"contains": property_type.strip()} if property_type.strip() else None,
+        "tags": {"any": split(tags)},
+        "rooms_shown": {"all": split(rooms)},
+        "subtitles_present": yes_no[subtitles],
+        "is_real_estate_related": yes_no[real_estate],
+    }
+    if len(uploaded) == 2:
+        filters["created_at"] = {"since": uploaded[0], "until": uploaded[1] + datetime.timedelta(days=1)}
+
     search_button = st.button("Search")
 
     st.markdown("</div>", unsafe_allow_html=True)
@@ -39,13 +91,22 @@ if search_button:
         st.warning("Please enter a search query.")
     else:
         with st.spinner("Embedding query and searching..."):
-            embedding = get_gemini_embedding(query)
+            embedding = get_query_embedding(query)
             if embedding is not None:
-                results = search_similar_videos(embedding, top_k=top_k)
+                def search(k):
+                    if ranking is None:
+                        return search_videos(embedding, top_k=k, recall=recall, filters=filters)
+                    return search_fused(embedding, top_k=k, recall=recall, filters=filters, method=ranking)
+
+                if collapse:
+                    # Over-fetch so there are still top_k results after collapsing
+                    results = collapse_duplicates(search(int(top_k) * 3), top_k)
+                else:
+                    results = search(top_k)
                 if results:
                     st.success(f"Found {len(results)} matching videos:")
                     for idx, (video_name, metadata, score) in enumerate(results, 1):
-                        with st.expander(f"{idx}. {video_name} — Similarity Score: {score:.4f}"):
+                        with st.expander(f"{idx}. {video_name} — {score_label}: {score:.4f}"):
                             st.json(metadata)
                 else:
                     st.warning("No matching videos found.")
@@ -0,0 +1,61 @@
+import contextlib
+import datetime
+import pytest
+import utils.database as db
+import utils.dedup as dedup
+
+class FakeStore:
+    # video_phashes rows; queries with a watermark only see newer rows
+    def __init__(self):
+        self.rows = []
+        self.queries = []
+
+    def cursor(self):
+        store = self
+
+        class Cursor:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def execute(self, sql, params=None):
+                store.queries.append(params)
+                if params:
+                    since = params[0] - datetime.timedelta(seconds=params[1])
+                    self.rows = [r for r in store.rows if r[2] > since]
+                else:
+                    self.rows = list(store.rows)
+
+            def __iter__(self):
+                return iter(self.rows)
+
+        return Cursor()
+
+    def rollback(self):
+        pass
+
+@pytest.fixture
+def store(monkeypatch):
+    store = FakeStore()
+    monkeypatch.setattr(db, "get_connection", lambda: contextlib.nullcontext(store))
+    dedup.refresh_index()
+    yield store
+    dedup.refresh_index()
+
+def signature(h):
+    return {"phash": h, "frame_hashes": [h]}
+
+def test_lookup_sees_signatures_stored_by_other_processes(store):
+    t0 = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+    store.rows.append(("a.mp4", 0xFFFF, t0))
+    assert dedup.find_duplicates(signature(0xFFFF)) == [("a.mp4", 0)]
+    store.rows.append(("b.mp4", 0xFFFF << 40, t0 + datetime.timedelta(minutes=5)))
+    assert dedup.find_duplicates(signature(0xFFFF << 40)) == [("b.mp4", 0)]
+    assert store.queries[-1] == (t0, dedup.SYNC_OVERLAP_SECONDS)
+
+def test_empty_table_keeps_polling(store):
+    assert dedup.find_duplicates(signature(7)) == []
+    store.rows.append(("a.mp4", 7, datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)))
+    assert dedup.find_duplicates(signature(7)) == [("a.mp4", 0)]
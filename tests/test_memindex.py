@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+from utils.memindex import MemoryIndex, recall_at_k
+
+def _rows(vectors, first_id=1):
+    return [(first_id + i, f"video_{first_id + i}", v, {"i": first_id + i}) for i, v in enumerate(vectors)]
+
+def _exact(vectors, queries, top_k, metric):
+    if metric == "l2":
+        d = np.sqrt(((queries[:, None, :] - vectors[None, :, :]) ** 2).sum(-1))
+    elif metric == "cosine":
+        d = 1 - (queries @ vectors.T) / np.linalg.norm(queries, axis=1)[:, None] / np.linalg.norm(vectors, axis=1)
+    else:
+        d = -(queries @ vectors.T)
+    order = np.argsort(d, axis=1, kind="stable")[:, :top_k]
+    return [[(f"video_{i + 1}", None, float(d[q, i])) for i in row] for q, row in enumerate(order)]
+
+@pytest.fixture
+def data():
+    # Clustered vectors with noisy stored-vector queries, like real embeddings
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((20, 64))
+    vectors = (centers[rng.integers(0, 20, 2000)] + rng.standard_normal((2000, 64)) * 0.5).astype(np.float32)
+    queries = vectors[rng.integers(0, 2000, 50)] + rng.standard_normal((50, 64)).astype(np.float32) * 0.05
+    return vectors, queries
+
+@pytest.mark.parametrize("metric", ["l2", "cosine", "ip"])
+def test_float32_matches_exact_search(data, metric):
+    vectors, queries = data
+    index = MemoryIndex("float32", metric)
+    # Several segments, as after a few syncs
+    for start in range(0, len(vectors), 700):
+        index.add(_rows(vectors[start:start + 700], start + 1))
+    found = index.search_batch(queries, 10)
+    truth = _exact(vectors, queries, 10, metric)
+    assert recall_at_k(found, truth) == 1.0
+    for got, want in zip(found, truth):
+        assert [d for _, _, d in got] == pytest.approx([d for _, _, d in want], rel=1e-4, abs=1e-4)
+
+@pytest.mark.parametrize("quantization, min_recall", [("int8", 0.95), ("binary", 0.8)])
+def test_quantized_recall(data, quantization, min_recall):
+    vectors, queries = data
+    index = MemoryIndex(quantization, "cosine")
+    index.add(_rows(vectors))
+    assert recall_at_k(index.search_batch(queries, 10), _exact(vectors, queries, 10, "cosine")) >= min_recall
+
+def _index_all(vectors):
+    index = MemoryIndex("int8", "l2")
+    index.add(_rows(vectors))
+    return index
+
+def test_snapshot_stays_memory_mapped(data, tmp_path):
+    vectors, queries = data
+    index = MemoryIndex("int8", "l2")
+    index.add(_rows(vectors[:1500]))
+    index.save(str(tmp_path / "snap"))
+
+    loaded = MemoryIndex.load(str(tmp_path / "snap"), metric="l2")
+    assert loaded.last_id == 1500
+    loaded.add(_rows(vectors[1500:], 1501))
+    # Rows added on top of a snapshot don't pull the mapped base into RAM
+    assert isinstance(loaded.segments[0][1]["data"], np.memmap)
+    assert loaded.search_batch(queries, 10) == [
+        [(n, m, pytest.approx(d)) for n, m, d in row] for row in _index_all(vectors).search_batch(queries, 10)
+    ]
@@ -0,0 +1,104 @@
+import threading
+import types
+import psycopg2
+import psycopg2.pool
+import pytest
+import utils.database as db
+
+class FakeCursor:
+    def __init__(self, conn=None):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        if self.conn is not None:
+            self.conn.executed.append(sql)
+            if sql.startswith("EXECUTE") and self.conn.fail_executes:
+                self.conn.fail_executes -= 1
+                raise psycopg2.errors.InvalidSqlStatementName("prepared statement does not exist")
+
+class FakeConnection:
+    def __init__(self, fail_rollback=False):
+        self.closed = 0
+        self.fail_rollback = fail_rollback
+        self.fail_executes = 0
+        self.executed = []
+        self.info = types.SimpleNamespace(transaction_status=psycopg2.extensions.TRANSACTION_STATUS_IDLE)
+
+    def get_transaction_status(self):
+        return psycopg2.extensions.TRANSACTION_STATUS_INTRANS if self.fail_rollback else self.info.transaction_status
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        if self.fail_rollback:
+            raise psycopg2.InterfaceError("connection already closed")
+
+    def close(self):
+        self.closed = 1
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(psycopg2.pool.psycopg2, "connect", lambda *args, **kwargs: FakeConnection())
+    pool = db._Pool(1, 4)
+    monkeypatch.setattr(db, "_pool", pool)
+    monkeypatch.setattr(db, "_pool_slots", threading.BoundedSemaphore(4))
+    yield pool
+    db._last_used.clear()
+    db._prepared.clear()
+
+def test_returned_connections_stay_open_up_to_max(pool):
+    conns = [pool.getconn() for _ in range(4)]
+    for conn in conns:
+        pool.putconn(conn)
+    assert len(pool._pool) == 4
+    assert not any(conn.closed for conn in conns)
+
+def test_connections_are_reused(pool):
+    with db.get_connection() as first:
+        pass
+    with db.get_connection() as second:
+        pass
+    assert first is second
+    assert db._last_used[second] > 0
+
+def test_failed_rollback_releases_the_slot(pool, monkeypatch):
+    monkeypatch.setattr(psycopg2.pool.psycopg2, "connect", lambda *args, **kwargs: FakeConnection(fail_rollback=True))
+    pool._pool.clear()
+    for _ in range(6):  # more than the 4 slots
+        with db.get_connection() as conn:
+            pass
+        assert conn.closed
+    assert db._pool_slots.acquire(blocking=False)
+
+@pytest.fixture
+def writer(monkeypatch):
+    monkeypatch.setattr(db, "PG_PREPARED_STATEMENTS", True)
+    writer = {"columns": ["video_name"], "converters": [lambda name, meta: name], "version": 1,
+              "name": "save_metadata_v1", "prepare": "INSERT ...", "execute": "(%s)", "sql": "INSERT ..."}
+    monkeypatch.setattr(db, "_metadata_writer", lambda: writer)
+    monkeypatch.setattr(db, "invalidate_metadata_writer", lambda: None)
+    return writer
+
+def test_lost_prepared_statement_is_prepared_again(pool, writer):
+    db.save_metadata_pg("a.mp4", {})
+    conn = pool._pool[0]
+    conn.fail_executes = 1  # the session dropped its prepared statements
+    db.save_metadata_pg("b.mp4", {})
+    assert conn.executed.count("PREPARE save_metadata_v1 AS INSERT ...") == 2
+    assert db._prepared[conn] == 1
+
+def test_repeated_schema_error_reaches_the_caller(pool, writer):
+    db.save_metadata_pg("a.mp4", {})
+    pool._pool[0].fail_executes = 2
+    with pytest.raises(psycopg2.errors.InvalidSqlStatementName):
+        db.save_metadata_pg("b.mp4", {})
@@ -0,0 +1,66 @@
+import datetime
+import random
+from utils.qc import qc_score
+from utils.qc_batch import qc_score_batch
+from tests.qc_reference import qc_score as reference_score
+
+# Values seen in (or easily produced by) model output, plus the malformed
+# ones the reference scorer swallows exceptions on. Fields it reads with a
+# bare `(value or "").strip()` only get values it doesn't raise on.
+ANY = [None, "", "Yes", "No", " yes ", "YES", "no", True, False, 0, 1, 1.0, "1", "true", [], {}, ()]
+TEXT = [v for v in ANY if isinstance(v, str) or not v]
+TYPES = [None, [], "", "Nudity", ["Nudity"], [" Violence ", "Gore"], [""], [1], False, 0, 1, 0.0, (), {}, ("Weapons",)]
+FIELDS = {
+    "video_less_than_10_frames": TEXT,
+    "video_duration": [None, 0, 3, 4.99, 5, 60, "4", "60", "1m 5s", "", [], True, False],
+    "ai_generated_extent": ANY + ["Full", "full ", "Partial", "None", 3],
+    "is_real_estate_related": ANY,
+    "main_topic_category": TEXT + ["Real Estate", "property", "Lifestyle", "Travel"],
+    "lifestyle_emphasis": TEXT + ["Luxury Dubai living", "Abu Dhabi family", "Urban"],
+    "uae_related": TEXT,
+    "uae_sentiment": TEXT + ["Positive", "negative", "Neutral"],
+    "event_driven": ANY,
+    "if_event_yes_time": [None, "", "2000-01-01T10:00:00", "2999-01-01", "not a date", 5],
+    "clarity_of_speech": TEXT + ["Clear", "Muffled"],
+    "volume_balance": TEXT + ["Balanced", "Narration-dominant", "Music-dominant"],
+    "mood_of_visuals": TEXT + ["Bright and Modern", "Dark", "well-lit"],
+    "subtitles_present": ANY,
+    "rooms_shown": [None, [], ["Kitchen"], "", " ", "Kitchen", True, 0],
+    "technical_glitches": TEXT + ["None", "Minor", "Severe", "clean"],
+    "stopped_early": [None, "", "unsafe_content", True, False],
+}
+for category in ["adult_content", "violence", "substance_use", "hate_speech", "disturbing_content"]:
+    FIELDS[f"{category}_presence"] = ANY
+    FIELDS[f"{category}_type"] = TYPES
+
+def random_record(rng):
+    record = {key: rng.choice(values) for key, values in FIELDS.items() if rng.random() < 0.8}
+    if rng.random() < 0.02:
+        record["error"] = {"message": "boom"} if rng.random() < 0.5 else {}
+    return record
+
+def test_batch_matches_reference_on_random_records():
+    rng = random.Random(1234)
+    records = [random_record(rng) for _ in range(5000)]
+    now = datetime.datetime.utcnow()
+    batch = qc_score_batch(records, now)
+    mismatches = [(r, b, reference_score(r)) for r, b in zip(records, batch) if b != reference_score(r)]
+    assert not mismatches, mismatches[:3]
+
+def test_qc_score_matches_batch():
+    rng = random.Random(99)
+    records = [random_record(rng) for _ in range(500)]
+    assert [qc_score(r) for r in records] == qc_score_batch(records)
+
+def test_falsy_unsafe_types_match_reference():
+    records = [
+        {"video_duration": 60, "adult_content_type": False},
+        {"video_duration": 60, "violence_presence": "Yes", "violence_type": ""},
+        {"video_duration": 60, "violence_presence": "Yes", "violence_type": 0},
+    ]
+    assert qc_score_batch(records) == [reference_score(r) for r in records]
+
+def test_rows_are_scored_independently():
+    # True == 1 == 1.0 must not share a normalised value across rows
+    records = [{"subtitles_present": v, "video_duration": 60} for v in (True, 1, 1.0, "1")]
+    assert qc_score_batch(records) == [reference_score(r) for r in records]
@@ -0,0 +1,65 @@
+import datetime
+import utils.qc_batch as qc_batch
+import utils.rescore as rescore
+from utils.qc_batch import GATES, SCORE_GROUPS, RULES_VERSION, rules_version, eq
+
+ACCEPTED = {
+    "video_duration": 60, "is_real_estate_related": "Yes", "uae_related": "Yes", "uae_sentiment": "Positive",
+    "clarity_of_speech": "Clear", "volume_balance": "Balanced", "mood_of_visuals": "Bright",
+    "technical_glitches": "None", "rooms_shown": ["Kitchen"],
+}
+
+def test_rules_version_is_stable():
+    assert rules_version() == RULES_VERSION
+
+def test_rules_version_tracks_rule_changes(monkeypatch):
+    changed_points = [
+        (name, [(cond, points + 1, reason) for cond, points, reason in rules]) if name == "narration" else (name, rules)
+        for name, rules in SCORE_GROUPS
+    ]
+    assert rules_version(score_groups=changed_points) != RULES_VERSION
+    changed_gate = [(eq("lt10", "no"), *GATES[2][1:]) if i == 2 else gate for i, gate in enumerate(GATES)]
+    assert rules_version(gates=changed_gate) != RULES_VERSION
+    monkeypatch.setattr(qc_batch, "ACCEPT_THRESHOLD", 75)
+    assert rules_version() != RULES_VERSION
+
+def _row(id, typed_decision, **metadata):
+    typed = {"id": id, "video_name": "same_name", "qc_decision": typed_decision}
+    return typed, {**ACCEPTED, **metadata}, f"hash{id}"
+
+def test_update_values_keys_on_id_and_counts_changed_decisions():
+    now = datetime.datetime(2030, 1, 1)
+    rows = [
+        _row(1, "ACCEPT"),
+        _row(2, "ACCEPT", adult_content_presence="Yes", adult_content_type=["Nudity"]),
+    ]
+    values, changed = rescore._update_values(rows, now, convert_score=lambda s: None if s == 'N/A' else s)
+    assert [v[0] for v in values] == [1, 2]
+    assert [v[1] for v in values] == [130, None]
+    assert [v[2] for v in values] == ["ACCEPT", "REJECT"]
+    assert changed == 1
+    assert {v[4] for v in values} == {RULES_VERSION}
+    assert [v[5] for v in values] == ["hash1", "hash2"]
+
+def test_upcoming_event_expires_and_rescores_as_past():
+    event = {"event_driven": "Yes", "if_event_yes_time": "2030-06-01T18:00:00"}
+    before = datetime.datetime(2030, 5, 1)
+    values, _ = rescore._update_values([_row(1, None, **event)], before)
+    assert values[0][6] == datetime.datetime(2030, 6, 1, 18)
+    assert "Upcoming/live event (+15)" in values[0][3]
+
+    after = datetime.datetime(2030, 7, 1)
+    values, changed = rescore._update_values([_row(1, "ACCEPT", **event)], after)
+    assert values[0][6] is None
+    assert "Past event (-100)" in values[0][3]
+    assert values[0][2] == "MANUAL_REVIEW" and changed == 1
+
+def test_score_column_follows_the_writer(monkeypatch):
+    for category, type_name, score, expected, cast in [
+        ("N", "integer", 90, 90, "numeric"),
+        ("N", "integer", 'N/A', None, "numeric"),
+        ("S", "text", 90, 90, "text"),
+    ]:
+        monkeypatch.setattr(rescore, "_metadata_writer", lambda: {"types": {"qc_score": (category, type_name)}})
+        convert, score_type = rescore._score_column()
+        assert convert(score) == expected and score_type == cast
@@ -0,0 +1,39 @@
+import pytest
+import utils.schema as schema
+
+class CatalogCursor:
+    # Answers the pg_class/pg_am lookup from `methods` and records the rest
+    def __init__(self, methods):
+        self.methods = methods
+        self.statements = []
+        self.lookups = 0
+
+    def execute(self, sql, params=None):
+        if "pg_am" in sql:
+            self.lookups += 1
+            self.rows = [(name, self.methods.get(name)) for name in params[0]]
+        else:
+            self.statements.append(sql)
+
+    def fetchall(self):
+        return self.rows
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    schema.forget_index_methods()
+    yield
+    schema.forget_index_methods()
+
+def test_settings_follow_the_built_index(monkeypatch):
+    monkeypatch.setattr(schema, "PG_ANN_INDEX", "hnsw")
+    cur = CatalogCursor({schema.ANN_INDEX_NAME: "ivfflat"})
+    schema.apply_search_settings(cur, "balanced")
+    schema.apply_search_settings(cur, "balanced")
+    assert cur.lookups == 1
+    assert all("ivfflat.probes" in sql for sql in cur.statements)
+
+def test_missing_index_falls_back_to_config(monkeypatch):
+    monkeypatch.setattr(schema, "PG_ANN_INDEX", "hnsw")
+    cur = CatalogCursor({})
+    schema.apply_search_settings(cur, "fast")
+    assert cur.statements == [f"SET LOCAL hnsw.ef_search = {int(schema.RECALL_PRESETS['fast']['hnsw.ef_search'])}"]
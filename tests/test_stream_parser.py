@@ -0,0 +1,90 @@
+import json
+import random
+from benchmarks.fake_gemini import fake_metadata
+from utils.helpers import IncrementalJSONObject, iter_sse_text, parse_gemini_response
+
+TRICKY = '''```json
+{
+  "title": "Villa, \\"Palm\\" {tour} [1/2]",  // copied from the prompt, with , and }
+  "url": "https://example.com/a//b",
+  "path": "C:\\\\videos\\\\",
+  "tags": ["Pool", "Sea, View"],
+  "price": {"amount": 1200000, "currency": "AED"},
+  "adult_content_presence": "No",
+  "bad": nonsense,
+  "technical_glitches": "None"
+}
+```
+trailing text {"ignored": true}'''
+
+EXPECTED = [
+    ("title", 'Villa, "Palm" {tour} [1/2]'),
+    ("url", "https://example.com/a//b"),
+    ("path", "C:\\videos\\"),
+    ("tags", ["Pool", "Sea, View"]),
+    ("price", {"amount": 1200000, "currency": "AED"}),
+    ("adult_content_presence", "No"),
+    ("technical_glitches", "None"),
+]
+
+def _feed(text, cuts):
+    parser = IncrementalJSONObject()
+    members, start = [], 0
+    for cut in list(cuts) + [len(text)]:
+        members += parser.feed(text[start:cut])
+        start = cut
+    return members, parser
+
+def test_whole_text():
+    members, parser = _feed(TRICKY, [])
+    assert members == EXPECTED
+    assert parser.done
+
+def test_every_single_split_point():
+    # Covers chunks ending in a backslash, a lone "/", or inside a comment
+    for cut in range(1, len(TRICKY)):
+        members, _ = _feed(TRICKY, [cut])
+        assert members == EXPECTED, cut
+
+def test_random_chunking_of_model_output():
+    rng = random.Random(7)
+    for i in range(50):
+        meta = fake_metadata(f"video-{i}", unsafe_rate=0.5)
+        text = "```json\n" + json.dumps(meta, indent=2) + "\n```"
+        cuts = sorted(rng.sample(range(1, len(text)), rng.randint(1, 40)))
+        members, _ = _feed(text, cuts)
+        assert dict(members) == meta
+        assert [k for k, _ in members] == list(meta)
+
+def test_members_arrive_as_soon_as_complete():
+    parser = IncrementalJSONObject()
+    assert parser.feed('{"adult_content_presence": "Ye') == []
+    assert parser.feed('s", "adult_content_type": ["Nud') == [("adult_content_presence", "Yes")]
+    assert parser.feed('ity"], "title"') == [("adult_content_type", ["Nudity"])]
+
+class FakeResponse:
+    def __init__(self, events):
+        self.lines = []
+        for event in events:
+            self.lines += [f"data: {json.dumps(event)}", ""]
+
+    def iter_lines(self, decode_unicode=False):
+        return iter([": keep-alive", "event: message"] + self.lines)
+
+def _event(text, usage=None):
+    event = {"candidates": [{"content": {"parts": [{"text": text}], "role": "model"}}]}
+    if usage:
+        event["usageMetadata"] = usage
+    return event
+
+def test_iter_sse_text_yields_deltas_and_usage():
+    resp = FakeResponse([_event('{"a": '), _event("1}"), _event("", {"promptTokenCount": 10, "candidatesTokenCount": 3})])
+    usage = {}
+    assert "".join(iter_sse_text(resp, usage)) == '{"a": 1}'
+    assert usage == {"promptTokenCount": 10, "candidatesTokenCount": 3}
+
+def test_truncated_response_is_salvaged():
+    text = TRICKY[:TRICKY.index('"adult_content_presence"') + 10]
+    metadata = parse_gemini_response(text, "clip.mp4")
+    assert metadata.get("parse_salvaged") is True
+    assert metadata["tags"] == ["Pool", "Sea, View"]
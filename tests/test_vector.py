@@ -0,0 +1,13 @@
+import numpy as np
+import pytest
+from utils.vector import _adapt_ndarray, _cast_vector
+
+def test_vector_round_trips_float32():
+    v = np.random.default_rng(0).standard_normal(16).astype(np.float32)
+    literal = _adapt_ndarray(v).getquoted().decode()
+    assert literal.endswith("::vector")
+    assert np.array_equal(_cast_vector(literal[1:literal.index("'", 1)], None), v)
+
+def test_matrices_are_refused():
+    with pytest.raises(ValueError):
+        _adapt_ndarray(np.zeros((2, 3), dtype=np.float32))
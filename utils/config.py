@@ -10,8 +10,169 @@ PG_CONN = {
     "dbname": os.getenv("PG_DBNAME"),
     "user": os.getenv("PG_USER"),
     "password": os.getenv("PG_PASSWORD"),
+    # e.g. "-c search_path=bench,public" to point everything at another schema
+    "options": os.getenv("PG_OPTIONS"),
 }
 
 API_KEY = os.getenv("API_KEY")
-GEMINI_EMBED_URL = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-embedding-001:embedContent?key={API_KEY}"
-GEMINI_CHAT_URL = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:generateContent?key={API_KEY}"
+# Point at benchmarks/fake_gemini.py (e.g. http://127.0.0.1:8765) to run
+# without spending quota
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com").rstrip("/")
+GEMINI_EMBED_URL = f"{GEMINI_BASE_URL}/v1beta/models/gemini-embedding-001:embedContent?key={API_KEY}"
+GEMINI_BATCH_EMBED_URL = f"{GEMINI_BASE_URL}/v1beta/models/gemini-embedding-001:batchEmbedContents?key={API_KEY}"
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+GEMINI_CHAT_URL = f"{GEMINI_BASE_URL}/v1beta/models/{GEMINI_MODEL}:generateContent?key={API_KEY}"
+GEMINI_STREAM_URL = f"{GEMINI_BASE_URL}/v1beta/models/{GEMINI_MODEL}:streamGenerateContent?alt=sse&key={API_KEY}"
+GEMINI_UPLOAD_URL = f"{GEMINI_BASE_URL}/upload/v1beta/files?key={API_KEY}"
+GEMINI_FILES_URL = f"{GEMINI_BASE_URL}/v1beta"
+
+# Videos up to this size are sent inline (base64); larger ones are streamed
+# to the Gemini File API and referenced by URI
+INLINE_VIDEO_MAX_BYTES = int(os.getenv("INLINE_VIDEO_MAX_BYTES", str(10 * 1024 * 1024)))
+# Resumable upload chunk size; must be a multiple of 256 KiB
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(8 * 1024 * 1024)))
+FILE_PROCESSING_TIMEOUT = float(os.getenv("FILE_PROCESSING_TIMEOUT", "300"))
+# Tiered extraction (see utils/meta_extract.py): "full" sends METADATA_PROMPT
+# for every video; "tiered" first sends TRIAGE_PROMPT to TRIAGE_MODEL and only
+# runs the full prompt when the triage decision is not in TRIAGE_STOP_ON.
+# Survivors that are not UAE-related (they can't be accepted) can go to a
+# cheaper FULL_MODEL_NON_UAE.
+EXTRACTION_MODE = os.getenv("EXTRACTION_MODE", "full")
+TRIAGE_MODEL = os.getenv("TRIAGE_MODEL", "gemini-2.5-flash-lite")
+TRIAGE_STOP_ON = {d.strip().upper() for d in os.getenv("TRIAGE_STOP_ON", "REJECT,MANUAL_REVIEW").split(",") if d.strip()}
+FULL_MODEL_NON_UAE = os.getenv("FULL_MODEL_NON_UAE", "") or GEMINI_MODEL
+# USD per million input/output tokens, as "model:input/output,..."; used for
+# the cost columns of the extraction report
+MODEL_PRICES = {
+    model.strip(): tuple(float(p) for p in prices.split("/"))
+    for model, prices in (
+        pair.split(":") for pair in os.getenv(
+            "MODEL_PRICES", "gemini-2.5-flash:0.30/2.50,gemini-2.5-flash-lite:0.10/0.40"
+        ).split(",") if pair.strip()
+    )
+}
+
+# Stream metadata responses and stop generating as soon as the safety fields
+# already mean REJECT (see utils/meta_extract.py)
+STREAM_METADATA = os.getenv("STREAM_METADATA", "false").lower() == "true"
+
+# Connection pool shared by everything in utils/database.py: PG_POOL_MIN
+# connections are opened up front, and up to PG_POOL_MAX are kept open for reuse
+PG_POOL_MIN = int(os.getenv("PG_POOL_MIN", "1"))
+PG_POOL_MAX = int(os.getenv("PG_POOL_MAX", "10"))
+PG_POOL_TIMEOUT = float(os.getenv("PG_POOL_TIMEOUT", "30"))
+# Connections idle for longer than this (seconds) are pinged before reuse
+PG_HEALTHCHECK_INTERVAL = float(os.getenv("PG_HEALTHCHECK_INTERVAL", "30"))
+# Server-side prepared statements for save_metadata_pg; turn off behind
+# poolers that don't keep sessions (e.g. PgBouncer in transaction mode)
+PG_PREPARED_STATEMENTS = os.getenv("PG_PREPARED_STATEMENTS", "true").lower() == "true"
+
+# Bulk "Store All" path
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "100"))
+BULK_PAGE_SIZE = int(os.getenv("BULK_PAGE_SIZE", "500"))
+
+# Query vectors per statement in search_similar_videos_batch
+SEARCH_BATCH_SIZE = int(os.getenv("SEARCH_BATCH_SIZE", "250"))
+
+# ANN index on video_embeddings (see utils/schema.py)
+PG_VECTOR_DIMS = int(os.getenv("PG_VECTOR_DIMS", "3072"))
+PG_VECTOR_METRIC = os.getenv("PG_VECTOR_METRIC", "l2")  # l2, cosine or ip
+PG_ANN_INDEX = os.getenv("PG_ANN_INDEX", "hnsw")  # hnsw or ivfflat for new indexes; searches tune the one built
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "64"))
+IVFFLAT_LISTS = int(os.getenv("IVFFLAT_LISTS", "100"))
+
+# Multi-vector search (see search_fused in utils/database.py): "rrf" or
+# "weighted", per-source weights as "summary:1,tags:1,transcript:1", and how
+# many nearest neighbours each source contributes before fusion
+FUSION_METHOD = os.getenv("FUSION_METHOD", "rrf")
+FUSION_WEIGHTS = {
+    kind.strip(): float(weight)
+    for kind, weight in (
+        pair.split(":") for pair in os.getenv("FUSION_WEIGHTS", "summary:1,tags:1,transcript:1").split(",") if pair.strip()
+    )
+}
+RRF_K = int(os.getenv("RRF_K", "60"))
+FUSION_CANDIDATES = int(os.getenv("FUSION_CANDIDATES", "50"))
+
+# Optional in-process search over video_embeddings (see utils/memindex.py):
+# quantization is float32, int8 or binary; the snapshot is a directory that is
+# memory-mapped at startup instead of loading every vector from Postgres.
+# Only summary-only search uses it; fused rankings stay on pgvector.
+MEMORY_INDEX_ENABLED = os.getenv("MEMORY_INDEX_ENABLED", "false").lower() == "true"
+MEMORY_INDEX_QUANTIZATION = os.getenv("MEMORY_INDEX_QUANTIZATION", "float32")
+MEMORY_INDEX_SNAPSHOT = os.getenv("MEMORY_INDEX_SNAPSHOT", "")
+MEMORY_INDEX_SYNC_SECONDS = float(os.getenv("MEMORY_INDEX_SYNC_SECONDS", "30"))
+MEMORY_INDEX_CHUNK_ROWS = int(os.getenv("MEMORY_INDEX_CHUNK_ROWS", "65536"))
+MEMORY_INDEX_RESCORE = int(os.getenv("MEMORY_INDEX_RESCORE", "10"))  # binary: candidates per result
+
+# Local cache for Gemini results (see utils/cache.py)
+CACHE_PATH = os.getenv("CACHE_PATH", ".cache/qc_poc.sqlite3")
+METADATA_CACHE_ENABLED = os.getenv("METADATA_CACHE_ENABLED", "true").lower() == "true"
+METADATA_CACHE_MAX_MB = float(os.getenv("METADATA_CACHE_MAX_MB", "200"))
+
+# Query embedding cache used by search.py
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "86400"))
+QUERY_CACHE_PERSIST = os.getenv("QUERY_CACHE_PERSIST", "false").lower() == "true"
+QUERY_CACHE_MAX_MB = float(os.getenv("QUERY_CACHE_MAX_MB", "50"))
+
+# Archive re-scoring job (see utils/rescore.py): rows fetched per server-side
+# cursor round trip and written back per UPDATE
+RESCORE_CHUNK_SIZE = int(os.getenv("RESCORE_CHUNK_SIZE", "2000"))
+
+# Number of videos analysed concurrently by utils/pipeline.py
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "4"))
+
+# Headless bulk ingestion (ingest.py)
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "50"))
+INGEST_CHECKPOINT_PATH = os.getenv("INGEST_CHECKPOINT_PATH", ".cache/ingest_checkpoint.jsonl")
+
+# Postgres job queue (see utils/jobs.py and worker.py). Uploaded videos are
+# copied to JOB_STORAGE_DIR, which must be shared by all worker nodes.
+USE_JOB_QUEUE = os.getenv("USE_JOB_QUEUE", "false").lower() == "true"
+JOB_STORAGE_DIR = os.getenv("JOB_STORAGE_DIR", ".cache/jobs")
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "900"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BACKOFF = float(os.getenv("JOB_RETRY_BACKOFF", "30"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "2"))
+
+# Instrumentation (see utils/metrics.py). METRICS_PORT > 0 makes worker.py and
+# ingest.py serve Prometheus text; METRICS_OTEL mirrors stages as spans
+# through opentelemetry-api if it is installed.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_OTEL = os.getenv("METRICS_OTEL", "false").lower() == "true"
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
+# Shared Gemini HTTP client (see utils/gemini_client.py)
+GEMINI_POOL_SIZE = int(os.getenv("GEMINI_POOL_SIZE", "16"))
+GEMINI_RPM_GENERATE = float(os.getenv("GEMINI_RPM_GENERATE", "1000"))
+GEMINI_RPM_EMBED = float(os.getenv("GEMINI_RPM_EMBED", "3000"))
+GEMINI_RPM_FILES = float(os.getenv("GEMINI_RPM_FILES", "600"))
+GEMINI_CONNECT_TIMEOUT = float(os.getenv("GEMINI_CONNECT_TIMEOUT", "10"))
+GEMINI_READ_TIMEOUT = float(os.getenv("GEMINI_READ_TIMEOUT", "600"))
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "5"))
+GEMINI_BACKOFF_BASE = float(os.getenv("GEMINI_BACKOFF_BASE", "1"))
+GEMINI_BACKOFF_MAX = float(os.getenv("GEMINI_BACKOFF_MAX", "60"))
+GEMINI_BREAKER_THRESHOLD = int(os.getenv("GEMINI_BREAKER_THRESHOLD", "5"))
+GEMINI_BREAKER_COOLDOWN = float(os.getenv("GEMINI_BREAKER_COOLDOWN", "60"))
+
+# Local OpenCV pre-QC (see utils/probe.py)
+PRE_QC_ENABLED = os.getenv("PRE_QC_ENABLED", "true").lower() == "true"
+PROBE_SAMPLE_FPS = float(os.getenv("PROBE_SAMPLE_FPS", "4"))
+PRE_QC_DARK_BRIGHTNESS = float(os.getenv("PRE_QC_DARK_BRIGHTNESS", "20"))
+PRE_QC_MAX_DARK_RATIO = float(os.getenv("PRE_QC_MAX_DARK_RATIO", "0.95"))
+PRE_QC_MIN_SHARPNESS = float(os.getenv("PRE_QC_MIN_SHARPNESS", "0"))  # 0 disables the blur check
+
+# Optional downscaling before upload (see utils/preprocess.py)
+PREPROCESS_MODE = os.getenv("PREPROCESS_MODE", "off")  # off, downscale or keyframes
+PREPROCESS_MAX_HEIGHT = int(os.getenv("PREPROCESS_MAX_HEIGHT", "720"))
+PREPROCESS_MAX_FPS = float(os.getenv("PREPROCESS_MAX_FPS", "10"))
+PREPROCESS_KEYFRAME_FPS = float(os.getenv("PREPROCESS_KEYFRAME_FPS", "1"))
+PREPROCESS_WORKERS = int(os.getenv("PREPROCESS_WORKERS", str(os.cpu_count() or 1)))
+
+# Near-duplicate detection (see utils/dedup.py)
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "true").lower() == "true"
+DEDUP_SAMPLE_FPS = float(os.getenv("DEDUP_SAMPLE_FPS", "1"))
+DEDUP_MAX_DISTANCE = int(os.getenv("DEDUP_MAX_DISTANCE", "6"))  # Hamming bits out of 64
+DEDUP_SKIP_ANALYSIS = os.getenv("DEDUP_SKIP_ANALYSIS", "true").lower() == "true"
@@ -1,22 +1,231 @@
 import numpy as np
 import psycopg2
+import psycopg2.errors
+import psycopg2.extensions
+import psycopg2.pool
+from psycopg2.extras import execute_values
+import atexit
 import datetime
 import json
-from utils.config import PG_CONN
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from utils.vector import register_vector
+from utils.metrics import timed
+from utils.schema import ANN_INDEX_NAME, PART_INDEX_NAMES, PART_KINDS, apply_search_settings, distance_sql
+from utils.config import (
+    PG_CONN, PG_PREPARED_STATEMENTS, PG_POOL_MIN, PG_POOL_MAX, PG_POOL_TIMEOUT, PG_HEALTHCHECK_INTERVAL,
+    BULK_PAGE_SIZE, SEARCH_BATCH_SIZE, PG_VECTOR_METRIC, FUSION_METHOD, FUSION_WEIGHTS, RRF_K, FUSION_CANDIDATES
+)
 
-def save_embedding_pg(video_name: str, embedding, metadata: dict):
-    conn = psycopg2.connect(**PG_CONN)
-    cur = conn.cursor()
-    vector_str = "[" + ",".join(str(x) for x in embedding.tolist()) + "]"
+# ---------------- CONNECTION POOL ----------------
+_pool = None
+_pool_slots = None
+_pool_lock = threading.Lock()
+# Keyed by the connection itself: ids of closed connections get reused
+_last_used = weakref.WeakKeyDictionary()
+_pool_stats = {
+    "checkouts": 0,
+    "wait_time_total": 0.0,
+    "wait_time_max": 0.0,
+    "timeouts": 0,
+    "health_checks": 0,
+    "reconnects": 0,
+}
 
-    cur.execute("""
-        INSERT INTO video_embeddings (video_name, embedding, metadata)
-        VALUES (%s, %s::vector, %s)
-    """, (video_name, vector_str, json.dumps(metadata)))
+class _Pool(psycopg2.pool.ThreadedConnectionPool):
+    # Opens `minconn` connections up front but keeps every returned connection
+    # (up to `maxconn`) idle for reuse; the stock pool closes all of them
+    # above `minconn`, which means a reconnect on nearly every checkout.
+    def __init__(self, minconn, maxconn, *args, **kwargs):
+        super().__init__(minconn, maxconn, *args, **kwargs)
+        self.minconn = maxconn
+
+def _get_pool():
+    global _pool, _pool_slots
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                pool = _Pool(PG_POOL_MIN, PG_POOL_MAX, **PG_CONN)
+                conn = pool.getconn()
+                try:
+                    register_vector(conn)
+                finally:
+                    pool.putconn(conn)
+                _pool = pool
+                # psycopg2 raises instead of blocking when the pool is exhausted,
+                # so callers queue on this semaphore first.
+                _pool_slots = threading.BoundedSemaphore(PG_POOL_MAX)
+    return _pool
+
+def _count(stat):
+    with _pool_lock:
+        _pool_stats[stat] += 1
+
+def _discard(pool, conn):
+    _last_used.pop(conn, None)
+    _prepared.pop(conn, None)
+    try:
+        pool.putconn(conn, close=True)
+    except psycopg2.pool.PoolError:
+        pass
+
+def _is_healthy(conn):
+    if conn.closed:
+        return False
+    idle = time.monotonic() - _last_used.get(conn, 0.0)
+    if idle < PG_HEALTHCHECK_INTERVAL:
+        return True
+    _count("health_checks")
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+@timed("db_connect")
+def _checkout(pool):
+    # One reconnect attempt: a stale or refused connection is closed and
+    # replaced with a fresh one before giving up.
+    for attempt in range(2):
+        try:
+            conn = pool.getconn()
+        except psycopg2.OperationalError:
+            if attempt:
+                raise
+            _count("reconnects")
+            continue
+        if _is_healthy(conn):
+            return conn
+        _discard(pool, conn)
+        _count("reconnects")
+    return pool.getconn()
+
+@contextmanager
+def get_connection():
+    pool = _get_pool()
+    start = time.monotonic()
+    if not _pool_slots.acquire(timeout=PG_POOL_TIMEOUT):
+        _count("timeouts")
+        raise psycopg2.pool.PoolError(f"Timed out after {PG_POOL_TIMEOUT}s waiting for a database connection")
+    waited = time.monotonic() - start
+    conn = None
+    try:
+        conn = _checkout(pool)
+        with _pool_lock:
+            _pool_stats["checkouts"] += 1
+            _pool_stats["wait_time_total"] += waited
+            _pool_stats["wait_time_max"] = max(_pool_stats["wait_time_max"], waited)
+        yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        if conn is not None:
+            _discard(pool, conn)
+            conn = None
+        raise
+    finally:
+        try:
+            if conn is not None:
+                _release(pool, conn)
+        finally:
+            _pool_slots.release()
+
+def _release(pool, conn):
+    # Back to the pool rolled back, or closed if it can't even roll back
+    if not conn.closed:
+        try:
+            if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+        except psycopg2.Error:
+            pass
+        else:
+            _last_used[conn] = time.monotonic()
+            pool.putconn(conn)
+            return
+    _discard(pool, conn)
+
+def pool_stats():
+    with _pool_lock:
+        stats = dict(_pool_stats)
+    if _pool is not None:
+        in_use = len(_pool._used)
+        idle = len(_pool._pool)
+        stats.update({"size": in_use + idle, "in_use": in_use, "idle": idle})
+    else:
+        stats.update({"size": 0, "in_use": 0, "idle": 0})
+    stats["max_size"] = PG_POOL_MAX
+    stats["wait_time_avg"] = stats["wait_time_total"] / stats["checkouts"] if stats["checkouts"] else 0.0
+    return stats
 
-    conn.commit()
-    cur.close()
-    conn.close()
+@atexit.register
+def close_pool():
+    global _pool
+    if _pool is not None and not _pool.closed:
+        _pool.closeall()
+    _pool = None
+    _last_used.clear()
+    _prepared.clear()
+
+# ---------------- QUERIES ----------------
+
+# Fields we expect to store
+METADATA_COLUMNS = [
+    "video_name", "title", "category", "tags", "summary",
+    "adult_content_presence", "adult_content_type", "is_real_estate_related",
+    "main_topic_category", "speaker_presence", "location", "speaker_gender",
+    "speaker_age_range", "speaker_accent", "speaker_race", "ai_voice_presence",
+    "ai_visuals_presence", "primary_language_spoken", "secondary_languages_spoken",
+    "voice_tone", "speech_speed", "clarity_of_speech", "narration_style",
+    "background_music_presence", "music_mood", "music_type", "volume_balance",
+    "property_type", "property_condition", "furnishing_level", "view_type",
+    "indoor_vs_outdoor_focus", "rooms_shown", "outdoor_amenities", "appliances_brands",
+    "category_of_brand", "indoor_amenities", "luxury_cues", "space_perception",
+    "mood_of_visuals", "aesthetic_style", "shot_type", "storytelling_style",
+    "focus_balance", "primary_intent", "secondary_intent", "emotional_appeal",
+    "urgency_cues", "event_driven", "if_event_yes_time", "investment_pitch_signals",
+    "call_to_action_presence", "call_to_action_type", "text_overlays", "logo_watermark",
+    "price_shown", "price", "offer_mentioned", "contact_info_shown",
+    "agent_branding_visible", "developer_branding_visible", "exclusivity_claim",
+    "hook_strength", "first_5s_focus", "subtitles_present", "subtitles_languages",
+    "activities_shown", "lifestyle_emphasis", "technical_glitches",
+    "qc_score", "qc_decision", "qc_reasons",
+    "uploaded_by", "created_at"
+]
+
+# Fields that should be stored as boolean
+BOOL_FIELDS = {
+    "adult_content_presence", "is_real_estate_related", "speaker_presence",
+    "ai_voice_presence", "ai_visuals_presence", "background_music_presence",
+    "event_driven", "call_to_action_presence", "logo_watermark",
+    "price_shown", "contact_info_shown", "agent_branding_visible",
+    "developer_branding_visible", "subtitles_present"
+}
+
+# Fields that should be stored as arrays/JSON
+ARRAY_FIELDS = {
+    "tags", "adult_content_type", "secondary_languages_spoken",
+    "outdoor_amenities", "subtitles_languages", "activities_shown",
+    "rooms_shown", "indoor_amenities", "shot_type", "luxury_cues", "text_overlays",
+    "appliances_brands"
+}
+
+@timed("db_insert")
+def save_embedding_pg(video_name: str, embedding, metadata: dict):
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                INSERT INTO video_embeddings (video_name, embedding, metadata)
+                VALUES (%s, %s, %s)
+            """, (video_name, embedding, json.dumps(metadata)))
+        conn.commit()
+
+def table_exists(cur, table_name):
+    # Optional tables (video_phashes, video_embedding_parts) are created by
+    # separate utils/schema.py actions and may not be there
+    cur.execute("SELECT to_regclass(%s) IS NOT NULL", (table_name,))
+    return cur.fetchone()[0]
 
 def get_existing_table_columns(cur, table_name="video_metadata"):
     cur.execute("""
@@ -26,140 +235,457 @@ def get_existing_table_columns(cur, table_name="video_metadata"):
     """, (table_name,))
     return [r[0].lower() for r in cur.fetchall()]
 
-def search_similar_videos(query_embedding: np.ndarray, top_k: int = 5):
-    conn = psycopg2.connect(**PG_CONN)
-    cur = conn.cursor()
+# Structured filters over the typed video_metadata columns, e.g.
+#   {"qc_decision": ["ACCEPT"], "subtitles_present": True,
+#    "location": {"contains": "dubai"}, "tags": {"any": ["villa", "pool"]},
+#    "created_at": {"since": datetime.date(2025, 1, 1)}}
+# Booleans compare with =, arrays take {"any": [...]} (&&) or {"all": [...]}
+# (@>) with a bare list meaning "any", created_at takes since/until, and other
+# columns take a value, a list of values, or {"contains": text}.
+def _filter_sql(filters):
+    clauses, params = [], []
+    for col, cond in (filters or {}).items():
+        if col not in METADATA_COLUMNS:
+            raise ValueError(f"Unknown filter column: {col!r}")
+        if cond is None or cond == [] or cond == {}:
+            continue
+        if col in BOOL_FIELDS:
+            clauses.append(f"m.{col} = %s")
+            params.append(bool(cond))
+        elif col in ARRAY_FIELDS:
+            mode, values = next(iter(cond.items())) if isinstance(cond, dict) else ("any", cond)
+            values = [values] if isinstance(values, str) else list(values)
+            if mode not in ("any", "all"):
+                raise ValueError(f"Unknown array filter for {col}: {mode!r}")
+            if not values:
+                continue
+            clauses.append(f"m.{col} {'@>' if mode == 'all' else '&&'} %s::text[]")
+            params.append(values)
+        elif col == "created_at":
+            if not isinstance(cond, dict) or set(cond) - {"since", "until"}:
+                raise ValueError(f"created_at filter must be a dict of 'since'/'until', got {cond!r}")
+            if cond.get("since"):
+                clauses.append("m.created_at >= %s")
+                params.append(cond["since"])
+            if cond.get("until"):
+                clauses.append("m.created_at < %s")
+                params.append(cond["until"])
+        elif isinstance(cond, dict) and "contains" in cond:
+            escaped = str(cond["contains"]).replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            clauses.append(f"m.{col} ILIKE %s")
+            params.append(f"%{escaped}%")
+        elif isinstance(cond, (list, tuple, set)):
+            clauses.append(f"m.{col} = ANY(%s)")
+            params.append(list(cond))
+        else:
+            clauses.append(f"m.{col} = %s")
+            params.append(cond)
+    return " AND ".join(clauses), params
+
+# `recall` trades latency for accuracy on the ANN index: "fast", "balanced"
+# or "accurate" (see RECALL_PRESETS in utils/schema.py). `filters` restricts
+# the candidates before the ANN ordering (see _filter_sql).
+@timed("db_search")
+def search_similar_videos(query_embedding: np.ndarray, top_k: int = 5, recall: str = "balanced", filters=None):
+    where_sql, filter_params = _filter_sql(filters)
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            apply_search_settings(cur, recall, filtered=bool(where_sql))
+            if not where_sql:
+                cur.execute(f"""
+                    SELECT video_name, metadata, {distance_sql()} AS distance
+                    FROM video_embeddings
+                    ORDER BY distance
+                    LIMIT %s;
+                """, (query_embedding, top_k))
+            else:
+                # Iterative index scans may return rows slightly out of order,
+                # hence the outer sort over the (small) LIMITed set.
+                cur.execute(f"""
+                    SELECT video_name, metadata, distance FROM (
+                        SELECT e.video_name, e.metadata, {distance_sql('e.embedding')} AS distance
+                        FROM video_embeddings e
+                        WHERE EXISTS (
+                            SELECT 1 FROM video_metadata m
+                            WHERE m.video_name = e.video_name AND {where_sql}
+                        )
+                        ORDER BY distance
+                        LIMIT %s
+                    ) hits
+                    ORDER BY distance;
+                """, (query_embedding, *filter_params, top_k))
+            results = cur.fetchall()
+    return results
+
+# search_similar_videos for many query vectors at once: each statement
+# unnests up to SEARCH_BATCH_SIZE vectors and runs the ANN lookup once per
+# vector through a LATERAL join, all on one connection. Returns one result
+# list per query, in input order ([] for a None query).
+@timed("db_search_batch")
+def search_similar_videos_batch(query_embeddings, top_k: int = 5, recall: str = "balanced", filters=None):
+    where_sql, filter_params = _filter_sql(filters)
+    filter_clause = (
+        f"WHERE EXISTS (SELECT 1 FROM video_metadata m WHERE m.video_name = e.video_name AND {where_sql})"
+        if where_sql else ""
+    )
+    query = f"""
+        SELECT q.ord, hit.video_name, hit.metadata, hit.distance
+        FROM unnest(%s::vector[]) WITH ORDINALITY AS q(embedding, ord)
+        CROSS JOIN LATERAL (
+            SELECT e.video_name, e.metadata, {distance_sql('e.embedding', 'q.embedding')} AS distance
+            FROM video_embeddings e
+            {filter_clause}
+            ORDER BY distance
+            LIMIT %s
+        ) hit
+        ORDER BY q.ord, hit.distance;
+    """
+    # A 2-D array would be adapted as one long vector, so pass rows one by one
+    pending = [
+        (i, np.asarray(e, dtype=np.float32).ravel())
+        for i, e in enumerate(query_embeddings) if e is not None
+    ]
+    results = [[] for _ in query_embeddings]
+    if not pending:
+        return results
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            apply_search_settings(cur, recall, filtered=bool(where_sql))
+            for start in range(0, len(pending), SEARCH_BATCH_SIZE):
+                chunk = pending[start:start + SEARCH_BATCH_SIZE]
+                cur.execute(query, ([e for _, e in chunk], *filter_params, top_k))
+                for ord_, video_name, metadata, distance in cur.fetchall():
+                    results[chunk[ord_ - 1][0]].append((video_name, metadata, distance))
+    return results
 
-    query_vector_str = "[" + ",".join(str(x) for x in query_embedding.tolist()) + "]"
+# Per-source score for weighted fusion, as a similarity (higher is better).
+# Gemini embeddings are unit length, so l2 maps onto cosine similarity.
+SIMILARITY_SQL = {
+    "l2": "1 - distance * distance / 2",
+    "cosine": "1 - distance",
+    "ip": "-distance",
+}
 
-    cur.execute(f"""
-        SELECT video_name, metadata, embedding <-> %s::vector AS distance
-        FROM video_embeddings
-        ORDER BY embedding <-> %s::vector
-        LIMIT %s;
-    """, (query_vector_str, query_vector_str, top_k))
+# Ranks videos by the summary vector and the named vectors in
+# video_embedding_parts together, in one statement. Each source takes its own
+# FUSION_CANDIDATES nearest neighbours (through its own ANN index); "rrf" sums
+# weight / (RRF_K + rank) per video, "weighted" sums weight * similarity.
+# Returns (video_name, metadata, score) rows, best first.
+@timed("db_search_fused")
+def search_fused(query_embedding: np.ndarray, top_k: int = 5, recall: str = "balanced", filters=None,
+                 method: str = FUSION_METHOD, weights=None):
+    if method not in ("rrf", "weighted"):
+        raise ValueError(f"Unknown fusion method: {method!r}")
+    weights = FUSION_WEIGHTS if weights is None else weights
+    where_sql, filter_params = _filter_sql(filters)
+    filter_clause = (
+        f"AND EXISTS (SELECT 1 FROM video_metadata m WHERE m.video_name = e.video_name AND {where_sql})"
+        if where_sql else ""
+    )
+    score_sql = "%s::float8 / (%s + rank)" if method == "rrf" else f"%s::float8 * ({SIMILARITY_SQL[PG_VECTOR_METRIC]})"
+    candidates = max(FUSION_CANDIDATES, int(top_k))
 
-    results = cur.fetchall()
-    cur.close()
-    conn.close()
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            # Without `utils.schema create-parts` only the summary branch runs
+            parts_ready = table_exists(cur, "video_embedding_parts")
+            branches, params = [], []
+            for kind, weight in weights.items():
+                if not weight:
+                    continue
+                if kind == "summary":
+                    source = "video_embeddings e WHERE TRUE"
+                elif kind in PART_KINDS:
+                    if not parts_ready:
+                        continue
+                    # Literal kind so the planner can use the partial index for it
+                    source = f"video_embedding_parts e WHERE e.kind = '{kind}'"
+                else:
+                    raise ValueError(f"Unknown embedding kind: {kind!r}")
+                branches.append(f"""
+                    SELECT video_name, max({score_sql}) AS score FROM (
+                        SELECT video_name, distance, row_number() OVER (ORDER BY distance) AS rank FROM (
+                            SELECT e.video_name, {distance_sql('e.embedding')} AS distance
+                            FROM {source} {filter_clause}
+                            ORDER BY distance
+                            LIMIT %s
+                        ) nearest
+                    ) ranked
+                    GROUP BY video_name""")
+                params += [weight, RRF_K] if method == "rrf" else [weight]
+                params += [query_embedding, *filter_params, candidates]
+            if not branches:
+                return []
+
+            apply_search_settings(cur, recall, (ANN_INDEX_NAME, *PART_INDEX_NAMES), filtered=bool(where_sql))
+            cur.execute(f"""
+                SELECT f.video_name, e.metadata, f.score FROM (
+                    SELECT video_name, sum(score) AS score
+                    FROM ({" UNION ALL ".join(branches)}) sources
+                    GROUP BY video_name
+                ) f
+                LEFT JOIN LATERAL (
+                    SELECT metadata FROM video_embeddings
+                    WHERE video_name = f.video_name
+                    LIMIT 1
+                ) e ON TRUE
+                ORDER BY f.score DESC
+                LIMIT %s;
+            """, (*params, top_k))
+            results = cur.fetchall()
     return results
 
-def save_metadata_pg(video_name: str, metadata: dict):
-    conn = psycopg2.connect(**PG_CONN)
-    cur = conn.cursor()
-
-    # Fields we expect to store
-    expected_columns = [
-        "video_name", "title", "category", "tags", "summary",
-        "adult_content_presence", "adult_content_type", "is_real_estate_related",
-        "main_topic_category", "speaker_presence", "location", "speaker_gender",
-        "speaker_age_range", "speaker_accent", "speaker_race", "ai_voice_presence",
-        "ai_visuals_presence", "primary_language_spoken", "secondary_languages_spoken",
-        "voice_tone", "speech_speed", "clarity_of_speech", "narration_style",
-        "background_music_presence", "music_mood", "music_type", "volume_balance",
-        "property_type", "property_condition", "furnishing_level", "view_type",
-        "indoor_vs_outdoor_focus", "rooms_shown", "outdoor_amenities", "appliances_brands",
-        "category_of_brand", "indoor_amenities", "luxury_cues", "space_perception",
-        "mood_of_visuals", "aesthetic_style", "shot_type", "storytelling_style",
-        "focus_balance", "primary_intent", "secondary_intent", "emotional_appeal",
-        "urgency_cues", "event_driven", "if_event_yes_time", "investment_pitch_signals",
-        "call_to_action_presence", "call_to_action_type", "text_overlays", "logo_watermark",
-        "price_shown", "price", "offer_mentioned", "contact_info_shown",
-        "agent_branding_visible", "developer_branding_visible", "exclusivity_claim",
-        "hook_strength", "first_5s_focus", "subtitles_present", "subtitles_languages",
-        "activities_shown", "lifestyle_emphasis", "technical_glitches",
-        "qc_score", "qc_decision", "qc_reasons",
-        "uploaded_by", "created_at"
-    ]
+# ---------------- METADATA WRITER ----------------
+# Per-column value conversion, picked once per column from its Postgres type
+# (falling back to BOOL_FIELDS/ARRAY_FIELDS when the type is unknown).
+def _to_bool(val):
+    if isinstance(val, str):
+        return val.strip().lower() == "yes"
+    return bool(val)
+
+def _to_list(val):
+    if val is None:
+        return []
+    if isinstance(val, str):
+        try:
+            parsed = json.loads(val)
+            return parsed if isinstance(parsed, list) else [parsed]
+        except:
+            return [v.strip() for v in val.split(",") if v.strip()]
+    if not isinstance(val, list):
+        return [val]
+    return val
 
-    # Fields that should be stored as boolean
-    bool_fields = {
-        "adult_content_presence", "is_real_estate_related", "speaker_presence",
-        "ai_voice_presence", "ai_visuals_presence", "background_music_presence",
-        "event_driven", "call_to_action_presence", "logo_watermark",
-        "price_shown", "contact_info_shown", "agent_branding_visible",
-        "developer_branding_visible", "subtitles_present"
-    }
-
-    # Fields that should be stored as arrays/JSON
-    array_fields = {
-        "tags", "adult_content_type", "secondary_languages_spoken",
-        "outdoor_amenities", "subtitles_languages", "activities_shown",
-        "rooms_shown", "indoor_amenities", "shot_type", "luxury_cues", "text_overlays",
-        "appliances_brands"
-    }
+def _to_number(cast):
+    def convert(val):
+        try:
+            return cast(val) if val is not None and val != "" else None
+        except (TypeError, ValueError):
+            return None
+    return convert
 
+def _to_json(val):
+    return json.dumps(val) if val is not None else None
+
+def _to_text(val):
+    # Nested JSON fields (like price) as a JSON string, lists (like qc_reasons) joined
+    if isinstance(val, dict):
+        return json.dumps(val)
+    if isinstance(val, list):
+        return "; ".join(str(v) for v in val)
+    return val
+
+def _created_at(video_name, metadata):
+    raw = metadata.get("created_at")
     try:
-        db_cols = get_existing_table_columns(cur)
-    except Exception as e:
-        cur.close()
-        conn.close()
-        print(f"Error reading DB schema: {e}")
-        return
+        return datetime.datetime.fromisoformat(raw) if raw else datetime.datetime.utcnow()
+    except:
+        return datetime.datetime.utcnow()
 
-    usable_columns = [c for c in expected_columns if c in db_cols]
-    if not usable_columns:
-        cur.close()
-        conn.close()
-        print("No matching columns in database.")
-        return
+def _column_converter(col, category=None, type_name=None):
+    # (video_name, metadata) -> value for one column
+    if col == "video_name":
+        return lambda video_name, metadata: video_name
+    if col == "uploaded_by":
+        return lambda video_name, metadata: metadata.get("uploaded_by", "Huzaifa")
+    if col == "created_at":
+        return _created_at
 
-    row = []
-    for col in usable_columns:
-        val = None
-        if col == "video_name":
-            val = video_name
-        elif col == "uploaded_by":
-            val = metadata.get("uploaded_by", "Huzaifa")
-        elif col == "created_at":
-            raw = metadata.get("created_at")
-            try:
-                val = datetime.datetime.fromisoformat(raw) if raw else datetime.datetime.utcnow()
-            except:
-                val = datetime.datetime.utcnow()
-        else:
-            val = metadata.get(col)
+    if category == "B" or (category is None and col in BOOL_FIELDS):
+        convert = _to_bool
+    elif category == "A" or (category is None and col in ARRAY_FIELDS):
+        convert = _to_list
+    elif category == "N":
+        convert = _to_number(int if type_name in ("smallint", "integer", "bigint") else float)
+    elif type_name in ("json", "jsonb"):
+        convert = _to_json
+    elif category is None and col not in ("price", "qc_reasons"):
+        convert = lambda val: val
+    else:
+        convert = _to_text
+    return lambda video_name, metadata: convert(metadata.get(col))
 
-        # Convert booleans
-        if col in bool_fields:
-            if isinstance(val, str):
-                val = val.strip().lower() == "yes"
-            else:
-                val = bool(val)
+def _metadata_row(usable_columns, video_name: str, metadata: dict, converters=None):
+    converters = converters or [_column_converter(col) for col in usable_columns]
+    return [convert(video_name, metadata) for convert in converters]
 
-        # Convert array fields to JSON arrays
-        if col in array_fields:
-            if val is None:
-                val = []
-            elif isinstance(val, str):
-                try:
-                    parsed = json.loads(val)
-                    val = parsed if isinstance(parsed, list) else [parsed]
-                except:
-                    val = [v.strip() for v in val.split(",") if v.strip()]
-            elif not isinstance(val, list):
-                val = [val]
+# video_metadata is introspected once per process into the usable columns,
+# their converters and the INSERT statement, which each pooled connection
+# PREPAREs on first use. An insert failing on a schema change, or
+# invalidate_metadata_writer() after DDL, rebuilds it on the next call.
+_writer = None
+_writer_version = 0
+_writer_lock = threading.Lock()
+# connection -> writer version prepared on that session. Keyed by the object:
+# a closed connection's id gets reused by a new session that prepared nothing.
+_prepared = weakref.WeakKeyDictionary()
 
-        # Convert nested JSON fields (like price) to JSON string
-        if col == "price" and isinstance(val, dict):
-            val = json.dumps(val)
+# Errors that mean the writer no longer matches the table (or the session lost
+# its prepared statement); anything else is a problem with the row itself
+SCHEMA_ERRORS = (
+    psycopg2.errors.UndefinedColumn, psycopg2.errors.UndefinedTable, psycopg2.errors.InvalidSqlStatementName,
+)
 
-        # Convert qc_reasons list to string
-        if col == "qc_reasons" and isinstance(val, list):
-            val = "; ".join(val)
+def invalidate_metadata_writer():
+    global _writer
+    with _writer_lock:
+        _writer = None
 
-        row.append(val)
+def _metadata_writer():
+    global _writer, _writer_version
+    writer = _writer
+    if writer is not None:
+        return writer
+    with _writer_lock:
+        if _writer is not None:
+            return _writer
+        with get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT a.attname, t.typcategory, format_type(a.atttypid, NULL)
+                    FROM pg_attribute a JOIN pg_type t ON t.oid = a.atttypid
+                    WHERE a.attrelid = 'video_metadata'::regclass AND a.attnum > 0 AND NOT a.attisdropped
+                """)
+                types = {name.lower(): (category, type_name) for name, category, type_name in cur.fetchall()}
+            conn.rollback()
+        columns = [c for c in METADATA_COLUMNS if c in types]
+        _writer_version += 1
+        _writer = {
+            "version": _writer_version,
+            "name": f"save_metadata_v{_writer_version}",
+            "columns": columns,
+            "types": {c: types[c] for c in columns},
+            "converters": [_column_converter(c, *types[c]) for c in columns],
+            "sql": f"INSERT INTO video_metadata ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})",
+            "prepare": f"INSERT INTO video_metadata ({', '.join(columns)}) "
+                       f"VALUES ({', '.join(f'${i}' for i in range(1, len(columns) + 1))})",
+            "execute": f"({', '.join(['%s'] * len(columns))})",
+        }
+        return _writer
 
-    placeholders = ", ".join(["%s"] * len(usable_columns))
-    query = f"INSERT INTO video_metadata ({', '.join(usable_columns)}) VALUES ({placeholders})"
+def _insert_metadata(cur, conn, writer, row):
+    if not PG_PREPARED_STATEMENTS:
+        cur.execute(writer["sql"], row)
+        return
+    prepared = _prepared.get(conn)
+    if prepared != writer["version"]:
+        if prepared is not None:
+            cur.execute(f"DEALLOCATE save_metadata_v{prepared}")
+        _prepared.pop(conn, None)
+        # PREPARE is session-level: it survives the surrounding transaction
+        cur.execute(f"PREPARE {writer['name']} AS {writer['prepare']}")
+        _prepared[conn] = writer["version"]
+    cur.execute(f"EXECUTE {writer['name']} {writer['execute']}", row)
 
+def _forget_prepared(cur, conn):
+    # Prepared statements outlive rollbacks, so the stale one is deallocated
+    # rather than left behind on the pooled session
+    prepared = _prepared.pop(conn, None)
+    if prepared is None:
+        return
     try:
-        cur.execute(query, row)
+        cur.execute(f"DEALLOCATE save_metadata_v{prepared}")
         conn.commit()
+    except psycopg2.Error:
+        conn.rollback()  # already gone with the session
+
+@timed("db_insert")
+def save_metadata_pg(video_name: str, metadata: dict):
+    # Raises if the row isn't stored. A schema change, or a session that lost
+    # its prepared statement, is retried once with a freshly built writer.
+    for attempt in range(2):
+        writer = _metadata_writer()
+        if not writer["columns"]:
+            raise RuntimeError("No matching columns in video_metadata")
+        row = _metadata_row(writer["columns"], video_name, metadata, writer["converters"])
+        with get_connection() as conn:
+            with conn.cursor() as cur:
+                try:
+                    _insert_metadata(cur, conn, writer, row)
+                    conn.commit()
+                except SCHEMA_ERRORS:
+                    conn.rollback()
+                    invalidate_metadata_writer()
+                    _forget_prepared(cur, conn)
+                    if attempt:
+                        raise
+                    continue
         print(f"✅ Metadata stored: {video_name}")
-    except Exception as e:
-        conn.rollback()
-        print(f"❌ Error storing metadata: {e}")
-    finally:
-        cur.close()
-        conn.close()
+        return
+
+# Store many (video_name, embedding, metadata) items in one transaction using
+# multi-row INSERTs. If the batch fails, rows are retried one by one under
+# savepoints so a single bad row doesn't abort the rest.
+# Returns {video_name: error} for every row that was not stored.
+@timed("db_bulk_insert")
+def save_videos_bulk(items):
+    failures = {}
+    writer = _metadata_writer()
+    usable_columns = writer["columns"]
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+
+            names, emb_rows, meta_rows = [], [], []
+            for video_name, embedding, metadata in items:
+                if embedding is None:
+                    failures[video_name] = "embedding issue"
+                    continue
+                try:
+                    emb_row = (video_name, np.asarray(embedding, dtype=np.float32), json.dumps(metadata))
+                    meta_row = _metadata_row(usable_columns, video_name, metadata, writer["converters"])
+                except Exception as e:
+                    failures[video_name] = str(e)
+                    continue
+                names.append(video_name)
+                emb_rows.append(emb_row)
+                meta_rows.append(meta_row)
+
+            if not names:
+                return failures
+
+            emb_query = "INSERT INTO video_embeddings (video_name, embedding, metadata) VALUES %s"
+            meta_query = f"INSERT INTO video_metadata ({', '.join(usable_columns)}) VALUES %s"
+
+            cur.execute("SAVEPOINT bulk_store")
+            try:
+                execute_values(cur, emb_query, emb_rows, page_size=BULK_PAGE_SIZE)
+                if usable_columns:
+                    execute_values(cur, meta_query, meta_rows, page_size=BULK_PAGE_SIZE)
+            except psycopg2.Error as e:
+                # Fall back to row-by-row so the offending rows can be reported
+                cur.execute("ROLLBACK TO SAVEPOINT bulk_store")
+                if isinstance(e, SCHEMA_ERRORS):
+                    invalidate_metadata_writer()
+                for video_name, emb_row, meta_row in zip(names, emb_rows, meta_rows):
+                    cur.execute("SAVEPOINT bulk_row")
+                    try:
+                        execute_values(cur, emb_query, [emb_row])
+                        if usable_columns:
+                            execute_values(cur, meta_query, [meta_row])
+                        cur.execute("RELEASE SAVEPOINT bulk_row")
+                    except psycopg2.Error as e:
+                        cur.execute("ROLLBACK TO SAVEPOINT bulk_row")
+                        failures[video_name] = str(e).strip()
+        conn.commit()
+    return failures
+
+# Named vectors from embed_videos(), as (video_name, kind, embedding) rows.
+# Storing a video again replaces its vectors.
+@timed("db_insert_parts")
+def save_embedding_parts(items):
+    rows = {}
+    for video_name, kind, embedding in items:
+        if embedding is None:
+            continue
+        if kind not in PART_KINDS:
+            raise ValueError(f"Unknown embedding kind: {kind!r}")
+        rows[(video_name, kind)] = (video_name, kind, np.asarray(embedding, dtype=np.float32))
+    if not rows:
+        return
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            execute_values(cur, """
+                INSERT INTO video_embedding_parts (video_name, kind, embedding) VALUES %s
+                ON CONFLICT (video_name, kind) DO UPDATE SET embedding = EXCLUDED.embedding
+            """, list(rows.values()), page_size=BULK_PAGE_SIZE)
+        conn.commit()
@@ -0,0 +1,181 @@
+import threading
+import cv2
+import numpy as np
+from psycopg2.extras import execute_values
+from utils.probe import iter_frames, phash
+from utils.metrics import timed
+from utils.config import DEDUP_SAMPLE_FPS, DEDUP_MAX_DISTANCE
+
+# ---------------- SIGNATURES ----------------
+def signature_from_hashes(frame_hashes):
+    # The video hash is the per-bit majority over sampled frame hashes, which
+    # survives re-encodes, small trims and overlays changing a few frames.
+    if not frame_hashes:
+        return None
+    bits = np.unpackbits(np.array(frame_hashes, dtype=">u8").view(np.uint8).reshape(-1, 8), axis=1)
+    majority = bits.sum(axis=0) * 2 >= len(frame_hashes)
+    return {
+        "phash": int(np.packbits(majority).view(">u8")[0]),
+        "frame_hashes": frame_hashes,
+    }
+
+@timed("signature")
+def video_signature(path, sample_fps=DEDUP_SAMPLE_FPS):
+    # For when the video isn't probed anyway; probe_video(..., phash_fps=...)
+    # collects the same frame hashes in its own pass
+    return signature_from_hashes([
+        phash(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)) for _, frame in iter_frames(path, sample_fps)
+    ])
+
+def hamming(a: int, b: int):
+    return bin(a ^ b).count("1")
+
+# Postgres bigint is signed; hashes are stored as two's complement
+def _to_signed(h: int):
+    return h - (1 << 64) if h >= (1 << 63) else h
+
+def _to_unsigned(h: int):
+    return h + (1 << 64) if h < 0 else h
+
+# ---------------- BK-TREE ----------------
+# Metric tree over Hamming distance: a query only descends into children whose
+# edge distance is within `max_distance` of its own distance to the node, so
+# lookups touch a small fraction of the stored hashes.
+class BKTree:
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def add(self, h: int, video_name: str):
+        self.size += 1
+        if self.root is None:
+            self.root = (h, [video_name], {})
+            return
+        node = self.root
+        while True:
+            d = hamming(h, node[0])
+            if d == 0:
+                node[1].append(video_name)
+                return
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = (h, [video_name], {})
+                return
+            node = child
+
+    def search(self, h: int, max_distance: int):
+        matches = []
+        stack = [self.root] if self.root else []
+        while stack:
+            node_hash, names, children = stack.pop()
+            d = hamming(h, node_hash)
+            if d <= max_distance:
+                matches.extend((name, d) for name in names)
+            for edge, child in children.items():
+                if d - max_distance <= edge <= d + max_distance:
+                    stack.append(child)
+        return sorted(matches, key=lambda m: m[1])
+
+# ---------------- STORAGE ----------------
+_index = None
+_index_names = set()
+_index_watermark = None  # newest video_phashes.created_at loaded so far
+_index_lock = threading.Lock()
+
+# created_at is the inserting transaction's start time, so a row can commit
+# after a newer one has already been read; each sync looks back this far
+SYNC_OVERLAP_SECONDS = 60
+
+def _sync_index():
+    # Loads video_phashes on first use, then adds the rows other processes
+    # (workers, other app instances) stored since the last lookup
+    global _index, _index_watermark
+    from utils.database import get_connection
+
+    with _index_lock:
+        tree = _index if _index is not None else BKTree()
+        with get_connection() as conn:
+            with conn.cursor() as cur:
+                if _index_watermark is None:  # first load, or nothing stored yet
+                    cur.execute("SELECT video_name, phash, created_at FROM video_phashes")
+                else:
+                    cur.execute("""
+                        SELECT video_name, phash, created_at FROM video_phashes
+                        WHERE created_at > %s - %s * interval '1 second'
+                    """, (_index_watermark, SYNC_OVERLAP_SECONDS))
+                for video_name, h, created_at in cur:
+                    if video_name not in _index_names:
+                        tree.add(_to_unsigned(h), video_name)
+                        _index_names.add(video_name)
+                    if _index_watermark is None or created_at > _index_watermark:
+                        _index_watermark = created_at
+            conn.rollback()
+        _index = tree
+    return _index
+
+def refresh_index():
+    # Drop the in-memory index; the next lookup reloads it from video_phashes
+    global _index, _index_watermark
+    with _index_lock:
+        _index = None
+        _index_watermark = None
+        _index_names.clear()
+
+@timed("dedup_lookup")
+def find_duplicates(signature, max_distance=DEDUP_MAX_DISTANCE):
+    if not signature:
+        return []
+    return _sync_index().search(signature["phash"], max_distance)
+
+@timed("db_insert_signatures")
+def save_signatures_pg(items):
+    # `items` is an iterable of (video_name, signature); rows without a
+    # signature are skipped. Stored hashes are added to the in-memory index.
+    from utils.database import get_connection
+
+    rows = [
+        (video_name, _to_signed(sig["phash"]), [_to_signed(h) for h in sig["frame_hashes"]])
+        for video_name, sig in items if sig
+    ]
+    if not rows:
+        return
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            execute_values(cur, """
+                INSERT INTO video_phashes (video_name, phash, frame_hashes) VALUES %s
+                ON CONFLICT (video_name) DO UPDATE
+                SET phash = EXCLUDED.phash, frame_hashes = EXCLUDED.frame_hashes
+            """, rows)
+        conn.commit()
+    with _index_lock:
+        if _index is not None:
+            for video_name, h, _ in rows:
+                if video_name not in _index_names:
+                    _index.add(_to_unsigned(h), video_name)
+                    _index_names.add(video_name)
+
+def collapse_duplicates(results, top_k, max_distance=DEDUP_MAX_DISTANCE):
+    # Keeps the best-ranked video of each near-duplicate group from
+    # search_similar_videos results (fetch more than top_k to leave room).
+    # Without the video_phashes table nothing is collapsed.
+    from utils.database import get_connection, table_exists
+
+    names = list({r[0] for r in results})
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            if not table_exists(cur, "video_phashes"):
+                return results[:int(top_k)]
+            cur.execute("SELECT video_name, phash FROM video_phashes WHERE video_name = ANY(%s)", (names,))
+            hashes = {name: _to_unsigned(h) for name, h in cur.fetchall()}
+
+    kept, kept_hashes = [], []
+    for row in results:
+        h = hashes.get(row[0])
+        if h is not None and any(hamming(h, other) <= max_distance for other in kept_hashes):
+            continue
+        kept.append(row)
+        if h is not None:
+            kept_hashes.append(h)
+        if len(kept) >= int(top_k):
+            break
+    return kept
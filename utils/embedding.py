@@ -1,14 +1,184 @@
-import requests
 import numpy as np
-from utils.config import GEMINI_EMBED_URL
+import threading
+import time
+from collections import OrderedDict
+from utils.cache import DiskCache
+from utils.gemini_client import gemini_post
+from utils.metrics import timed
+from utils.config import (
+    GEMINI_EMBED_URL, GEMINI_BATCH_EMBED_URL, EMBED_BATCH_SIZE, CACHE_PATH,
+    QUERY_CACHE_SIZE, QUERY_CACHE_TTL, QUERY_CACHE_PERSIST, QUERY_CACHE_MAX_MB
+)
 
+EMBED_MODEL = "models/gemini-embedding-001"
+
+# ---------------- QUERY CACHE ----------------
+_query_cache = OrderedDict()
+_query_cache_lock = threading.Lock()
+_query_cache_stats = {"hits": 0, "disk_hits": 0, "misses": 0, "expired": 0}
+_query_disk_cache = (
+    DiskCache(CACHE_PATH, "query_embedding_cache", int(QUERY_CACHE_MAX_MB * 1024 * 1024))
+    if QUERY_CACHE_PERSIST else None
+)
+
+@timed("embed")
 def get_gemini_embedding(text: str):
     payload = {
-        "model": "models/gemini-embedding-001",
+        "model": EMBED_MODEL,
         "content": {"parts": [{"text": text}]}
     }
-    resp = requests.post(GEMINI_EMBED_URL, json=payload)
+    resp = gemini_post("embed", GEMINI_EMBED_URL, json=payload)
     if resp.status_code != 200:
         return None
     data = resp.json()
     return np.array(data["embedding"]["values"], dtype=np.float32)
+
+@timed("embed_batch")
+def get_gemini_embeddings(texts, batch_size: int = EMBED_BATCH_SIZE):
+    # One batchEmbedContents call per chunk; a failed chunk yields None for
+    # each of its texts so callers can report them individually.
+    texts = list(texts)
+    embeddings = []
+    for start in range(0, len(texts), batch_size):
+        chunk = texts[start:start + batch_size]
+        payload = {
+            "requests": [
+                {"model": EMBED_MODEL, "content": {"parts": [{"text": t}]}}
+                for t in chunk
+            ]
+        }
+        resp = gemini_post("embed", GEMINI_BATCH_EMBED_URL, json=payload)
+        if resp.status_code != 200:
+            embeddings.extend([None] * len(chunk))
+            continue
+        values = [e["values"] for e in resp.json()["embeddings"]]
+        matrix = np.array(values, dtype=np.float32)
+        embeddings.extend(matrix)
+    return embeddings
+
+# ---------------- MULTI-VECTOR ----------------
+# Fields behind each named vector in video_embedding_parts; the summary vector
+# stays in video_embeddings. Keys must match PART_KINDS in utils/schema.py.
+PART_FIELDS = {
+    "tags": [
+        "title", "tags", "property_type", "view_type", "location", "rooms_shown",
+        "indoor_amenities", "outdoor_amenities", "luxury_cues", "activities_shown",
+        "lifestyle_emphasis",
+    ],
+    "transcript": ["transcript"],
+}
+
+def _field_text(value):
+    if isinstance(value, list):
+        return ", ".join(str(v).strip() for v in value if v)
+    if isinstance(value, (str, int, float)):
+        return str(value).strip()
+    return ""
+
+def embedding_texts(video_name, metadata):
+    texts = {"summary": metadata.get("summary", video_name)}
+    for kind, fields in PART_FIELDS.items():
+        text = "\n".join(filter(None, (_field_text(metadata.get(f)) for f in fields)))
+        if text:
+            texts[kind] = text
+    return texts
+
+def embed_videos(items, batch_size: int = EMBED_BATCH_SIZE):
+    # [{kind: embedding}] for (video_name, metadata) items; every text of
+    # every video goes through the same batched calls
+    texts = [embedding_texts(video_name, metadata) for video_name, metadata in items]
+    flat = [(i, kind, text) for i, video_texts in enumerate(texts) for kind, text in video_texts.items()]
+    vectors = get_gemini_embeddings([text for _, _, text in flat], batch_size)
+    embeddings = [{} for _ in texts]
+    for (i, kind, _), vector in zip(flat, vectors):
+        embeddings[i][kind] = vector
+    return embeddings
+
+def _query_cache_key(query: str):
+    return f"{EMBED_MODEL}:{' '.join(query.lower().split())}"
+
+def _remember_query(key, embedding, stored_at):
+    with _query_cache_lock:
+        _query_cache[key] = (stored_at, embedding)
+        _query_cache.move_to_end(key)
+        while len(_query_cache) > QUERY_CACHE_SIZE:
+            _query_cache.popitem(last=False)
+
+def _cached_query(key, now):
+    with _query_cache_lock:
+        entry = _query_cache.get(key)
+        if entry is not None:
+            if now - entry[0] < QUERY_CACHE_TTL:
+                _query_cache.move_to_end(key)
+                _query_cache_stats["hits"] += 1
+                return entry[1]
+            del _query_cache[key]
+            _query_cache_stats["expired"] += 1
+
+    if _query_disk_cache is not None:
+        stored = _query_disk_cache.get(key)
+        if stored is not None and now - stored["stored_at"] < QUERY_CACHE_TTL:
+            embedding = np.array(stored["values"], dtype=np.float32)
+            _remember_query(key, embedding, stored["stored_at"])
+            with _query_cache_lock:
+                _query_cache_stats["disk_hits"] += 1
+            return embedding
+
+    with _query_cache_lock:
+        _query_cache_stats["misses"] += 1
+    return None
+
+def _store_query(key, embedding, now):
+    embedding.setflags(write=False)
+    _remember_query(key, embedding, now)
+    if _query_disk_cache is not None:
+        _query_disk_cache.set(key, {"stored_at": now, "values": embedding.tolist()})
+
+def get_query_embedding(query: str):
+    # Same as get_gemini_embedding, but repeated queries (case and whitespace
+    # insensitive) are served from memory, then from disk if persistence is on.
+    key = _query_cache_key(query)
+    now = time.time()
+    embedding = _cached_query(key, now)
+    if embedding is not None:
+        return embedding
+
+    embedding = get_gemini_embedding(query)
+    if embedding is not None:
+        _store_query(key, embedding, now)
+    return embedding
+
+def get_query_embeddings(queries):
+    # get_query_embedding for many queries: cache misses (each distinct query
+    # once) go out in batchEmbedContents calls. None where embedding failed.
+    now = time.time()
+    keys = [_query_cache_key(q) for q in queries]
+    found, missing = {}, {}
+    for key, query in zip(keys, queries):
+        if key in found or key in missing:
+            continue
+        embedding = _cached_query(key, now)
+        if embedding is not None:
+            found[key] = embedding
+        else:
+            missing[key] = query
+    for key, embedding in zip(missing, get_gemini_embeddings(missing.values())):
+        if embedding is not None:
+            _store_query(key, embedding, now)
+        found[key] = embedding
+    return [found[key] for key in keys]
+
+def query_cache_stats():
+    with _query_cache_lock:
+        stats = dict(_query_cache_stats)
+        stats["size"] = len(_query_cache)
+    stats["max_size"] = QUERY_CACHE_SIZE
+    lookups = stats["hits"] + stats["disk_hits"] + stats["misses"]
+    stats["hit_rate"] = (stats["hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+    return stats
+
+def clear_query_cache():
+    with _query_cache_lock:
+        _query_cache.clear()
+    if _query_disk_cache is not None:
+        _query_disk_cache.clear()
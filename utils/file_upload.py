@@ -0,0 +1,71 @@
+import os
+import time
+from utils.gemini_client import gemini_post, gemini_request
+from utils.metrics import timed, record_bytes
+from utils.config import (
+    API_KEY, GEMINI_UPLOAD_URL, GEMINI_FILES_URL, UPLOAD_CHUNK_SIZE, FILE_PROCESSING_TIMEOUT
+)
+
+# Streams a local file to the Gemini File API using the resumable upload
+# protocol, one UPLOAD_CHUNK_SIZE chunk in memory at a time.
+@timed("file_upload")
+def upload_video_file(path, mime_type="video/mp4", display_name=None):
+    size = os.path.getsize(path)
+    record_bytes("file_upload", size)
+    start = gemini_post(
+        "files",
+        GEMINI_UPLOAD_URL,
+        headers={
+            "X-Goog-Upload-Protocol": "resumable",
+            "X-Goog-Upload-Command": "start",
+            "X-Goog-Upload-Header-Content-Length": str(size),
+            "X-Goog-Upload-Header-Content-Type": mime_type,
+        },
+        json={"file": {"display_name": display_name or os.path.basename(path)}},
+    )
+    upload_url = start.headers.get("X-Goog-Upload-URL")
+    if start.status_code != 200 or not upload_url:
+        raise RuntimeError(f"File upload could not start: {start.text}")
+
+    offset = 0
+    resp = None
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(UPLOAD_CHUNK_SIZE)
+            last = offset + len(chunk) >= size
+            resp = gemini_post(
+                "files",
+                upload_url,
+                headers={
+                    "X-Goog-Upload-Command": "upload, finalize" if last else "upload",
+                    "X-Goog-Upload-Offset": str(offset),
+                },
+                data=chunk,
+            )
+            if resp.status_code != 200:
+                raise RuntimeError(f"File upload failed at byte {offset}: {resp.text}")
+            offset += len(chunk)
+            if last:
+                break
+
+    return wait_for_file(resp.json()["file"])
+
+@timed("file_processing")
+def wait_for_file(file):
+    # Videos are transcoded server side before they can be referenced
+    deadline = time.monotonic() + FILE_PROCESSING_TIMEOUT
+    while file.get("state") == "PROCESSING":
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"Timed out waiting for {file['name']} to be processed")
+        time.sleep(2)
+        resp = gemini_request("files", "GET", f"{GEMINI_FILES_URL}/{file['name']}", params={"key": API_KEY})
+        if resp.status_code != 200:
+            raise RuntimeError(f"Could not check upload status: {resp.text}")
+        file = resp.json()
+    if file.get("state") == "FAILED":
+        raise RuntimeError(f"Gemini could not process {file['name']}: {file.get('error')}")
+    return file
+
+@timed("file_delete")
+def delete_file(name):
+    gemini_request("files", "DELETE", f"{GEMINI_FILES_URL}/{name}", params={"key": API_KEY})
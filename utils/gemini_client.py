@@ -0,0 +1,168 @@
+import random
+import re
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from utils.metrics import timed, count
+from utils.config import (
+    GEMINI_POOL_SIZE, GEMINI_RPM_GENERATE, GEMINI_RPM_EMBED, GEMINI_RPM_FILES,
+    GEMINI_CONNECT_TIMEOUT, GEMINI_READ_TIMEOUT, GEMINI_MAX_RETRIES,
+    GEMINI_BACKOFF_BASE, GEMINI_BACKOFF_MAX, GEMINI_BREAKER_THRESHOLD, GEMINI_BREAKER_COOLDOWN
+)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class GeminiUnavailableError(RuntimeError):
+    pass
+
+# Token bucket whose refill rate adapts to throttling: it halves on every 429
+# and creeps back towards the configured ceiling on each success (AIMD).
+class TokenBucket:
+    def __init__(self, per_minute: float):
+        self.max_rate = per_minute / 60.0
+        self.rate = self.max_rate
+        self.capacity = max(1.0, self.max_rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def throttled(self):
+        with self.lock:
+            self.rate = max(self.max_rate / 64, self.rate / 2)
+            self.tokens = min(self.tokens, 0)
+
+    def succeeded(self):
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+class CircuitBreaker:
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            # Half-open: after the cooldown, let a trial request through
+            if time.monotonic() - self.opened_at >= self.cooldown:
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record(self, ok: bool):
+        with self.lock:
+            if ok:
+                self.failures = 0
+                self.opened_at = None
+            else:
+                self.failures += 1
+                if self.failures >= self.threshold:
+                    self.opened_at = time.monotonic()
+
+_session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=GEMINI_POOL_SIZE, pool_maxsize=GEMINI_POOL_SIZE)
+_session.mount("https://", _adapter)
+_session.mount("http://", _adapter)
+
+_buckets = {
+    "generate": TokenBucket(GEMINI_RPM_GENERATE),
+    "embed": TokenBucket(GEMINI_RPM_EMBED),
+    "files": TokenBucket(GEMINI_RPM_FILES),
+}
+_breakers = {name: CircuitBreaker(GEMINI_BREAKER_THRESHOLD, GEMINI_BREAKER_COOLDOWN) for name in _buckets}
+_stats = {name: {"requests": 0, "retries": 0, "throttled": 0, "failures": 0, "rejected": 0} for name in _buckets}
+_stats_lock = threading.Lock()
+
+def _count(endpoint, key):
+    with _stats_lock:
+        _stats[endpoint][key] += 1
+    count("qc_gemini_requests_total", endpoint=endpoint, outcome=key)
+
+def _retry_delay(resp, attempt):
+    if resp is not None:
+        retry_after = resp.headers.get("Retry-After")
+        if retry_after:
+            try:
+                return min(GEMINI_BACKOFF_MAX, float(retry_after))
+            except ValueError:
+                pass
+        # Gemini puts the server-suggested delay in the error body as well
+        match = re.search(r'"retryDelay":\s*"(\d+(?:\.\d+)?)s"', resp.text or "")
+        if match:
+            return min(GEMINI_BACKOFF_MAX, float(match.group(1)))
+    backoff = min(GEMINI_BACKOFF_MAX, GEMINI_BACKOFF_BASE * 2 ** attempt)
+    return random.uniform(backoff / 2, backoff)
+
+def gemini_request(endpoint: str, method: str, url: str, **kwargs):
+    # Rate limited, retried request against one of the Gemini endpoints
+    # ("generate", "embed" or "files"). Returns the final response, which may
+    # still be an error once retries are used up; raises GeminiUnavailableError
+    # while the endpoint's circuit breaker is open.
+    with timed(f"gemini_{endpoint}"):
+        return _gemini_request(endpoint, method, url, **kwargs)
+
+def _gemini_request(endpoint, method, url, **kwargs):
+    bucket = _buckets[endpoint]
+    breaker = _breakers[endpoint]
+    kwargs.setdefault("timeout", (GEMINI_CONNECT_TIMEOUT, GEMINI_READ_TIMEOUT))
+
+    if not breaker.allow():
+        _count(endpoint, "rejected")
+        raise GeminiUnavailableError(f"Gemini {endpoint} endpoint is unavailable; retrying after cooldown")
+
+    resp = None
+    for attempt in range(GEMINI_MAX_RETRIES + 1):
+        if attempt:
+            _count(endpoint, "retries")
+            time.sleep(_retry_delay(resp, attempt - 1))
+        bucket.acquire()
+        _count(endpoint, "requests")
+        try:
+            resp = _session.request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            resp = None
+            error = e
+            continue
+        if resp.status_code == 429:
+            _count(endpoint, "throttled")
+            bucket.throttled()
+            continue
+        if resp.status_code in RETRY_STATUSES:
+            continue
+        bucket.succeeded()
+        breaker.record(True)
+        return resp
+
+    _count(endpoint, "failures")
+    breaker.record(False)
+    if resp is None:
+        raise GeminiUnavailableError(f"Gemini {endpoint} request failed: {error}")
+    return resp
+
+def gemini_post(endpoint: str, url: str, **kwargs):
+    return gemini_request(endpoint, "POST", url, **kwargs)
+
+def gemini_stats():
+    with _stats_lock:
+        stats = {name: dict(values) for name, values in _stats.items()}
+    for name, values in stats.items():
+        values["rate_per_minute"] = round(_buckets[name].rate * 60, 1)
+        values["circuit_open"] = _breakers[name].opened_at is not None
+    return stats
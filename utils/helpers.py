@@ -1,10 +1,23 @@
 import base64
+import hashlib
 import json
 import re
+from utils.metrics import timed, record_bytes
 
+@timed("base64_encode")
 def video_to_base64(path):
     with open(path, "rb") as f:
-        return base64.b64encode(f.read()).decode("utf-8")
+        data = f.read()
+    record_bytes("inline_video", len(data))
+    return base64.b64encode(data).decode("utf-8")
+
+@timed("file_hash")
+def file_sha256(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
 
 def normalize_keys(metadata):
     new_meta = {}
@@ -13,6 +26,7 @@ def normalize_keys(metadata):
         new_meta[new_key] = v
     return new_meta
 
+@timed("parse_response")
 def parse_gemini_response(text: str, video_name: str):
     try:
         return json.loads(text)
@@ -23,4 +37,107 @@ def parse_gemini_response(text: str, video_name: str):
                 return json.loads(match.group(0))
             except:
                 pass
+    # Salvage the well-formed fields of a truncated or commented object
+    members = dict(IncrementalJSONObject().feed(text))
+    if members:
+        members["parse_salvaged"] = True
+        return members
     return {"title": video_name, "summary": text.strip()[:500]}
+
+_JSON_SPECIAL = re.compile(r'[\\"{}\[\],/]')
+
+class IncrementalJSONObject:
+    # Parses one JSON object fed in arbitrary text chunks (a streamed model
+    # response, possibly wrapped in a ```json fence) and returns each
+    # top-level (key, value) as soon as the member is complete. Only the
+    # structural characters are looked at; member text is parsed with
+    # json.loads. // comments the model copies from the prompt are dropped,
+    # members that still don't parse are skipped.
+    def __init__(self):
+        self.started = False
+        self.done = False
+        self.depth = 0
+        self.in_string = False
+        self.in_comment = False
+        self.carry = ""  # a trailing "\\" or "/" that needs the next character
+        self.member = []
+
+    def feed(self, text):
+        members = []
+        if self.done:
+            return members
+        text, self.carry = self.carry + text, ""
+        pos = 0
+        if not self.started:
+            pos = text.find("{")
+            if pos < 0:
+                return members
+            self.started, self.depth, pos = True, 1, pos + 1
+        segment_start = pos
+        while True:
+            if self.in_comment:
+                end = text.find("\n", pos)
+                if end < 0:
+                    return members
+                self.in_comment = False
+                pos = segment_start = end
+            match = _JSON_SPECIAL.search(text, pos)
+            if match is None:
+                break
+            i = match.start()
+            ch = text[i]
+            pos = i + 1
+            if ch in "\\/" and pos == len(text) and (self.in_string or ch == "/"):
+                self.member.append(text[segment_start:i])
+                self.carry = ch
+                return members
+            if self.in_string:
+                if ch == "\\":
+                    pos = i + 2
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch == "/":
+                if text.startswith("//", i):
+                    self.member.append(text[segment_start:i])
+                    self.in_comment = True
+            elif ch in "{[":
+                self.depth += 1
+            elif ch in "}]":
+                self.depth -= 1
+                if self.depth == 0:
+                    self.member.append(text[segment_start:i])
+                    members.extend(self._finish_member())
+                    self.done = True
+                    return members
+            elif ch == "," and self.depth == 1:
+                self.member.append(text[segment_start:i])
+                members.extend(self._finish_member())
+                segment_start = pos
+        self.member.append(text[segment_start:])
+        return members
+
+    def _finish_member(self):
+        source = "".join(self.member).strip()
+        self.member = []
+        if not source:
+            return []
+        try:
+            return list(json.loads("{" + source + "}").items())
+        except ValueError:
+            return []
+
+def iter_sse_text(resp, usage=None):
+    # Text deltas of a streamGenerateContent?alt=sse response. If `usage` is
+    # a dict it receives the last usageMetadata seen.
+    for line in resp.iter_lines(decode_unicode=True):
+        if not line or not line.startswith("data:"):
+            continue
+        event = json.loads(line[len("data:"):])
+        if usage is not None and "usageMetadata" in event:
+            usage.update(event["usageMetadata"])
+        for candidate in event.get("candidates", [])[:1]:
+            for part in candidate.get("content", {}).get("parts", []):
+                if "text" in part:
+                    yield part["text"]
@@ -0,0 +1,244 @@
+import json
+import os
+import shutil
+import socket
+import threading
+import uuid
+import numpy as np
+from psycopg2.extras import RealDictCursor, execute_values
+from utils.database import get_connection, save_videos_bulk, save_embedding_parts
+from utils.pipeline import analyze_video
+from utils.qc import qc_score
+from utils.embedding import embed_videos
+from utils.dedup import save_signatures_pg
+from utils.metrics import timed, count
+from utils.config import (
+    JOB_STORAGE_DIR, JOB_LEASE_SECONDS, JOB_MAX_ATTEMPTS, JOB_RETRY_BACKOFF
+)
+
+# Durable work queue in Postgres (table from `python -m utils.schema create-jobs`).
+# Workers lease jobs with FOR UPDATE SKIP LOCKED, so any number of them on any
+# number of nodes can drain the queue without handing out the same job twice.
+# A lease that is not renewed within JOB_LEASE_SECONDS (the worker died) makes
+# the job visible again. Progress is committed after every stage, so a retry
+# resumes at the stage that failed.
+
+STAGES = ["uploaded", "analyzed", "scored", "embedded", "stored"]
+TERMINAL_STAGES = ("stored", "duplicate", "failed")
+
+def worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+# ---------------- PRODUCER ----------------
+def enqueue_videos(videos, batch_id=None):
+    # `videos` is an iterable of (video_name, file object or path). Files are
+    # copied into JOB_STORAGE_DIR first, so they outlive the uploading session.
+    batch_id = batch_id or uuid.uuid4().hex
+    os.makedirs(JOB_STORAGE_DIR, exist_ok=True)
+    rows = []
+    for video_name, source in videos:
+        path = os.path.abspath(os.path.join(JOB_STORAGE_DIR, f"{uuid.uuid4().hex}{os.path.splitext(video_name)[1] or '.mp4'}"))
+        if isinstance(source, str):
+            shutil.copyfile(source, path)
+        else:
+            with open(path, "wb") as f:
+                shutil.copyfileobj(source, f)
+        rows.append((batch_id, video_name, path, JOB_MAX_ATTEMPTS))
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            execute_values(cur, """
+                INSERT INTO video_jobs (batch_id, video_name, video_path, max_attempts) VALUES %s
+            """, rows)
+        conn.commit()
+    return batch_id
+
+def job_status(batch_id=None, limit=100):
+    # Latest jobs (of one batch, if given) for the UI to poll
+    with get_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(f"""
+                SELECT id, batch_id, video_name, stage, attempts, last_error,
+                       metadata->>'qc_score' AS qc_score, metadata->>'qc_decision' AS qc_decision,
+                       metadata->'qc_reasons' AS qc_reasons, created_at, updated_at
+                FROM video_jobs
+                {"WHERE batch_id = %s" if batch_id else ""}
+                ORDER BY id DESC
+                LIMIT %s
+            """, (batch_id, limit) if batch_id else (limit,))
+            return cur.fetchall()
+
+def queue_stats():
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT stage, count(*), count(*) FILTER (WHERE lease_expires_at > now())
+                FROM video_jobs GROUP BY stage
+            """)
+            return {stage: {"jobs": total, "leased": leased} for stage, total, leased in cur.fetchall()}
+
+# ---------------- LEASES ----------------
+@timed("job_claim")
+def claim_jobs(worker, limit=1):
+    with get_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            # Jobs whose last lease ran out on their final attempt won't be retried
+            cur.execute("""
+                UPDATE video_jobs
+                SET stage = 'failed', leased_by = NULL, lease_expires_at = NULL, updated_at = now(),
+                    last_error = coalesce(last_error, 'Lease expired') || ' (gave up after ' || attempts || ' attempts)'
+                WHERE stage NOT IN %s AND lease_expires_at < now() AND attempts >= max_attempts
+            """, (TERMINAL_STAGES,))
+            cur.execute("""
+                UPDATE video_jobs
+                SET leased_by = %s, lease_expires_at = now() + %s * interval '1 second',
+                    attempts = attempts + 1, updated_at = now()
+                WHERE id IN (
+                    SELECT id FROM video_jobs
+                    WHERE stage NOT IN %s
+                      AND run_after <= now()
+                      AND (lease_expires_at IS NULL OR lease_expires_at < now())
+                      AND attempts < max_attempts
+                    ORDER BY run_after, id
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING *
+            """, (worker, JOB_LEASE_SECONDS, TERMINAL_STAGES, limit))
+            jobs = cur.fetchall()
+        conn.commit()
+    return jobs
+
+def _update_leased(job, worker, assignments, params=()):
+    # Only the current lease holder may move a job; returns False if the lease
+    # was lost (expired and taken by another worker)
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(f"""
+                UPDATE video_jobs SET {assignments}, updated_at = now()
+                WHERE id = %s AND leased_by = %s
+            """, (*params, job["id"], worker))
+            updated = cur.rowcount == 1
+        conn.commit()
+    return updated
+
+def advance(job, worker, stage, metadata=None, embeddings=None):
+    # Commits a finished stage and renews the lease. Attempts count per stage:
+    # the next stage starts on its first attempt under the same lease.
+    done = stage in TERMINAL_STAGES
+    ok = _update_leased(job, worker, """
+        stage = %s, metadata = coalesce(%s::jsonb, metadata), embeddings = %s::jsonb,
+        attempts = CASE WHEN %s THEN attempts ELSE 1 END, last_error = NULL,
+        leased_by = CASE WHEN %s THEN NULL ELSE leased_by END,
+        lease_expires_at = CASE WHEN %s THEN NULL ELSE now() + %s * interval '1 second' END
+    """, (
+        stage, json.dumps(metadata) if metadata is not None else None,
+        json.dumps(embeddings) if embeddings is not None else None,
+        done, done, done, JOB_LEASE_SECONDS,
+    ))
+    if ok:
+        job.update({"stage": stage, "embeddings": embeddings, "attempts": job["attempts"] if done else 1})
+        if metadata is not None:
+            job["metadata"] = metadata
+    return ok
+
+def renew_lease(job, worker):
+    # Heartbeat while a long stage runs, so the job isn't handed to another
+    # worker mid-stage
+    return _update_leased(job, worker, """
+        lease_expires_at = now() + %s * interval '1 second'
+    """, (JOB_LEASE_SECONDS,))
+
+def fail(job, worker, error):
+    # Retries with exponential backoff until max_attempts, then gives up
+    final = job["attempts"] >= job["max_attempts"]
+    delay = JOB_RETRY_BACKOFF * 2 ** (job["attempts"] - 1)
+    return _update_leased(job, worker, """
+        stage = CASE WHEN %s THEN 'failed' ELSE stage END, last_error = %s,
+        run_after = now() + %s * interval '1 second', leased_by = NULL, lease_expires_at = NULL
+    """, (final, str(error)[:2000], delay))
+
+def release(job, worker):
+    # Hands an unfinished job back without using up an attempt (worker shutdown)
+    return _update_leased(job, worker, """
+        attempts = greatest(attempts - 1, 0), leased_by = NULL, lease_expires_at = NULL
+    """)
+
+# ---------------- STAGES ----------------
+class LeaseLost(Exception):
+    pass
+
+def _analyze(job):
+    metadata = analyze_video(job["video_path"], job["video_name"], score=False)
+    # Extraction errors come back as placeholder metadata; fail the stage so
+    # it is retried with backoff instead of being scored and stored
+    if "error" in metadata:
+        raise RuntimeError(metadata["error"].get("message", "Metadata extraction failed"))
+    return ("duplicate" if metadata.get("qc_decision") == "DUPLICATE" else "analyzed"), metadata, None
+
+def _score(job):
+    metadata = dict(job["metadata"])
+    if "qc_decision" not in metadata:  # pre-QC rejects arrive already decided
+        metadata.update(qc_score(metadata))
+    return "scored", metadata, None
+
+def _embed(job):
+    embeddings = embed_videos([(job["video_name"], job["metadata"])])[0]
+    if embeddings.get("summary") is None:
+        raise RuntimeError("Embedding failed")
+    return "embedded", None, {kind: np.asarray(v).tolist() for kind, v in embeddings.items() if v is not None}
+
+def _already_stored(job):
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT 1 FROM video_embeddings
+                WHERE video_name = %s AND metadata->>'job_id' = %s
+                LIMIT 1
+            """, (job["video_name"], str(job["id"])))
+            return cur.fetchone() is not None
+
+def _store(job):
+    name, embeddings = job["video_name"], job["embeddings"]
+    metadata = {**job["metadata"], "job_id": job["id"]}
+    # A worker that died between storing and recording it must not store twice
+    if not _already_stored(job):
+        failures = save_videos_bulk([(name, embeddings["summary"], metadata)])
+        if failures:
+            raise RuntimeError(failures[name])
+    save_embedding_parts((name, kind, v) for kind, v in embeddings.items() if kind != "summary")
+    save_signatures_pg([(name, metadata.get("video_signature"))])
+    return "stored", None, None
+
+STAGE_HANDLERS = {
+    "uploaded": _analyze,
+    "analyzed": _score,
+    "scored": _embed,
+    "embedded": _store,
+}
+
+def process_job(job, worker, stop=None):
+    # Runs the remaining stages of a leased job and returns the stage it ended
+    # at. If `stop` (a threading.Event) is set, the job is handed back after
+    # the stage in progress.
+    try:
+        while job["stage"] not in TERMINAL_STAGES:
+            if stop is not None and stop.is_set():
+                release(job, worker)
+                return job["stage"]
+            stage, metadata, embeddings = STAGE_HANDLERS[job["stage"]](job)
+            if not advance(job, worker, stage, metadata, embeddings):
+                raise LeaseLost(f"Lease on job {job['id']} was lost")
+    except LeaseLost:
+        raise
+    except Exception as e:
+        count("qc_job_failures_total", stage=job["stage"])
+        print(f"❌ Job {job['id']} ({job['video_name']}) failed at {job['stage']}: {e}")
+        fail(job, worker, f"{job['stage']}: {e}")
+        return job["stage"]
+
+    if job["stage"] in ("stored", "duplicate"):
+        try:
+            os.remove(job["video_path"])
+        except OSError:
+            pass
+    return job["stage"]
@@ -0,0 +1,424 @@
+import argparse
+import json
+import os
+import shutil
+import threading
+import time
+import numpy as np
+from utils.metrics import timed, count
+from utils.config import (
+    PG_VECTOR_METRIC, MEMORY_INDEX_ENABLED, MEMORY_INDEX_QUANTIZATION, MEMORY_INDEX_SNAPSHOT,
+    MEMORY_INDEX_SYNC_SECONDS, MEMORY_INDEX_CHUNK_ROWS, MEMORY_INDEX_RESCORE
+)
+
+# In-process exact search over video_embeddings, as an alternative to the
+# pgvector ANN index when the corpus fits in RAM. Rows live in a few
+# contiguous matrices ("segments"): the first one is the full load or a
+# memory-mapped snapshot, later ones hold rows inserted since, and are merged
+# once there are too many. Queries are one matrix multiply per chunk of rows
+# plus argpartition, and return the same (video_name, metadata, distance)
+# rows as search_similar_videos.
+#
+# Quantization trades memory for accuracy:
+#   float32  exact, 4 bytes per dimension
+#   int8     per-row scaled codes, 1 byte per dimension
+#   binary   sign bits (1/8 byte per dimension) pick MEMORY_INDEX_RESCORE x
+#            top_k candidates by Hamming distance, rescored with the int8 codes
+#
+# video_embeddings is append-only in this app, so syncing only fetches rows
+# with a higher id (the column from `python -m utils.schema create-ids`);
+# call reload() after deleting or rewriting rows.
+#
+# Only the summary vectors are indexed: search_videos serves the "Summary
+# only" ranking, while search_fused (tags/transcript from
+# video_embedding_parts) always runs on pgvector.
+
+QUANTIZATIONS = ("float32", "int8", "binary")
+LOAD_CHUNK = 5000
+MAX_SEGMENTS = 8
+SNAPSHOT_ARRAYS = ("data", "scales", "norms", "bits")
+
+# Set bits per byte value, for Hamming distances over packed bits
+_POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint16)
+
+# ---------------- SEGMENTS ----------------
+def _quantize(vectors, quantization):
+    # {"data", "scales", "norms", "bits"} for one block of float32 rows
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"Unknown quantization: {quantization!r} (expected one of {', '.join(QUANTIZATIONS)})")
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    segment = {"norms": np.einsum("ij,ij->i", vectors, vectors), "scales": None, "bits": None}
+    if quantization == "float32":
+        segment["data"] = vectors
+    else:
+        scales = np.abs(vectors).max(axis=1) / 127
+        scales[scales == 0] = 1.0
+        segment["data"] = np.round(vectors / scales[:, None]).astype(np.int8)
+        segment["scales"] = scales.astype(np.float32)
+    if quantization == "binary":
+        segment["bits"] = np.packbits(vectors > 0, axis=1)
+    return segment
+
+def _merge(segments):
+    return {
+        key: None if segments[0][key] is None else np.concatenate([s[key] for s in segments])
+        for key in SNAPSHOT_ARRAYS
+    }
+
+def _dots(segment, queries, rows):
+    data = segment["data"][rows]
+    if segment["scales"] is None:
+        return queries @ data.T
+    return (queries @ data.astype(np.float32).T) * segment["scales"][rows]
+
+def _distances(dots, norms, query_norms, metric):
+    # Same orderings as pgvector's <->, <=> and <#>
+    if metric == "l2":
+        return np.sqrt(np.maximum(norms[None, :] - 2 * dots + query_norms[:, None], 0))
+    if metric == "cosine":
+        return 1 - dots / np.maximum(np.sqrt(norms)[None, :] * np.sqrt(query_norms)[:, None], 1e-12)
+    if metric == "ip":
+        return -dots
+    raise ValueError(f"Unknown distance metric: {metric!r}")
+
+def _smallest(distances, k):
+    # Column indices of the k smallest values per row, in ascending order
+    k = min(k, distances.shape[1])
+    if k == 0:
+        return np.empty((distances.shape[0], 0), dtype=np.int64)
+    idx = np.argpartition(distances, k - 1, axis=1)[:, :k]
+    order = np.take_along_axis(distances, idx, axis=1).argsort(axis=1, kind="stable")
+    return np.take_along_axis(idx, order, axis=1)
+
+def _scan(segment, queries, query_norms, top_k, metric):
+    # (distances, rows) of the top_k rows of one segment for every query
+    found_d, found_i = [], []
+    for start in range(0, len(segment["norms"]), MEMORY_INDEX_CHUNK_ROWS):
+        rows = slice(start, start + MEMORY_INDEX_CHUNK_ROWS)
+        dist = _distances(_dots(segment, queries, rows), segment["norms"][rows], query_norms, metric)
+        idx = _smallest(dist, top_k)
+        found_d.append(np.take_along_axis(dist, idx, axis=1))
+        found_i.append(idx + start)
+    return np.hstack(found_d), np.hstack(found_i)
+
+def _scan_binary(segment, queries, query_norms, top_k, metric):
+    # Hamming pre-selection, then exact-ish distances over the survivors only
+    query_bits = np.packbits(queries > 0, axis=1)
+    candidates = max(top_k, top_k * MEMORY_INDEX_RESCORE)
+    found_d, found_i = [], []
+    for q in range(len(queries)):
+        hamming = np.concatenate([
+            _POPCOUNT[np.bitwise_xor(segment["bits"][start:start + MEMORY_INDEX_CHUNK_ROWS], query_bits[q])].sum(axis=1)
+            for start in range(0, len(segment["norms"]), MEMORY_INDEX_CHUNK_ROWS)
+        ])
+        rows = np.sort(_smallest(hamming[None, :], candidates)[0])
+        dist = _distances(_dots(segment, queries[q:q + 1], rows), segment["norms"][rows], query_norms[q:q + 1], metric)
+        idx = _smallest(dist, top_k)
+        found_d.append(np.take_along_axis(dist, idx, axis=1)[0])
+        found_i.append(rows[idx[0]])
+    return np.vstack(found_d), np.vstack(found_i)
+
+# ---------------- INDEX ----------------
+class MemoryIndex:
+    def __init__(self, quantization=MEMORY_INDEX_QUANTIZATION, metric=PG_VECTOR_METRIC):
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization: {quantization!r} (expected one of {', '.join(QUANTIZATIONS)})")
+        self.quantization = quantization
+        self.metric = metric
+        self.segments = []   # [(first row, segment)]
+        self.names = []
+        self.metadata = []
+        self.last_id = 0
+        self.synced_at = 0.0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, rows):
+        # rows: [(id, video_name, embedding, metadata)] in id order
+        if rows:
+            segment = _quantize(np.vstack([np.asarray(r[2], dtype=np.float32) for r in rows]), self.quantization)
+            self._append([segment], rows)
+
+    def _append(self, new_segments, rows):
+        segment = new_segments[0] if len(new_segments) == 1 else _merge(new_segments)
+        with self._lock:
+            segments = self.segments + [(len(self.names), segment)]
+            if len(segments) > MAX_SEGMENTS:
+                # Keep the (possibly memory-mapped) base, merge the rest
+                segments = segments[:1] + [(segments[1][0], _merge([s for _, s in segments[1:]]))]
+            # New lists rather than in-place appends, so searches running
+            # without the lock keep a consistent view
+            self.names = self.names + [r[1] for r in rows]
+            self.metadata = self.metadata + [r[3] for r in rows]
+            self.segments = segments
+            self.last_id = max(self.last_id, rows[-1][0])
+
+    @timed("memindex_sync")
+    def sync(self):
+        # Fetches rows inserted since the last sync; returns how many
+        from utils.database import get_connection
+
+        new_segments, new_rows = [], []
+        with get_connection() as conn:
+            with conn.cursor(name="memindex_sync") as cur:
+                cur.itersize = LOAD_CHUNK
+                cur.execute("""
+                    SELECT id, video_name, embedding, metadata FROM video_embeddings
+                    WHERE id > %s ORDER BY id
+                """, (self.last_id,))
+                while True:
+                    rows = cur.fetchmany(LOAD_CHUNK)
+                    if not rows:
+                        break
+                    # Quantize per chunk so only one chunk is ever held as float32 lists
+                    new_segments.append(_quantize(np.vstack(
+                        [np.asarray(r[2], dtype=np.float32) for r in rows]), self.quantization))
+                    new_rows += [(r[0], r[1], None, r[3]) for r in rows]
+            conn.rollback()
+        if new_rows:
+            self._append(new_segments, new_rows)
+        self.synced_at = time.monotonic()
+        return len(new_rows)
+
+    def reload(self):
+        fresh = MemoryIndex(self.quantization, self.metric)
+        fresh.sync()
+        fresh.compact()
+        with self._lock:
+            self.segments, self.names, self.metadata = fresh.segments, fresh.names, fresh.metadata
+            self.last_id, self.synced_at = fresh.last_id, fresh.synced_at
+
+    def compact(self):
+        with self._lock:
+            if len(self.segments) > 1:
+                self.segments = [(0, _merge([s for _, s in self.segments]))]
+
+    @timed("memindex_search")
+    def search_batch(self, queries, top_k=5):
+        # One list of (video_name, metadata, distance) per query row
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        with self._lock:
+            segments, names, metadata = self.segments, self.names, self.metadata
+        top_k = int(top_k)
+        if not segments or top_k <= 0:
+            return [[] for _ in queries]
+
+        query_norms = np.einsum("ij,ij->i", queries, queries)
+        scan = _scan_binary if self.quantization == "binary" else _scan
+        found_d, found_i = [], []
+        for first, segment in segments:
+            dist, idx = scan(segment, queries, query_norms, top_k, self.metric)
+            found_d.append(dist)
+            found_i.append(idx + first)
+        dist, idx = np.hstack(found_d), np.hstack(found_i)
+        best = _smallest(dist, top_k)
+        dist, idx = np.take_along_axis(dist, best, axis=1), np.take_along_axis(idx, best, axis=1)
+        return [
+            [(names[i], metadata[i], float(d)) for i, d in zip(row_i, row_d)]
+            for row_i, row_d in zip(idx.tolist(), dist.tolist())
+        ]
+
+    def search(self, query_embedding, top_k=5):
+        return self.search_batch(query_embedding, top_k)[0]
+
+    # ---------------- SNAPSHOTS ----------------
+    def save(self, path):
+        # A directory of .npy arrays plus rows.jsonl; written next to the old
+        # one and swapped in, so readers never see a half-written snapshot
+        self.compact()
+        with self._lock:
+            segments, names, metadata, last_id = self.segments, self.names, self.metadata, self.last_id
+        tmp = f"{path}.tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        if segments:
+            for key, array in segments[0][1].items():
+                if array is not None:
+                    np.save(os.path.join(tmp, f"{key}.npy"), array)
+        with open(os.path.join(tmp, "rows.jsonl"), "w", encoding="utf-8") as f:
+            for name, meta in zip(names, metadata):
+                f.write(json.dumps({"video_name": name, "metadata": meta}) + "\n")
+        with open(os.path.join(tmp, "index.json"), "w", encoding="utf-8") as f:
+            json.dump({"quantization": self.quantization, "last_id": last_id, "rows": len(names)}, f)
+        old = f"{path}.old"
+        shutil.rmtree(old, ignore_errors=True)
+        if os.path.exists(path):
+            os.rename(path, old)
+        os.rename(tmp, path)
+        shutil.rmtree(old, ignore_errors=True)
+
+    @classmethod
+    def load(cls, path, metric=PG_VECTOR_METRIC, mmap=True):
+        with open(os.path.join(path, "index.json"), encoding="utf-8") as f:
+            info = json.load(f)
+        index = cls(info["quantization"], metric)
+        if info["rows"]:
+            segment = {
+                key: np.load(os.path.join(path, f"{key}.npy"), mmap_mode="r" if mmap else None)
+                if os.path.exists(os.path.join(path, f"{key}.npy")) else None
+                for key in SNAPSHOT_ARRAYS
+            }
+            index.segments = [(0, segment)]
+        with open(os.path.join(path, "rows.jsonl"), encoding="utf-8") as f:
+            for line in f:
+                row = json.loads(line)
+                index.names.append(row["video_name"])
+                index.metadata.append(row["metadata"])
+        index.last_id = info["last_id"]
+        return index
+
+# ---------------- SEARCH ----------------
+_index = None
+_index_lock = threading.Lock()
+
+def get_index():
+    # The process-wide index: from MEMORY_INDEX_SNAPSHOT if there is one,
+    # otherwise loaded from Postgres; synced at most every MEMORY_INDEX_SYNC_SECONDS
+    global _index
+    with _index_lock:
+        if _index is None:
+            if MEMORY_INDEX_SNAPSHOT and os.path.exists(os.path.join(MEMORY_INDEX_SNAPSHOT, "index.json")):
+                index = MemoryIndex.load(MEMORY_INDEX_SNAPSHOT)
+                if index.quantization != MEMORY_INDEX_QUANTIZATION:
+                    print(f"⚠️ Snapshot is {index.quantization}, not {MEMORY_INDEX_QUANTIZATION}; using it as is")
+            else:
+                index = MemoryIndex()
+            # No compact(): rows synced on top of a snapshot stay in their own
+            # segment, so the memory-mapped base is never copied into RAM
+            # (`snapshot` again to fold them in)
+            index.sync()
+            print(f"✅ In-memory index ready: {len(index)} videos ({index.quantization})")
+            _index = index
+        elif time.monotonic() - _index.synced_at >= MEMORY_INDEX_SYNC_SECONDS:
+            _index.sync()
+    return _index
+
+def search_videos(query_embedding, top_k=5, recall="balanced", filters=None):
+    # search_similar_videos, answered from memory when MEMORY_INDEX_ENABLED.
+    # Filtered searches and any failure of the in-memory path go to pgvector.
+    from utils.database import search_similar_videos, _filter_sql
+
+    if MEMORY_INDEX_ENABLED and not _filter_sql(filters)[0]:
+        try:
+            results = get_index().search(query_embedding, top_k)
+            count("qc_search_backend_total", backend="memory")
+            return results
+        except Exception as e:
+            print(f"⚠️ In-memory search failed, falling back to pgvector: {e}")
+    count("qc_search_backend_total", backend="pgvector")
+    return search_similar_videos(query_embedding, top_k=top_k, recall=recall, filters=filters)
+
+def search_videos_batch(query_embeddings, top_k=5, recall="balanced", filters=None):
+    # search_videos for many vectors; one result list per query, in order
+    from utils.database import search_similar_videos_batch, _filter_sql
+
+    if MEMORY_INDEX_ENABLED and not _filter_sql(filters)[0]:
+        try:
+            present = [i for i, e in enumerate(query_embeddings) if e is not None]
+            results = [[] for _ in query_embeddings]
+            if present:
+                found = get_index().search_batch(np.vstack([query_embeddings[i] for i in present]), top_k)
+                for i, rows in zip(present, found):
+                    results[i] = rows
+            count("qc_search_backend_total", len(present), backend="memory")
+            return results
+        except Exception as e:
+            print(f"⚠️ In-memory search failed, falling back to pgvector: {e}")
+    count("qc_search_backend_total", len(query_embeddings), backend="pgvector")
+    return search_similar_videos_batch(query_embeddings, top_k=top_k, recall=recall, filters=filters)
+
+def search_queries(queries, top_k=5, recall="balanced", filters=None):
+    # Text queries → top-k lists in two round trips: one batched embedding
+    # call for the uncached queries, one batched search
+    from utils.embedding import get_query_embeddings
+
+    queries = list(queries)
+    return search_videos_batch(get_query_embeddings(queries), top_k, recall, filters)
+
+# ---------------- RECALL / LATENCY ----------------
+def recall_at_k(found, truth):
+    # Mean fraction of the true top-k names present in each result list
+    scores = [
+        len({r[0] for r in got} & {r[0] for r in want}) / len(want)
+        for got, want in zip(found, truth) if want
+    ]
+    return float(np.mean(scores)) if scores else 1.0
+
+def compare(queries=100, top_k=10, noise=0.05, seed=0):
+    # Recall@k and latency of every quantization and pgvector recall preset,
+    # against exact float32 search. Queries are stored vectors plus noise.
+    from utils.database import search_similar_videos
+    from utils.schema import RECALL_PRESETS
+
+    exact = MemoryIndex("float32")
+    exact.sync()
+    exact.compact()
+    if not len(exact):
+        print("❌ video_embeddings is empty")
+        return []
+    vectors = exact.segments[0][1]["data"]
+    rng = np.random.default_rng(seed)
+    picks = vectors[rng.integers(0, len(vectors), queries)]
+    q = picks + rng.standard_normal(picks.shape).astype(np.float32) * noise * np.abs(picks).mean()
+    q /= np.linalg.norm(q, axis=1, keepdims=True)
+    truth = exact.search_batch(q, top_k)
+
+    def run(name, search_one, memory_bytes=None):
+        latencies, found = [], []
+        for query in q:
+            start = time.perf_counter()
+            found.append(search_one(query))
+            latencies.append(time.perf_counter() - start)
+        lat = np.asarray(latencies) * 1000
+        row = {
+            "backend": name,
+            "recall": recall_at_k(found, truth),
+            "p50_ms": float(np.percentile(lat, 50)),
+            "p95_ms": float(np.percentile(lat, 95)),
+            "memory_mb": memory_bytes / 1e6 if memory_bytes is not None else None,
+        }
+        print(f"  {name:<22} recall@{top_k} {row['recall']:.3f}  p50 {row['p50_ms']:7.2f}ms  "
+              f"p95 {row['p95_ms']:7.2f}ms" + (f"  {row['memory_mb']:.0f}MB" if memory_bytes is not None else ""))
+        return row
+
+    print(f"{len(exact)} videos, {queries} queries, top {top_k}")
+    rows = []
+    for quantization in QUANTIZATIONS:
+        index = MemoryIndex(quantization)
+        index.segments = [(0, _quantize(vectors, quantization))]
+        index.names, index.metadata = exact.names, exact.metadata
+        size = sum(a.nbytes for a in index.segments[0][1].values() if a is not None)
+        rows.append(run(f"memory_{quantization}", lambda v, index=index: index.search(v, top_k), size))
+    for recall in RECALL_PRESETS:
+        rows.append(run(f"pgvector_{recall}", lambda v, recall=recall: search_similar_videos(v, top_k, recall)))
+    batch = MemoryIndex("float32")
+    batch.segments, batch.names, batch.metadata = exact.segments, exact.names, exact.metadata
+    start = time.perf_counter()
+    batch.search_batch(q, top_k)
+    print(f"  memory_float32 batched   {(time.perf_counter() - start) * 1000 / queries:.2f}ms per query")
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="In-memory vector index over video_embeddings")
+    parser.add_argument("action", choices=["snapshot", "compare"])
+    parser.add_argument("--path", default=MEMORY_INDEX_SNAPSHOT, help="snapshot directory")
+    parser.add_argument("--quantization", choices=QUANTIZATIONS, default=MEMORY_INDEX_QUANTIZATION)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.action == "snapshot":
+        if not args.path:
+            parser.error("--path (or MEMORY_INDEX_SNAPSHOT) is required")
+        # An existing snapshot is only topped up with the rows added since
+        if os.path.exists(os.path.join(args.path, "index.json")):
+            index = MemoryIndex.load(args.path)
+        if not os.path.exists(os.path.join(args.path, "index.json")) or index.quantization != args.quantization:
+            index = MemoryIndex(args.quantization)
+        index.sync()
+        index.save(args.path)
+        print(f"✅ Snapshot written: {args.path} ({len(index)} videos, {args.quantization})")
+    else:
+        compare(args.queries, args.top_k)
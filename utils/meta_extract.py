@@ -1,29 +1,314 @@
-import requests
 import datetime
-from utils.helpers import video_to_base64, normalize_keys, parse_gemini_response
-from utils.prompts import METADATA_PROMPT
-from utils.config import GEMINI_CHAT_URL
+import hashlib
+import os
+import threading
+import time
+import requests
+from utils.helpers import (
+    video_to_base64, normalize_keys, parse_gemini_response, file_sha256, IncrementalJSONObject, iter_sse_text
+)
+from utils.prompts import METADATA_PROMPT, TRIAGE_PROMPT
+from utils.qc import early_reject, qc_score
+from utils.config import (
+    API_KEY, GEMINI_BASE_URL, GEMINI_MODEL, STREAM_METADATA, CACHE_PATH, METADATA_CACHE_ENABLED,
+    METADATA_CACHE_MAX_MB, INLINE_VIDEO_MAX_BYTES, EXTRACTION_MODE, TRIAGE_MODEL, TRIAGE_STOP_ON,
+    FULL_MODEL_NON_UAE, MODEL_PRICES, PRE_QC_ENABLED
+)
+from utils.cache import DiskCache
+from utils.file_upload import upload_video_file, delete_file
+from utils.gemini_client import gemini_post
+from utils.metrics import timed, count, record_bytes
+from utils.preprocess import PREPROCESS_SIGNATURE, preprocess_in_pool
+
+# Cached results are only reused while the prompt they were produced with is unchanged
+PROMPT_VERSION = hashlib.sha256(METADATA_PROMPT.encode("utf-8")).hexdigest()[:16]
+# Tiered results also depend on the triage prompt, model and stop decisions
+TIER_SIGNATURE = "full" if EXTRACTION_MODE != "tiered" else hashlib.sha256(
+    "|".join([TRIAGE_PROMPT, TRIAGE_MODEL, FULL_MODEL_NON_UAE, *sorted(TRIAGE_STOP_ON)]).encode("utf-8")
+).hexdigest()[:16]
+
+metadata_cache = DiskCache(CACHE_PATH, "video_metadata_cache", int(METADATA_CACHE_MAX_MB * 1024 * 1024))
+
+def _error_metadata(video_name, message):
+    # The "error" key makes qc_score return an ERROR decision instead of
+    # scoring the placeholder fields
+    return {
+        "title": video_name,
+        "summary": f"Error extracting metadata: {message}",
+        "error": {"message": str(message)[:500]},
+    }
+
+def _video_part(video_path):
+    # Small clips go inline; anything bigger is streamed to the File API so the
+    # whole video never has to sit in memory as base64.
+    if os.path.getsize(video_path) <= INLINE_VIDEO_MAX_BYTES:
+        return {"inlineData": {"mimeType": "video/mp4", "data": video_to_base64(video_path)}}, None
+    file = upload_video_file(video_path, "video/mp4")
+    return {"fileData": {"mimeType": file.get("mimeType", "video/mp4"), "fileUri": file["uri"]}}, file["name"]
 
-def extract_video_metadata(video_path, video_name):
-    video_b64 = video_to_base64(video_path)
+def _model_url(model, stream=False):
+    method = "streamGenerateContent?alt=sse&" if stream else "generateContent?"
+    return f"{GEMINI_BASE_URL}/v1beta/models/{model}:{method}key={API_KEY}"
+
+def _usage(model, usage, seconds, output_chars):
+    # A stream closed early never gets its final usageMetadata; its output is
+    # estimated from the text received (~4 chars per token)
+    return {
+        "model": model,
+        "prompt_tokens": usage.get("promptTokenCount", 0),
+        "output_tokens": usage.get("candidatesTokenCount", 0) + usage.get("thoughtsTokenCount", 0)
+                         or output_chars // 4,
+        "seconds": round(seconds, 3),
+    }
+
+def _generate(video_part, prompt, model, video_name, stream=False):
+    # One generation call: (metadata, error, usage)
     payload = {
         "contents": [
             {
                 "parts": [
-                    {"inlineData": {"mimeType": "video/mp4", "data": video_b64}},
-                    {"text": METADATA_PROMPT}
+                    video_part,
+                    {"text": prompt}
                 ]
             }
         ]
     }
+    start = time.perf_counter()
+    usage = {}
+    if stream:
+        metadata, error, chars = _stream_metadata(payload, _model_url(model, stream=True), video_name, usage)
+    else:
+        resp = gemini_post("generate", _model_url(model), json=payload)
+        if resp.status_code != 200:
+            return None, _error_metadata(video_name, resp.text), None
+        body = resp.json()
+        usage = body.get("usageMetadata", {})
+        text = body["candidates"][0]["content"]["parts"][0]["text"]
+        metadata, error, chars = normalize_keys(parse_gemini_response(text, video_name)), None, len(text)
+    if error is not None:
+        return None, error, None
+    call = _usage(model, usage, time.perf_counter() - start, chars)
+    count("qc_model_tokens_total", call["prompt_tokens"], model=model, kind="prompt")
+    count("qc_model_tokens_total", call["output_tokens"], model=model, kind="output")
+    return metadata, None, call
+
+def _full_metadata(video_part, video_name, model=GEMINI_MODEL):
+    metadata, error, call = _generate(video_part, METADATA_PROMPT, model, video_name, stream=STREAM_METADATA)
+    if error is None and not metadata.get("stopped_early"):
+        _record_full_pass(call)
+    return metadata, error, call
+
+def _tiered_metadata(video_part, video_name):
+    # Triage pass first; the full prompt only runs when the triage fields
+    # don't already decide the video (a qc_score early exit in TRIAGE_STOP_ON)
+    triage, error, triage_call = _generate(video_part, TRIAGE_PROMPT, TRIAGE_MODEL, video_name)
+    if error is not None:
+        return None, error
+    checked = dict(triage, video_duration=triage.get("video_duration", ""))
+    if PRE_QC_ENABLED:
+        # Duration and frame count are measured locally and pre-QC'd; the
+        # model's estimates alone shouldn't skip the full analysis
+        checked.update(video_duration="", video_less_than_10_frames="No")
+    decision = qc_score(checked)
+    if decision["qc_score"] == 'N/A' and decision["qc_decision"] in TRIAGE_STOP_ON:
+        count("qc_extraction_total", tier="triage")
+        triage.setdefault("video_duration", "")
+        triage.setdefault("title", video_name)
+        triage.setdefault("summary", f"Triage: {decision['qc_reasons'][0]}")
+        triage["extraction"] = {"tier": "triage", "calls": [triage_call]}
+        return triage, None
+
+    # Without UAE relevance the video can't be accepted, so its full pass may
+    # go to a cheaper model
+    uae = (triage.get("uae_related") or "").strip().lower() == "yes"
+    metadata, error, call = _full_metadata(video_part, video_name, GEMINI_MODEL if uae else FULL_MODEL_NON_UAE)
+    if error is not None:
+        return None, error
+    count("qc_extraction_total", tier="triage+full")
+    metadata["extraction"] = {"tier": "triage+full", "calls": [triage_call, call]}
+    return metadata, None
+
+def _request_metadata(video_path, video_name):
+    try:
+        video_part, uploaded_name = _video_part(video_path)
+    except RuntimeError as e:
+        return None, _error_metadata(video_name, e)
 
-    resp = requests.post(GEMINI_CHAT_URL, json=payload)
+    try:
+        if EXTRACTION_MODE == "tiered":
+            return _tiered_metadata(video_part, video_name)
+        metadata, error, call = _full_metadata(video_part, video_name)
+    except RuntimeError as e:
+        return None, _error_metadata(video_name, e)
+    finally:
+        # A failed cleanup must not replace the result or hide the real error;
+        # the File API expires uploads on its own
+        if uploaded_name:
+            try:
+                delete_file(uploaded_name)
+            except Exception as e:
+                print(f"⚠️ Could not delete uploaded file {uploaded_name}: {e}")
+    if error is not None:
+        return None, error
+    count("qc_extraction_total", tier="full")
+    metadata["extraction"] = {"tier": "full", "calls": [call]}
+    return metadata, None
+
+def _stream_metadata(payload, url, video_name, usage):
+    # Fields are parsed as they stream in. Once the safety fields alone mean
+    # REJECT the connection is closed, which stops the generation, and the
+    # partial metadata is returned marked "stopped_early".
+    # Returns (metadata, error, characters received); `usage` gets the
+    # stream's usageMetadata.
+    resp = gemini_post("generate", url, json=payload, stream=True)
     if resp.status_code != 200:
-        return {"title": video_name, "summary": f"Error extracting metadata: {resp.text}"}
+        return None, _error_metadata(video_name, resp.text), 0
+
+    parser = IncrementalJSONObject()
+    partial, chunks = {}, []
+    try:
+        with timed("gemini_stream"):
+            for delta in iter_sse_text(resp, usage):
+                chunks.append(delta)
+                fields = parser.feed(delta)
+                if not fields:
+                    continue
+                partial.update(normalize_keys(dict(fields)))
+                rejected = early_reject(partial)
+                if rejected is not None:
+                    count("qc_stream_total", outcome="stopped_early")
+                    record_bytes("stream_text", sum(map(len, chunks)))
+                    partial.setdefault("title", video_name)
+                    partial.setdefault("summary", f"Stopped early: {rejected['qc_reasons'][0]}")
+                    partial["stopped_early"] = "unsafe_content"
+                    return partial, None, sum(map(len, chunks))
+    except (requests.RequestException, ValueError) as e:
+        return None, _error_metadata(video_name, f"Stream failed: {e}"), 0
+    finally:
+        resp.close()
 
-    text = resp.json()["candidates"][0]["content"]["parts"][0]["text"]
+    text = "".join(chunks)
+    count("qc_stream_total", outcome="complete")
+    record_bytes("stream_text", len(text))
     metadata = parse_gemini_response(text, video_name)
-    metadata = normalize_keys(metadata)
+    return normalize_keys(metadata), None, len(text)
+
+# ---------------- EXTRACTION REPORT ----------------
+# Running averages of complete full-prompt calls, used to estimate what the
+# videos stopped at triage would have cost (before any full pass is seen the
+# defaults below stand in)
+DEFAULT_FULL_OUTPUT_TOKENS = 2500
+DEFAULT_FULL_SECONDS = 20.0
+# The full prompt is this many tokens longer than the triage prompt
+FULL_PROMPT_EXTRA_TOKENS = (len(METADATA_PROMPT) - len(TRIAGE_PROMPT)) // 4
+
+_full_pass = {"calls": 0, "output_tokens": 0, "seconds": 0.0}
+_full_pass_lock = threading.Lock()
+
+def _record_full_pass(call):
+    with _full_pass_lock:
+        _full_pass["calls"] += 1
+        _full_pass["output_tokens"] += call["output_tokens"]
+        _full_pass["seconds"] += call["seconds"]
+
+def _full_pass_average():
+    with _full_pass_lock:
+        calls = _full_pass["calls"]
+        if not calls:
+            return DEFAULT_FULL_OUTPUT_TOKENS, DEFAULT_FULL_SECONDS
+        return _full_pass["output_tokens"] / calls, _full_pass["seconds"] / calls
+
+def _cost(model, prompt_tokens, output_tokens):
+    price_in, price_out = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * price_in + output_tokens * price_out) / 1e6
+
+def extraction_report(metadatas):
+    # Tokens, model seconds and USD spent on a batch of extracted metadata,
+    # and what tiered extraction saved: the estimated full pass of every video
+    # stopped at triage, minus the triage calls of the videos that still
+    # needed the full pass.
+    report = {
+        "videos": 0, "tiers": {}, "prompt_tokens": 0, "output_tokens": 0, "seconds": 0.0, "cost": 0.0,
+        "saved_tokens": 0, "saved_seconds": 0.0, "saved_cost": 0.0,
+    }
+    full_output, full_seconds = _full_pass_average()
+    for metadata in metadatas:
+        info = (metadata or {}).get("extraction")
+        if not info:
+            continue
+        report["videos"] += 1
+        report["tiers"][info["tier"]] = report["tiers"].get(info["tier"], 0) + 1
+        for call in info.get("calls", []):
+            report["prompt_tokens"] += call["prompt_tokens"]
+            report["output_tokens"] += call["output_tokens"]
+            report["seconds"] += call["seconds"]
+            report["cost"] += _cost(call["model"], call["prompt_tokens"], call["output_tokens"])
+        if info["tier"] == "triage":
+            triage = info["calls"][0]
+            prompt_tokens = triage["prompt_tokens"] + FULL_PROMPT_EXTRA_TOKENS
+            report["saved_tokens"] += prompt_tokens + full_output - triage["prompt_tokens"] - triage["output_tokens"]
+            report["saved_seconds"] += full_seconds - triage["seconds"]
+            report["saved_cost"] += _cost(GEMINI_MODEL, prompt_tokens, full_output) - _cost(
+                triage["model"], triage["prompt_tokens"], triage["output_tokens"])
+        elif info["tier"] == "triage+full":
+            triage = info["calls"][0]
+            report["saved_tokens"] -= triage["prompt_tokens"] + triage["output_tokens"]
+            report["saved_seconds"] -= triage["seconds"]
+            report["saved_cost"] -= _cost(triage["model"], triage["prompt_tokens"], triage["output_tokens"])
+    report["saved_tokens"] = int(report["saved_tokens"])
+    return report
+
+def format_extraction_report(report):
+    # Savings are signed: the video is sent to both passes, so tiering can
+    # cost tokens while still saving money and time
+    tiers = ", ".join(f"{tier}={n}" for tier, n in sorted(report["tiers"].items()))
+    line = (
+        f"Extraction: {report['videos']} videos ({tiers}); "
+        f"{report['prompt_tokens'] + report['output_tokens']:,} tokens, {report['seconds']:.1f}s model time, "
+        f"${report['cost']:.4f}"
+    )
+    if any(tier.startswith("triage") for tier in report["tiers"]):
+        line += (f". Saved by tiering (est.): {report['saved_tokens']:+,} tokens, "
+                 f"{report['saved_seconds']:+.1f}s, ${report['saved_cost']:+.4f}")
+    return line
+
+def _preprocess_and_request(video_path, video_name):
+    # Only pay for downscaling on a cache miss; the smaller copy is temporary
+    send_path = preprocess_in_pool(video_path)
+    try:
+        return _request_metadata(send_path, video_name)
+    finally:
+        if send_path != video_path:
+            try:
+                os.remove(send_path)
+            except OSError as e:
+                print(f"⚠️ Could not remove preprocessed file {send_path}: {e}")
+
+@timed("extract_metadata")
+def extract_video_metadata(video_path, video_name, use_cache=METADATA_CACHE_ENABLED, preprocess=True):
+    signature = PREPROCESS_SIGNATURE if preprocess else "off"
+    cache_key = f"{file_sha256(video_path)}:{PROMPT_VERSION}:{signature}" if use_cache else None
+    if use_cache and TIER_SIGNATURE != "full":
+        cache_key += f":{TIER_SIGNATURE}"
+    metadata = metadata_cache.get(cache_key) if use_cache else None
+    if use_cache:
+        count("qc_metadata_cache_total", result="hit" if metadata is not None else "miss")
+
+    if metadata is None:
+        if preprocess:
+            metadata, error = _preprocess_and_request(video_path, video_name)
+        else:
+            metadata, error = _request_metadata(video_path, video_name)
+        if error is not None:
+            return error
+        # Unparseable responses fall back to {title, summary} or to the fields
+        # that could be salvaged; don't cache those
+        if use_cache and set(metadata) - {"title", "summary"} and not metadata.get("parse_salvaged"):
+            metadata_cache.set(cache_key, metadata)
+    else:
+        # Nothing was spent on this one
+        metadata["extraction"] = {"tier": "cached", "calls": []}
+
     metadata["uploaded_by"] = "Huzaifa"
     metadata["created_at"] = datetime.datetime.utcnow().isoformat()
     return metadata
@@ -0,0 +1,180 @@
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from utils.config import METRICS_ENABLED, METRICS_OTEL
+
+# Lightweight process-wide metrics: per-stage durations (histograms), error,
+# retry and payload-size counters. Exported as Prometheus text, optionally
+# mirrored as OpenTelemetry spans, and collected per video for the UI.
+#
+#   @timed("qc_score")                 # decorator
+#   with timed("db_insert"): ...       # context manager
+#   with collect_timings() as t: ...   # t == {"stage": seconds, ...} afterwards
+
+# Seconds; chosen to span a SELECT 1 up to a slow Gemini video call
+BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_lock = threading.Lock()
+_histograms = {}   # (name, labels) -> [bucket counts..., sum, count]
+_counters = {}     # (name, labels) -> value
+_timings = ContextVar("qc_timings", default=None)
+
+_tracer = None
+if METRICS_OTEL:
+    try:
+        from opentelemetry import trace
+        _tracer = trace.get_tracer("qc-poc")
+    except ImportError:
+        print("⚠️ METRICS_OTEL is set but opentelemetry-api is not installed; spans are disabled")
+
+def _labels(labels):
+    return tuple(sorted(labels.items()))
+
+def observe(name, value, **labels):
+    if not METRICS_ENABLED:
+        return
+    key = (name, _labels(labels))
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = [0] * (len(BUCKETS) + 2)
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                hist[i] += 1
+        hist[-2] += value
+        hist[-1] += 1
+
+def count(name, value=1, **labels):
+    if not METRICS_ENABLED:
+        return
+    key = (name, _labels(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def record_bytes(stage, size):
+    count("qc_payload_bytes_total", size, stage=stage)
+    timings = _timings.get()
+    if timings is not None:
+        timings[f"{stage}_bytes"] = timings.get(f"{stage}_bytes", 0) + size
+
+class timed:
+    # Times a stage as a decorator or a context manager. Durations go to
+    # qc_stage_seconds, exceptions to qc_stage_errors_total, and to the
+    # per-video breakdown when one is being collected.
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __call__(self, fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timed(self.stage):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    def __enter__(self):
+        self.span = _tracer.start_as_current_span(self.stage) if _tracer is not None else None
+        if self.span is not None:
+            self.span.__enter__()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.start
+        observe("qc_stage_seconds", seconds, stage=self.stage)
+        if exc_type is not None:
+            count("qc_stage_errors_total", stage=self.stage, error=exc_type.__name__)
+        timings = _timings.get()
+        if timings is not None:
+            timings[self.stage] = timings.get(self.stage, 0.0) + seconds
+        if self.span is not None:
+            self.span.__exit__(exc_type, exc, tb)
+        return False
+
+@contextmanager
+def collect_timings():
+    # Stage durations (summed per stage) of everything timed on this thread
+    # inside the block
+    timings = {}
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+# ---------------- EXPORT ----------------
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+def prometheus_text():
+    with _lock:
+        histograms = {k: list(v) for k, v in _histograms.items()}
+        counters = dict(_counters)
+    lines = []
+    for name in sorted({k[0] for k in histograms}):
+        lines.append(f"# TYPE {name} histogram")
+        for (hname, labels), hist in sorted(histograms.items()):
+            if hname != name:
+                continue
+            for bound, value in zip(BUCKETS, hist):
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {value}")
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {hist[-1]}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {hist[-2]}")
+            lines.append(f"{name}_count{_format_labels(labels)} {hist[-1]}")
+    for name in sorted({k[0] for k in counters}):
+        lines.append(f"# TYPE {name} counter")
+        for (cname, labels), value in sorted(counters.items()):
+            if cname == name:
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+def stage_summary():
+    # {stage: {"count", "total_seconds", "avg_seconds", "errors"}} for quick display
+    with _lock:
+        histograms = {k: list(v) for k, v in _histograms.items()}
+        counters = dict(_counters)
+    summary = {}
+    for (name, labels), hist in histograms.items():
+        if name != "qc_stage_seconds":
+            continue
+        stage = dict(labels)["stage"]
+        summary[stage] = {"count": hist[-1], "total_seconds": hist[-2], "avg_seconds": hist[-2] / hist[-1], "errors": 0}
+    for (name, labels), value in counters.items():
+        if name == "qc_stage_errors_total":
+            stage = dict(labels)["stage"]
+            summary.setdefault(stage, {"count": 0, "total_seconds": 0.0, "avg_seconds": 0.0, "errors": 0})
+            summary[stage]["errors"] += value
+    return summary
+
+def reset_metrics():
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def start_metrics_server(port, host="0.0.0.0"):
+    # Serves prometheus_text() on every path, for scraping long-running processes
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"✅ Metrics on http://{host}:{port}/metrics")
+    return server
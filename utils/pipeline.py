@@ -0,0 +1,77 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from utils.meta_extract import extract_video_metadata
+from utils.qc import qc_score
+from utils.probe import probe_video, pre_qc, measured_fields
+from utils.dedup import video_signature, signature_from_hashes, find_duplicates
+from utils.metrics import timed, collect_timings
+from utils.config import ANALYSIS_WORKERS, PRE_QC_ENABLED, DEDUP_ENABLED, DEDUP_SAMPLE_FPS, DEDUP_SKIP_ANALYSIS
+
+# With score=False the final qc_score step is left to the caller (the job
+# queue runs it as its own stage); pre-QC rejects and duplicates are still
+# decided here.
+def analyze_video(video_path, video_name, score=True):
+    # Per-stage seconds (and payload bytes) for this video end up in
+    # metadata["timings"]
+    with collect_timings() as timings, timed("analyze_video"):
+        metadata = _analyze_video(video_path, video_name, score)
+    metadata["timings"] = {stage: round(value, 4) for stage, value in timings.items()}
+    return metadata
+
+def _analyze_video(video_path, video_name, score):
+    # One decode pass covers both pre-QC and the duplicate-detection hashes
+    probe = probe_video(video_path, phash_fps=DEDUP_SAMPLE_FPS if DEDUP_ENABLED else None) if PRE_QC_ENABLED else {}
+    frame_hashes = probe.pop("frame_hashes", None)
+    rejected = pre_qc(probe) if probe else None
+    if rejected is not None:
+        # Obvious rejects never reach Gemini
+        metadata = {"title": video_name, "summary": rejected["qc_reasons"][0], "video_probe": probe}
+        metadata.update(measured_fields(probe))
+        metadata.update(rejected)
+        return metadata
+
+    if not DEDUP_ENABLED:
+        signature = None
+    elif frame_hashes is not None:
+        signature = signature_from_hashes(frame_hashes)
+    else:
+        signature = video_signature(video_path)
+    duplicates = []
+    if signature:
+        try:
+            duplicates = [name for name, _ in find_duplicates(signature) if name != video_name]
+        except Exception as e:
+            print(f"⚠️ Duplicate lookup failed for {video_name}: {e}")
+    if duplicates and DEDUP_SKIP_ANALYSIS:
+        return {
+            "title": video_name,
+            "summary": f"Near-duplicate of {', '.join(duplicates)}",
+            "duplicate_of": duplicates,
+            "video_signature": signature,
+            "qc_score": 'N/A',
+            "qc_decision": "DUPLICATE",
+            "qc_reasons": [f"Near-duplicate of already stored video: {', '.join(duplicates)}"]
+        }
+
+    metadata = extract_video_metadata(video_path, video_name)
+    metadata["video_signature"] = signature
+    if duplicates:
+        metadata["duplicate_of"] = duplicates
+    if probe:
+        metadata["video_probe"] = probe
+        metadata.update(measured_fields(probe))
+    if score:
+        metadata.update(qc_score(metadata))
+    return metadata
+
+def analyze_videos(videos, max_workers=ANALYSIS_WORKERS):
+    # `videos` is an iterable of (video_name, video_path). The Gemini calls are
+    # I/O bound, so a thread pool overlaps them; results are yielded as
+    # (video_name, metadata, error) in completion order.
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(analyze_video, path, name): name for name, path in videos}
+        for future in as_completed(futures):
+            video_name = futures[future]
+            try:
+                yield video_name, future.result(), None
+            except Exception as e:
+                yield video_name, None, e
@@ -0,0 +1,109 @@
+import atexit
+import multiprocessing
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+from utils.probe import iter_frames
+from utils.metrics import timed
+from utils.config import (
+    PREPROCESS_MODE, PREPROCESS_MAX_HEIGHT, PREPROCESS_MAX_FPS,
+    PREPROCESS_KEYFRAME_FPS, PREPROCESS_WORKERS
+)
+
+# Part of the metadata cache key: results from a downscaled upload are kept
+# apart from results for the original
+PREPROCESS_SIGNATURE = (
+    "off" if PREPROCESS_MODE == "off" else
+    f"{PREPROCESS_MODE}-{PREPROCESS_MAX_HEIGHT}p-"
+    f"{PREPROCESS_KEYFRAME_FPS if PREPROCESS_MODE == 'keyframes' else PREPROCESS_MAX_FPS}fps"
+)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _target_fps(mode, source_fps):
+    limit = PREPROCESS_KEYFRAME_FPS if mode == "keyframes" else PREPROCESS_MAX_FPS
+    return min(source_fps, limit) if source_fps > 0 else limit
+
+def _mux_audio(video_only, original, output):
+    # OpenCV can't write audio, so ffmpeg re-encodes the video track to H.264
+    # and copies the original soundtrack back in (if there is one).
+    cmd = [
+        "ffmpeg", "-y", "-loglevel", "error",
+        "-i", video_only, "-i", original,
+        "-map", "0:v:0", "-map", "1:a:0?",
+        "-c:v", "libx264", "-preset", "veryfast", "-crf", "28", "-pix_fmt", "yuv420p",
+        "-c:a", "aac", "-b:a", "64k",
+        "-shortest", output,
+    ]
+    subprocess.run(cmd, check=True)
+
+def preprocess_video(path, mode=PREPROCESS_MODE):
+    # Returns the path of a smaller copy to send to Gemini, or the original
+    # path when preprocessing is off, unnecessary or not possible here.
+    if mode == "off":
+        return path
+    if shutil.which("ffmpeg") is None:
+        print("⚠️ ffmpeg not found; sending original video so the audio track is kept")
+        return path
+
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        return path
+    source_fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH) or 0)
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT) or 0)
+    cap.release()
+
+    fps = _target_fps(mode, source_fps)
+    scale = min(1.0, PREPROCESS_MAX_HEIGHT / height) if height else 1.0
+    if scale == 1.0 and fps >= source_fps:
+        return path
+    # Even dimensions keep the H.264 encoder happy
+    size = (max(2, int(width * scale) // 2 * 2), max(2, int(height * scale) // 2 * 2))
+
+    fd, video_only = tempfile.mkstemp(suffix=".mp4")
+    os.close(fd)
+    fd, output = tempfile.mkstemp(suffix=".mp4")
+    os.close(fd)
+    try:
+        writer = cv2.VideoWriter(video_only, cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+        # Emit one frame per output tick, repeating the latest sampled frame
+        # when needed, so the timeline (and therefore audio sync) is unchanged
+        next_tick = 0.0
+        for ts, frame in iter_frames(path, fps):
+            if ts + 1e-6 < next_tick:
+                continue
+            small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+            while next_tick <= ts + 1e-6:
+                writer.write(small)
+                next_tick += 1.0 / fps
+        writer.release()
+        _mux_audio(video_only, path, output)
+    except (cv2.error, subprocess.CalledProcessError, OSError) as e:
+        print(f"⚠️ Preprocessing failed, sending original: {e}")
+        os.remove(output)
+        return path
+    finally:
+        os.remove(video_only)
+    return output
+
+@timed("preprocess")
+def preprocess_in_pool(path, mode=PREPROCESS_MODE):
+    # Decoding and re-encoding are CPU bound, so they run in worker processes
+    global _executor
+    if mode == "off":
+        return path
+    with _executor_lock:
+        if _executor is None:
+            # Spawned, not forked: callers are multi-threaded (Streamlit, the
+            # analysis pool), and a fork can copy a lock some other thread holds
+            _executor = ProcessPoolExecutor(
+                max_workers=PREPROCESS_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+            atexit.register(_executor.shutdown)
+    return _executor.submit(preprocess_video, path, mode).result()
@@ -0,0 +1,129 @@
+import cv2
+import numpy as np
+from utils.metrics import timed
+from utils.config import (
+    PROBE_SAMPLE_FPS, PRE_QC_DARK_BRIGHTNESS, PRE_QC_MAX_DARK_RATIO, PRE_QC_MIN_SHARPNESS
+)
+
+MIN_DURATION_SECONDS = 5
+MIN_UNIQUE_FRAMES = 10
+
+def iter_frames(path, sample_fps=PROBE_SAMPLE_FPS):
+    # Yields (timestamp_seconds, frame) for roughly `sample_fps` frames per
+    # second. FFmpeg still decodes every frame on grab(); skipping only saves
+    # the colour conversion and copy in retrieve(). Nothing beyond the
+    # current frame is kept in memory.
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        return
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 0
+        step = max(1, int(round(fps / sample_fps))) if fps > 0 and sample_fps else 1
+        index = 0
+        while cap.grab():
+            if index % step == 0:
+                ok, frame = cap.retrieve()
+                if not ok:
+                    break
+                yield cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0, frame
+            index += 1
+    finally:
+        cap.release()
+
+def dhash(gray):
+    # 64-bit difference hash: compares horizontally adjacent pixels of a 9x8 thumbnail
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int(np.packbits(bits).view(">u8")[0])
+
+def phash(gray):
+    # 64-bit DCT perceptual hash: low-frequency coefficients vs their median
+    small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:8, :8].flatten()
+    bits = low > np.median(low[1:])
+    return int(np.packbits(bits).view(">u8")[0])
+
+# With `phash_fps`, the perceptual hashes near-duplicate detection needs are
+# taken from the same pass (as "frame_hashes"), so the video is decoded once
+@timed("probe")
+def probe_video(path, sample_fps=PROBE_SAMPLE_FPS, phash_fps=None):
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        return {"readable": False}
+    fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH) or 0)
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT) or 0)
+    cap.release()
+
+    hashes = set()
+    brightness = []
+    sharpness = []
+    frame_hashes = []
+    next_phash = 0.0
+    last_ts = 0.0
+    for ts, frame in iter_frames(path, max(sample_fps, phash_fps or 0)):
+        last_ts = max(last_ts, ts)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if phash_fps and ts + 1e-6 >= next_phash:
+            frame_hashes.append(phash(gray))
+            next_phash += 1.0 / phash_fps
+        hashes.add(dhash(gray))
+        brightness.append(float(gray.mean()))
+        # Measure focus on a fixed-size copy so scores are comparable across resolutions
+        small = cv2.resize(gray, (320, max(1, gray.shape[0] * 320 // max(1, gray.shape[1]))))
+        sharpness.append(float(cv2.Laplacian(small, cv2.CV_64F).var()))
+
+    if not brightness:
+        return {"readable": False}
+    extra = {"frame_hashes": frame_hashes} if phash_fps else {}
+
+    # Container frame counts can be missing or wrong; trust the decoded timestamps when larger
+    duration = max(frame_count / fps if fps > 0 else 0.0, last_ts)
+    return {
+        "readable": True,
+        "duration": round(duration, 2),
+        "fps": round(fps, 2),
+        "width": width,
+        "height": height,
+        "frame_count": frame_count,
+        "sampled_frames": len(brightness),
+        "unique_frames": len(hashes),
+        "mean_brightness": round(float(np.mean(brightness)), 2),
+        "dark_frame_ratio": round(float(np.mean(np.array(brightness) < PRE_QC_DARK_BRIGHTNESS)), 3),
+        "sharpness": round(float(np.median(sharpness)), 2),
+        **extra,
+    }
+
+def measured_fields(probe: dict):
+    # Values qc_score otherwise has to take from the model's answer
+    if not probe.get("readable"):
+        return {}
+    return {
+        "video_duration": probe["duration"],
+        "video_less_than_10_frames": "Yes" if probe["unique_frames"] < MIN_UNIQUE_FRAMES else "No",
+    }
+
+def pre_qc(probe: dict):
+    # Returns a qc_score-style REJECT for clips that fail on local measurements
+    # alone, or None if the video should go on to Gemini.
+    if not probe.get("readable"):
+        return None
+
+    reason = None
+    if probe["unique_frames"] < MIN_UNIQUE_FRAMES:
+        reason = "Rejected: video contains fewer than 10 unique frames"
+    elif probe["duration"] < MIN_DURATION_SECONDS:
+        reason = f"Rejected: video too short ({probe['duration']:.2f}s < 5s)"
+    elif probe["dark_frame_ratio"] >= PRE_QC_MAX_DARK_RATIO:
+        reason = f"Rejected: video is too dark ({probe['dark_frame_ratio']:.0%} of frames)"
+    elif probe["sharpness"] < PRE_QC_MIN_SHARPNESS:
+        reason = f"Rejected: video is too blurry (sharpness {probe['sharpness']:.1f})"
+
+    if reason is None:
+        return None
+    return {
+        "qc_score": 'N/A',
+        "qc_decision": "REJECT",
+        "qc_reasons": [reason]
+    }
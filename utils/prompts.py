@@ -6,14 +6,11 @@ Rules:
 - Ensure all Yes/No values are consistent ("Yes" or "No").
 - For lists, return [] if nothing applies.
 - Detect and flag ANY family-unfriendly or unsafe content (adult, explicit, violent, hateful, disturbing, substance use). These must always be captured.
+- Output the fields in the order of the schema below; the safety fields come first.
 - If the video references a UAE city or landmark (e.g., Dubai, Palm Jumeirah, Burj Khalifa, Abu Dhabi, Sharjah, Ras Al Khaimah, Marina, Jumeirah Beach, Downtown Dubai, Emirates Hills, Dubai Hills Estate), then mark `"uae_related": "Yes"`. Otherwise `"uae_related": "No"`.
 - If UAE-related, also provide `"uae_sentiment"` as "Positive", "Neutral", or "Negative" based on portrayal.
 
 {
-  "title": "Modern Villa Tour in Dubai Hills Estate",
-  "category": "Property",  // Options: Property, Lifestyle, Other
-  "tags": ["Dubai", "Luxury", "Villa", "Modern Design"],
-  "summary": "A luxury villa walkthrough in Dubai Hills. A female narrator describes the layout and design. The video features drone shots, interiors, bedrooms, pool, and garden.",
   "adult_content_presence": "No",
   "adult_content_type": [],  // ["Nudity", "Sexual themes", "Explicit language", "Kissing", "Suggestive clothing"]
   "violence_presence": "No",
@@ -24,6 +21,11 @@ Rules:
   "hate_speech_type": [],  // ["Racism", "Sexism", "Discrimination", "Religious hate"]
   "disturbing_content_presence": "No",
   "disturbing_content_type": [],  // ["Gore", "Graphic injury", "Self-harm", "Suicide"]
+  "title": "Modern Villa Tour in Dubai Hills Estate",
+  "category": "Property",  // Options: Property, Lifestyle, Other
+  "tags": ["Dubai", "Luxury", "Villa", "Modern Design"],
+  "summary": "A luxury villa walkthrough in Dubai Hills. A female narrator describes the layout and design. The video features drone shots, interiors, bedrooms, pool, and garden.",
+  "transcript": "Welcome to this five-bedroom villa in Dubai Hills Estate. The open-plan living area leads out to a private pool...",  // Everything said in the video, verbatim where possible; "" if there is no speech
   "uae_related": "Yes",
   "uae_sentiment": "Positive",
   "is_real_estate_related": "Yes",
@@ -117,3 +119,36 @@ Rules:
   "technical_glitches": "None"  // None, Minor, Severe
 }
 """
+
+# First pass of tiered extraction (see utils/meta_extract.py): only the
+# fields that let qc_score reject or flag a video outright, plus UAE relevance
+# for routing. Videos that survive get METADATA_PROMPT.
+TRIAGE_PROMPT = """
+You are screening a real estate or lifestyle video before a detailed analysis. Based on the full video content (visuals, audio, text), return only this JSON object, in this order.
+
+Rules:
+- Return only valid JSON.
+- Ensure all Yes/No values are consistent ("Yes" or "No").
+- For lists, return [] if nothing applies.
+- Flag ANY family-unfriendly or unsafe content (adult, explicit, violent, hateful, disturbing, substance use).
+- `"video_duration"` is the length of the video in seconds, as a number.
+- Mark `"uae_related": "Yes"` if the video references a UAE city or landmark (e.g., Dubai, Palm Jumeirah, Burj Khalifa, Abu Dhabi, Sharjah, Ras Al Khaimah), otherwise "No".
+
+{
+  "adult_content_presence": "No",
+  "adult_content_type": [],
+  "violence_presence": "No",
+  "violence_type": [],
+  "substance_use_presence": "No",
+  "substance_use_type": [],
+  "hate_speech_presence": "No",
+  "hate_speech_type": [],
+  "disturbing_content_presence": "No",
+  "disturbing_content_type": [],
+  "video_less_than_10_frames": "No",
+  "video_duration": 165,
+  "ai_generated_extent": "None",
+  "uae_related": "Yes",
+  "uae_sentiment": "Positive"
+}
+"""
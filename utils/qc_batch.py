@@ -0,0 +1,475 @@
+import datetime
+import hashlib
+import json
+import string
+from operator import methodcaller
+import numpy as np
+from utils.metrics import timed
+
+# The QC rules. They live in the tables below: COLUMNS says how each input
+# field is normalised (once per batch), GATES are the early exits that decide
+# a video outright, and SCORE_GROUPS are ordered if/elif chains that add
+# points. compile_rules() turns the tables into an evaluator that works on
+# whole columns with NumPy masks; utils.qc.qc_score runs it on one record.
+# The normalizers keep the string handling and swallowed exceptions of the
+# original per-record scorer (kept as tests/qc_reference.py).
+
+UAE_PLACES = ["uae", "dubai", "abu dhabi", "sharjah"]
+GOOD_VISUALS = ["clear", "bright", "modern", "luxury", "well-lit"]
+UNSAFE_CATEGORIES = ["adult_content", "violence", "substance_use", "hate_speech", "disturbing_content"]
+
+# Bump when a normalizer below changes what it produces for some input: the
+# rule tables are versioned from their content, the normalizers by hand
+NORMALIZERS_VERSION = 2
+
+# Normalizers and conditions carry a `spec` describing them, which is what
+# RULES_VERSION is computed from
+def _described(fn, *spec):
+    fn.spec = spec
+    return fn
+
+def _spec(fn):
+    return getattr(fn, "spec", None) or (fn.__name__,)
+
+# ---------------- COLUMNS ----------------
+# Text fields hold a handful of repeated values ("yes", "no", "clear", ...),
+# so they are stored as categoricals: one small-int code per row plus the list
+# of distinct normalised values. Conditions are evaluated once per distinct
+# value and then broadcast to every row through the codes.
+
+class Categorical:
+    __slots__ = ("codes", "categories")
+
+    def __init__(self, codes, categories):
+        self.codes = codes
+        self.categories = categories
+
+    def lookup(self, predicate):
+        table = np.array([bool(predicate(v)) for v in self.categories] or [False], dtype=bool)
+        return table[self.codes]
+
+    def __getitem__(self, row):
+        return self.categories[self.codes[row]]
+
+    def __len__(self):
+        return len(self.codes)
+
+_ERROR = object()  # marks values qc_score would have failed on
+
+def _encode(raws, normalizer):
+    categories, index = [], {}
+
+    def code_of(value):
+        code = index.get(value)
+        if code is None:
+            code = index[value] = len(categories)
+            categories.append(value)
+        return code
+
+    try:
+        distinct = set(raws)
+    except TypeError:
+        # Unhashable values (lists, dicts) can't be memoised
+        distinct = None
+    if distinct is None:
+        codes = [code_of(normalizer(raw)) for raw in raws]
+    else:
+        # Only strings and None are memoised by raw value: True == 1 == 1.0
+        # would otherwise share an entry although they normalise differently
+        memo = {raw: code_of(normalizer(raw)) for raw in distinct if raw is None or raw.__class__ is str}
+        if len(memo) == len(distinct):
+            codes = list(map(memo.__getitem__, raws))
+        else:
+            codes = [
+                memo[raw] if raw is None or raw.__class__ is str else code_of(normalizer(raw))
+                for raw in raws
+            ]
+    return Categorical(np.array(codes, dtype=np.int32), categories)
+
+def _column(records, key, normalizer, default=None):
+    return _encode(list(map(methodcaller("get", key, default), records)), normalizer)
+
+# ---------------- NORMALIZERS ----------------
+# Each entry of COLUMNS takes the whole batch (and the evaluation time) and
+# returns derived columns, reproducing the string handling and the swallowed
+# exceptions of qc_score.
+
+def _text(value):
+    if not value:
+        return ""
+    return str(value).strip().lower()
+
+def _strict_text(value):
+    # `(value or "").strip()` inside one of qc_score's try blocks
+    value = value or ""
+    return value.strip().lower() if isinstance(value, str) else _ERROR
+
+def _yn(value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        return value.strip().lower() in ["yes", "true", "y", "1"]
+    return False
+
+def _float(value):
+    try:
+        return float(value)
+    except Exception:
+        return np.nan
+
+def _listify(x):
+    if x is None:
+        return []
+    if isinstance(x, list):
+        return x
+    if isinstance(x, str):
+        return [x]
+    return list(x)
+
+def _lowered_types(value):
+    # find_unsafe_flags' handling (utils/qc.py): False, 0 and other
+    # non-iterables raise, "" is one (empty) type
+    try:
+        return tuple(t.strip().lower() for t in _listify(value))
+    except Exception:
+        return _ERROR
+
+def _rooms_shown(rooms):
+    return bool(rooms and (isinstance(rooms, list) and len(rooms) > 0 or isinstance(rooms, str) and rooms.strip()))
+
+def _field(key, normalizer, column):
+    return _described(lambda records, now: {column: _column(records, key, normalizer)},
+                      "field", key, normalizer.__name__, column)
+
+def _error(records, now):
+    has_error = np.array(["error" in meta for meta in records], dtype=bool)
+    messages = [""] * len(records)
+    for r in np.flatnonzero(has_error):
+        messages[r] = records[r]["error"].get("message", "Unknown error")
+    return {"has_error": has_error, "error_message": messages}
+
+def _duration(records, now):
+    parsed = _column(records, "video_duration", _float, default=0)
+    duration = np.array(parsed.categories or [np.nan], dtype=float)[parsed.codes]
+    return {"duration_ok": ~np.isnan(duration), "duration": duration}
+
+def _unsafe(records, now):
+    n = len(records)
+    ok = np.ones(n, dtype=bool)
+    any_flag = np.zeros(n, dtype=bool)
+    categories = []
+    for category in UNSAFE_CATEGORIES:
+        yes = _column(records, f"{category}_presence", lambda v: str(v).strip().lower(), default="").lookup(lambda v: v == "yes")
+        # Type lists are almost always missing or empty; only the others need normalising
+        raw_types = list(map(methodcaller("get", f"{category}_type"), records))
+        types = {i: _lowered_types(t) for i, t in enumerate(raw_types) if t is not None and t != []}
+        failed = [i for i, t in types.items() if t is _ERROR]
+        flagged = [i for i, t in types.items() if t and t is not _ERROR and yes[i]]
+        ok[failed] = False
+        any_flag[flagged] = True
+        categories.append((yes, types))
+
+    flags = [""] * n
+    for r in np.flatnonzero(ok & any_flag):
+        found = [f for yes, types in categories if yes[r] for f in types.get(r, ())]
+        flags[r] = ", ".join([f for f in found if f])
+    return {"unsafe_ok": ok, "unsafe_any": ok & any_flag, "unsafe_flags": flags}
+
+def _ai_extent(records, now):
+    extent = _column(records, "ai_generated_extent", _strict_text)
+    return {"ai_ok": extent.lookup(lambda v: v is not _ERROR), "ai_extent": extent}
+
+def _uae(records, now):
+    sentiment = _column(records, "uae_sentiment", _text)
+    return {
+        "uae_related": _column(records, "uae_related", _text),
+        "uae_sentiment": sentiment,
+        "uae_sentiment_label": Categorical(sentiment.codes, [v.capitalize() for v in sentiment.categories]),
+    }
+
+def _event(records, now):
+    # States: "none" (not event driven), "missing", "invalid", "past", "upcoming"
+    def time_state(event_time):
+        if not event_time:
+            return "missing"
+        try:
+            return "past" if datetime.datetime.fromisoformat(event_time) < now else "upcoming"
+        except Exception:
+            return "invalid"
+
+    driven = _column(records, "event_driven", _yn).lookup(bool)
+    state = _column(records, "if_event_yes_time", time_state)
+    codes = np.where(driven, state.codes, len(state.categories)).astype(np.int32)
+    return {"event_state": Categorical(codes, state.categories + ["none"])}
+
+COLUMNS = [
+    _error,
+    _field("stopped_early", bool, "stopped_early"),
+    _field("video_less_than_10_frames", _text, "lt10"),
+    _duration,
+    _unsafe,
+    _ai_extent,
+    _field("is_real_estate_related", _yn, "real_estate"),
+    _field("main_topic_category", _text, "topic"),
+    _field("lifestyle_emphasis", _text, "lifestyle"),
+    _uae,
+    _event,
+    _field("clarity_of_speech", _text, "clarity"),
+    _field("volume_balance", _text, "volume"),
+    _field("mood_of_visuals", _text, "visuals"),
+    _field("subtitles_present", _yn, "subtitles"),
+    _field("rooms_shown", _rooms_shown, "rooms_shown"),
+    _field("technical_glitches", _text, "glitches"),
+]
+
+# ---------------- CONDITIONS ----------------
+def where(column, predicate):
+    # Row mask for `predicate`, evaluated once per distinct value of categoricals
+    def condition(c):
+        col = c[column]
+        if isinstance(col, Categorical):
+            return col.lookup(predicate)
+        return np.fromiter((predicate(v) for v in col), dtype=bool, count=len(col))
+    return _described(condition, "where", column, predicate.__name__)
+
+def eq(column, value):
+    return _described(where(column, lambda v: v == value), "eq", column, value)
+
+def isin(column, values):
+    return _described(where(column, lambda v: v in values), "in", column, list(values))
+
+def contains_any(column, needles):
+    return _described(where(column, lambda v: any(n in v for n in needles)), "contains_any", column, list(needles))
+
+def truthy(column):
+    def condition(c):
+        col = c[column]
+        return col.lookup(bool) if isinstance(col, Categorical) else np.asarray(col, dtype=bool)
+    return _described(condition, "truthy", column)
+
+def less_than(column, value):
+    return _described(lambda c: np.asarray(c[column]) < value, "less_than", column, value)
+
+def all_of(*conditions):
+    return _described(lambda c: np.logical_and.reduce([cond(c) for cond in conditions]),
+                      "all_of", *[_spec(cond) for cond in conditions])
+
+def any_of(*conditions):
+    return _described(lambda c: np.logical_or.reduce([cond(c) for cond in conditions]),
+                      "any_of", *[_spec(cond) for cond in conditions])
+
+def always(c):
+    return np.ones(len(c["has_error"]), dtype=bool)
+
+# ---------------- RULE TABLE ----------------
+# (condition, decision, reason template)
+GATES = [
+    (truthy("has_error"), "ERROR", "Model error: {error_message}"),
+    (all_of(truthy("stopped_early"), truthy("unsafe_any")), "REJECT", "Unsafe/NSFW content detected: {unsafe_flags}"),
+    (eq("lt10", "yes"), "REJECT", "Rejected: video contains fewer than 10 unique frames"),
+    (all_of(truthy("duration_ok"), less_than("duration", 5)), "REJECT", "Rejected: video too short ({duration:.2f}s < 5s)"),
+    (all_of(truthy("unsafe_ok"), truthy("unsafe_any")), "REJECT", "Unsafe/NSFW content detected: {unsafe_flags}"),
+    (all_of(truthy("ai_ok"), eq("ai_extent", "full")), "MANUAL_REVIEW", "The Video is completely AI Generated"),
+]
+
+# Each group is an if/elif chain: the first matching (condition, points, reason) applies
+SCORE_GROUPS = [
+    ("safety", [
+        (truthy("unsafe_ok"), 20, "No unsafe content"),
+    ]),
+    ("ai_generation", [
+        (all_of(truthy("ai_ok"), eq("ai_extent", "partial")), 0, "Partially AI-generated"),
+        (truthy("ai_ok"), 0, "Not AI generation"),
+    ]),
+    ("relevance", [
+        (any_of(truthy("real_estate"), isin("topic", ["real estate", "property"])), 20, "Real estate related"),
+        (all_of(eq("topic", "lifestyle"), contains_any("lifestyle", UAE_PLACES)), 10, "UAE lifestyle content"),
+    ]),
+    ("uae", [
+        (all_of(eq("uae_related", "yes"), eq("uae_sentiment", "negative")), -100, "Negative portrayal of UAE"),
+        (eq("uae_related", "yes"), 20, "UAE related ({uae_sentiment_label})"),
+        (always, 0, "Not UAE-related → Manual review required"),
+    ]),
+    ("event", [
+        (eq("event_state", "past"), -100, "Past event"),
+        (eq("event_state", "upcoming"), 15, "Upcoming/live event"),
+        (eq("event_state", "invalid"), 0, "Invalid event time format"),
+        (eq("event_state", "missing"), -10, "Event flagged but time missing"),
+    ]),
+    ("narration", [
+        (eq("clarity", "clear"), 10, "Clear & moderate narration"),
+        (always, -10, "Unclear/missing narration"),
+    ]),
+    ("volume", [
+        (isin("volume", ["narration-dominant", "balanced"]), 10, "Good volume balance"),
+        (eq("volume", "music-dominant"), -5, "Music too loud"),
+    ]),
+    ("visuals", [
+        (contains_any("visuals", GOOD_VISUALS), 10, "Good visuals"),
+        (always, -10, "Poor/unclear visuals"),
+    ]),
+    ("subtitles", [
+        (truthy("subtitles"), 5, "Subtitles present"),
+    ]),
+    ("property_details", [
+        (truthy("rooms_shown"), 20, "Property details shown"),
+    ]),
+    ("technical", [
+        (isin("glitches", ["none", "no", "clean"]), 20, "Clean technical quality"),
+        (eq("glitches", "minor"), -10, "Minor technical glitches"),
+        (isin("glitches", ["severe", "yes"]), -20, "Severe technical glitches"),
+    ]),
+]
+
+ACCEPT_THRESHOLD = 70
+REJECT_THRESHOLD = 0
+# An ACCEPT without this is downgraded to MANUAL_REVIEW
+ACCEPT_REQUIRES = eq("uae_related", "yes")
+
+def rules_version(gates=GATES, score_groups=SCORE_GROUPS):
+    # Hash of a canonical description of the rules: editing a condition,
+    # points, reason, threshold or normalizer changes it, unrelated edits to
+    # this module don't
+    rules = {
+        "columns": [_spec(normalizer) for normalizer in COLUMNS],
+        "normalizers": NORMALIZERS_VERSION,
+        "gates": [[_spec(condition), decision, template] for condition, decision, template in gates],
+        "score_groups": [
+            [name, [[_spec(condition), points, template] for condition, points, template in rules]]
+            for name, rules in score_groups
+        ],
+        "thresholds": [ACCEPT_THRESHOLD, REJECT_THRESHOLD, _spec(ACCEPT_REQUIRES)],
+    }
+    return hashlib.sha256(json.dumps(rules, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+# Recorded with every stored score so utils/rescore.py can tell which rows
+# were scored under older rules
+RULES_VERSION = rules_version()
+
+# ---------------- EVALUATOR ----------------
+def _reason(points, reason):
+    return f"{reason} ({'+' if points > 0 else ''}{points})"
+
+def _template_fields(template):
+    return [name for _, name, _, _ in string.Formatter().parse(template) if name]
+
+def normalize_columns(records, now=None):
+    now = now or datetime.datetime.utcnow()
+    cols = {}
+    for normalizer in COLUMNS:
+        cols.update(normalizer(records, now))
+    return cols
+
+def _render(template, cols, rows):
+    # Reason text for the given rows; templates only pull the columns they use
+    fields = _template_fields(template)
+    return [template.format(**{f: cols[f][r] for f in fields}) for r in rows]
+
+def compile_rules(gates=GATES, score_groups=SCORE_GROUPS):
+    def evaluate(records, now=None):
+        records = list(records)
+        n = len(records)
+        if n == 0:
+            return []
+        cols = normalize_columns(records, now)
+
+        # Gates: the first one that fires decides the row
+        gate_idx = np.full(n, -1)
+        for i, (condition, _, _) in enumerate(gates):
+            gate_idx[(gate_idx == -1) & condition(cols)] = i
+        scored = gate_idx == -1
+
+        gate_reasons = np.full(n, None, dtype=object)
+        for i, (_, _, template) in enumerate(gates):
+            rows = np.flatnonzero(gate_idx == i)
+            if len(rows):
+                gate_reasons[rows] = _render(template, cols, rows) if _template_fields(template) else template
+
+        # Score groups: first matching rule per group adds its points and reason
+        score = np.zeros(n, dtype=np.int64)
+        reason_columns = []
+        for _, rules in score_groups:
+            reasons = np.full(n, None, dtype=object)
+            pending = scored.copy()
+            for condition, points, template in rules:
+                hit = pending & condition(cols)
+                pending &= ~hit
+                score[hit] += points
+                if not _template_fields(template):
+                    reasons[hit] = _reason(points, template)
+                else:
+                    rows = np.flatnonzero(hit)
+                    if len(rows):
+                        reasons[rows] = [_reason(points, text) for text in _render(template, cols, rows)]
+            reason_columns.append(reasons.tolist())
+
+        decision = np.where(score >= ACCEPT_THRESHOLD, "ACCEPT",
+                            np.where(score <= REJECT_THRESHOLD, "REJECT", "MANUAL_REVIEW")).astype(object)
+        # Force manual review if UAE is not mentioned at all
+        decision[(decision == "ACCEPT") & ~ACCEPT_REQUIRES(cols)] = "MANUAL_REVIEW"
+
+        gate_decisions = [gates[i][1] if i >= 0 else None for i in gate_idx.tolist()]
+        results = []
+        for row_score, row_decision, gate_decision, gate_reason, row_reasons in zip(
+            score.tolist(), decision.tolist(), gate_decisions, gate_reasons.tolist(), zip(*reason_columns)
+        ):
+            if gate_decision is not None:
+                results.append({
+                    "qc_score": 'N/A',
+                    "qc_decision": gate_decision,
+                    "qc_reasons": [gate_reason]
+                })
+            else:
+                results.append({
+                    "qc_score": row_score,
+                    "qc_decision": row_decision,
+                    "qc_reasons": list(filter(None, row_reasons))
+                })
+        return results
+    return evaluate
+
+score_records = compile_rules()
+qc_score_batch = timed("qc_score_batch")(score_records)
+
+def expires_at(records, now=None):
+    # When each record's score goes stale on its own: an upcoming event becomes
+    # a past one (+15 turns into -100) once its start time passes.
+    now = now or datetime.datetime.utcnow()
+    state = _event(records, now)["event_state"]
+    expiry = [None] * len(records)
+    for r in np.flatnonzero(state.lookup(lambda v: v == "upcoming")):
+        expiry[r] = datetime.datetime.fromisoformat(records[r]["if_event_yes_time"])
+    return expiry
+
+# Columns written by the scorer itself; they are not inputs to the rules
+QC_OUTPUT_COLUMNS = ["qc_score", "qc_decision", "qc_reasons", "qc_rules_version", "qc_inputs_hash", "qc_expires_at"]
+
+# video_metadata rows next to the full extracted metadata kept in
+# video_embeddings.metadata. The typed columns lose the raw "Yes"/"No"
+# strings the rules read, so the JSON wins and typed columns only fill in
+# fields it lacks (see stored_record).
+STORED_RECORDS_SQL = """
+    SELECT to_jsonb(m), e.metadata{extra}
+    FROM video_metadata m
+    LEFT JOIN LATERAL (
+        SELECT metadata FROM video_embeddings e
+        WHERE e.video_name = m.video_name
+        ORDER BY e.id DESC
+        LIMIT 1
+    ) e ON TRUE
+    {where_sql}
+"""
+
+def stored_record(typed, raw):
+    return {**typed, **(raw or {})}
+
+def score_stored_videos(where_sql="", params=()):
+    # Re-scores stored videos without re-uploading them
+    from utils.database import get_connection
+
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(STORED_RECORDS_SQL.format(extra="", where_sql=where_sql), params)
+            rows = cur.fetchall()
+    records = [stored_record(typed, raw) for typed, raw in rows]
+    return [(record["video_name"], result) for record, result in zip(records, qc_score_batch(records))]
@@ -0,0 +1,119 @@
+import argparse
+import datetime
+import time
+from psycopg2.extras import execute_values
+from utils.database import get_connection, _column_converter, _metadata_writer
+from utils.qc_batch import (
+    RULES_VERSION, QC_OUTPUT_COLUMNS, STORED_RECORDS_SQL,
+    stored_record, qc_score_batch, expires_at
+)
+from utils.metrics import timed
+from utils.config import RESCORE_CHUNK_SIZE
+
+# Headless re-scoring of the stored archive after a rules change. Needs the
+# columns from `python -m utils.schema create-rescore`, including the `id`
+# columns on video_metadata and video_embeddings that updates are keyed on
+# and the newest embedding row is picked by. Rows that were never re-scored
+# (qc_rules_version IS NULL) are picked up on the first run.
+
+# Fingerprint of everything the rules can read, computed server-side so
+# unchanged rows never leave the database
+INPUTS_HASH_SQL = (
+    "md5((to_jsonb(m) - %(outputs)s::text[])::text"
+    " || coalesce((e.metadata::jsonb - %(outputs)s::text[])::text, ''))"
+)
+
+# "changed": new rules version, edited inputs, or a time-dependent score
+#            that has gone stale (an upcoming event that is now past)
+# "expired": only the time-dependent rows; cheap enough to run hourly
+# "all":     everything, regardless of tracking columns
+MODES = {
+    "changed": f"""WHERE m.qc_rules_version IS DISTINCT FROM %(version)s
+                   OR m.qc_inputs_hash IS DISTINCT FROM {INPUTS_HASH_SQL}
+                   OR m.qc_expires_at <= %(now)s""",
+    "expired": "WHERE m.qc_expires_at <= %(now)s",
+    "all": "",
+}
+
+UPDATE_SQL = """
+    UPDATE video_metadata AS m SET
+        qc_score = v.qc_score,
+        qc_decision = v.qc_decision,
+        qc_reasons = v.qc_reasons,
+        qc_rules_version = v.qc_rules_version,
+        qc_inputs_hash = v.qc_inputs_hash,
+        qc_expires_at = v.qc_expires_at
+    FROM (VALUES %s) AS v(id, qc_score, qc_decision, qc_reasons,
+                          qc_rules_version, qc_inputs_hash, qc_expires_at)
+    WHERE m.id = v.id
+"""
+UPDATE_TEMPLATE = "(%s, %s::{score_type}, %s, %s, %s, %s, %s::timestamp)"
+
+def _score_column():
+    # qc_score converted the way save_metadata_pg writes it (gated rows have
+    # no number), and the type to cast it to so all-NULL chunks still assign
+    category, type_name = _metadata_writer()["types"].get("qc_score", (None, None))
+    convert = _column_converter("qc_score", category, type_name)
+    return (lambda score: convert(None, {"qc_score": score})), "numeric" if category == "N" else "text"
+
+def _update_values(rows, now, convert_score=str):
+    records = [stored_record(typed, raw) for typed, raw, _ in rows]
+    values, changed = [], 0
+    for (typed, _, inputs_hash), result, expiry in zip(rows, qc_score_batch(records, now), expires_at(records, now)):
+        if typed.get("qc_decision") != result["qc_decision"]:
+            changed += 1
+        values.append((
+            typed["id"], convert_score(result["qc_score"]), result["qc_decision"],
+            "; ".join(result["qc_reasons"]), RULES_VERSION, inputs_hash, expiry,
+        ))
+    return values, changed
+
+def rescore(mode="changed", chunk_size=RESCORE_CHUNK_SIZE, dry_run=False):
+    if mode not in MODES:
+        raise ValueError(f"Unknown re-score mode: {mode!r} (expected one of {', '.join(MODES)})")
+    now = datetime.datetime.utcnow()
+    params = {"outputs": QC_OUTPUT_COLUMNS, "version": RULES_VERSION, "now": now}
+    query = STORED_RECORDS_SQL.format(extra=f", {INPUTS_HASH_SQL}", where_sql=MODES[mode])
+    convert_score, score_type = _score_column()
+    template = UPDATE_TEMPLATE.format(score_type=score_type)
+    stats = {"rows": 0, "decisions_changed": 0, "chunks": 0}
+    start = time.perf_counter()
+
+    # Rows stream through a named (server-side) cursor on one connection while
+    # each chunk's UPDATE commits on another: memory stays at one chunk and an
+    # interrupted run keeps the work it already wrote.
+    with get_connection() as read_conn, get_connection() as write_conn:
+        with read_conn.cursor(name="qc_rescore") as cur:
+            cur.itersize = chunk_size
+            cur.execute(query, params)
+            while True:
+                rows = cur.fetchmany(chunk_size)
+                if not rows:
+                    break
+                values, changed = _update_values(rows, now, convert_score)
+                if not dry_run:
+                    with timed("db_rescore_update"), write_conn.cursor() as wcur:
+                        execute_values(wcur, UPDATE_SQL, values, template=template, page_size=chunk_size)
+                    write_conn.commit()
+                stats["rows"] += len(rows)
+                stats["decisions_changed"] += changed
+                stats["chunks"] += 1
+                print(f"… {stats['rows']} rows re-scored ({stats['decisions_changed']} decisions changed)")
+
+    stats["seconds"] = time.perf_counter() - start
+    stats["rows_per_second"] = stats["rows"] / stats["seconds"] if stats["seconds"] else 0.0
+    return stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-score stored videos against the current QC rules")
+    parser.add_argument("--mode", choices=list(MODES), default="changed")
+    parser.add_argument("--chunk-size", type=int, default=RESCORE_CHUNK_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="score but do not write anything back")
+    args = parser.parse_args()
+
+    stats = rescore(args.mode, args.chunk_size, args.dry_run)
+    print(
+        f"✅ Re-scored {stats['rows']} rows in {stats['seconds']:.1f}s "
+        f"({stats['rows_per_second']:.0f} rows/s, {stats['decisions_changed']} decisions changed, "
+        f"rules {RULES_VERSION}){' [dry run]' if args.dry_run else ''}"
+    )
@@ -0,0 +1,296 @@
+import argparse
+import psycopg2
+from utils.config import (
+    PG_VECTOR_DIMS, PG_VECTOR_METRIC, PG_ANN_INDEX,
+    HNSW_M, HNSW_EF_CONSTRUCTION, IVFFLAT_LISTS
+)
+
+ANN_INDEX_NAME = "video_embeddings_embedding_ann_idx"
+
+# Extra named vectors per video in video_embedding_parts, next to the summary
+# vector in video_embeddings (texts are built in utils/embedding.py)
+PART_KINDS = ("tags", "transcript")
+PART_INDEX_NAMES = tuple(f"video_embedding_parts_{kind}_ann_idx" for kind in PART_KINDS)
+
+# pgvector can only index `vector` columns up to 2000 dimensions; beyond that
+# (gemini-embedding-001 returns 3072) the index is built over a halfvec cast
+# and queries have to use the same expression to hit it.
+MAX_VECTOR_INDEX_DIMS = 2000
+
+OPERATORS = {"l2": "<->", "cosine": "<=>", "ip": "<#>"}
+OPCLASSES = {"l2": "l2_ops", "cosine": "cosine_ops", "ip": "ip_ops"}
+
+# Search-time recall/latency knob: higher settings visit more of the graph
+# (hnsw.ef_search) or more lists (ivfflat.probes).
+RECALL_PRESETS = {
+    "fast": {"hnsw.ef_search": 20, "ivfflat.probes": 1},
+    "balanced": {"hnsw.ef_search": 40, "ivfflat.probes": 10},
+    "accurate": {"hnsw.ef_search": 200, "ivfflat.probes": 40},
+}
+
+def _uses_halfvec(dims=PG_VECTOR_DIMS):
+    return dims > MAX_VECTOR_INDEX_DIMS
+
+def indexed_expression(column="embedding", dims=PG_VECTOR_DIMS):
+    if _uses_halfvec(dims):
+        return f"({column}::halfvec({dims}))"
+    return column
+
+def distance_sql(column="embedding", placeholder="%s", metric=PG_VECTOR_METRIC, dims=PG_VECTOR_DIMS):
+    op = OPERATORS[metric]
+    if _uses_halfvec(dims):
+        return f"{column}::halfvec({dims}) {op} {placeholder}::halfvec({dims})"
+    return f"{column} {op} {placeholder}"
+
+# Access method of each ANN index, read from the catalog once per process:
+# the settings must match the index that was actually built, whatever
+# PG_ANN_INDEX says now. Missing indexes are cached too (as None).
+_index_methods = {}
+
+def index_methods(cur, names=(ANN_INDEX_NAME,)):
+    missing = [name for name in names if name not in _index_methods]
+    if missing:
+        cur.execute("""
+            SELECT n.name, am.amname
+            FROM unnest(%s::text[]) AS n(name)
+            LEFT JOIN pg_class c ON c.oid = to_regclass(n.name)
+            LEFT JOIN pg_am am ON am.oid = c.relam
+        """, (missing,))
+        _index_methods.update(cur.fetchall())
+    return {_index_methods.get(name) for name in names} & {"hnsw", "ivfflat"}
+
+def forget_index_methods():
+    _index_methods.clear()
+
+def apply_search_settings(cur, recall="balanced", indexes=(ANN_INDEX_NAME,), filtered=False):
+    if recall not in RECALL_PRESETS:
+        raise ValueError(f"Unknown recall setting: {recall!r} (expected one of {', '.join(RECALL_PRESETS)})")
+    # Without any ANN index the scan is exact; PG_ANN_INDEX only covers the
+    # window before the first one is built
+    for method in sorted(index_methods(cur, indexes) or {PG_ANN_INDEX}):
+        setting = "hnsw.ef_search" if method == "hnsw" else "ivfflat.probes"
+        # SET LOCAL only lasts until the end of the current transaction
+        cur.execute(f"SET LOCAL {setting} = {int(RECALL_PRESETS[recall][setting])}")
+        if filtered:
+            # Without iterative scans the index hands back ef_search/probes worth of
+            # candidates and the filters can leave fewer than top_k of them.
+            # pgvector < 0.8 doesn't know the setting, so failure is not fatal.
+            cur.execute("SAVEPOINT iterative_scan")
+            try:
+                cur.execute(f"SET LOCAL {method}.iterative_scan = relaxed_order")
+                cur.execute("RELEASE SAVEPOINT iterative_scan")
+            except psycopg2.Error:
+                cur.execute("ROLLBACK TO SAVEPOINT iterative_scan")
+
+def _index_ddl(name, method, metric, dims, concurrently=True, table="video_embeddings", where=None):
+    if method not in ("hnsw", "ivfflat"):
+        raise ValueError(f"Unknown ANN index method: {method!r}")
+    if metric not in OPERATORS:
+        raise ValueError(f"Unknown distance metric: {metric!r}")
+    if metric != PG_VECTOR_METRIC:
+        # distance_sql queries with PG_VECTOR_METRIC's operator, which an index
+        # built for another metric can't serve
+        raise ValueError(f"Index metric {metric!r} doesn't match PG_VECTOR_METRIC={PG_VECTOR_METRIC!r}; "
+                         "change PG_VECTOR_METRIC instead")
+    opclass = ("halfvec_" if _uses_halfvec(dims) else "vector_") + OPCLASSES[metric]
+    if method == "hnsw":
+        params = f"m = {int(HNSW_M)}, ef_construction = {int(HNSW_EF_CONSTRUCTION)}"
+    else:
+        params = f"lists = {int(IVFFLAT_LISTS)}"
+    return (
+        f"CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}IF NOT EXISTS {name} "
+        f"ON {table} USING {method} ({indexed_expression('embedding', dims)} {opclass}) "
+        f"WITH ({params})" + (f" WHERE {where}" if where else "")
+    )
+
+def _run_autocommit(*statements):
+    # CREATE/DROP/REINDEX ... CONCURRENTLY refuse to run inside a transaction
+    from utils.database import get_connection
+
+    with get_connection() as conn:
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cur:
+                for statement in statements:
+                    cur.execute(statement)
+        finally:
+            conn.autocommit = False
+
+def create_ann_index(method=PG_ANN_INDEX, metric=PG_VECTOR_METRIC, dims=PG_VECTOR_DIMS, concurrently=True):
+    _run_autocommit(
+        "CREATE EXTENSION IF NOT EXISTS vector",
+        _index_ddl(ANN_INDEX_NAME, method, metric, dims, concurrently),
+    )
+    forget_index_methods()
+    print(f"✅ ANN index ready: {ANN_INDEX_NAME} ({method}, {metric})")
+
+def reindex_ann_index():
+    # Rebuilds in the background; searches keep using the old copy until the swap
+    _run_autocommit(f"REINDEX INDEX CONCURRENTLY {ANN_INDEX_NAME}")
+    print(f"✅ Reindexed: {ANN_INDEX_NAME}")
+
+def rebuild_ann_index(method=PG_ANN_INDEX, metric=PG_VECTOR_METRIC, dims=PG_VECTOR_DIMS):
+    # Build the replacement next to the live index, then swap names, so
+    # search stays online while the index type or parameters change. A run
+    # that died mid-swap is undone first: an _old index without a live one is
+    # renamed back, any other leftover is dropped.
+    new_name = f"{ANN_INDEX_NAME}_new"
+    old_name = f"{ANN_INDEX_NAME}_old"
+    _run_autocommit(
+        f"""
+        DO $$ BEGIN
+            IF to_regclass('{ANN_INDEX_NAME}') IS NULL AND to_regclass('{old_name}') IS NOT NULL THEN
+                ALTER INDEX {old_name} RENAME TO {ANN_INDEX_NAME};
+            END IF;
+        END $$
+        """,
+        f"DROP INDEX CONCURRENTLY IF EXISTS {old_name}",
+        f"DROP INDEX CONCURRENTLY IF EXISTS {new_name}",
+        _index_ddl(new_name, method, metric, dims, concurrently=True),
+        f"ALTER INDEX IF EXISTS {ANN_INDEX_NAME} RENAME TO {old_name}",
+        f"ALTER INDEX {new_name} RENAME TO {ANN_INDEX_NAME}",
+        f"DROP INDEX CONCURRENTLY IF EXISTS {old_name}",
+    )
+    forget_index_methods()
+    print(f"✅ ANN index rebuilt: {ANN_INDEX_NAME} ({method}, {metric})")
+
+def create_dedup_table():
+    # Perceptual-hash signatures used by utils/dedup.py, one row per video
+    _run_autocommit("""
+        CREATE TABLE IF NOT EXISTS video_phashes (
+            video_name TEXT PRIMARY KEY,
+            phash BIGINT NOT NULL,
+            frame_hashes BIGINT[] NOT NULL DEFAULT '{}',
+            created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+    """, "CREATE INDEX IF NOT EXISTS video_phashes_created_at_idx ON video_phashes (created_at)")
+    print("✅ Table ready: video_phashes")
+
+def create_parts_table(method=PG_ANN_INDEX, metric=PG_VECTOR_METRIC, dims=PG_VECTOR_DIMS):
+    # One partial ANN index per kind, so each source of a fused search is its
+    # own index scan
+    _run_autocommit(
+        f"""
+        CREATE TABLE IF NOT EXISTS video_embedding_parts (
+            video_name TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            embedding vector({int(dims)}) NOT NULL,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            PRIMARY KEY (video_name, kind)
+        )
+        """,
+        *[
+            _index_ddl(name, method, metric, dims, table="video_embedding_parts", where=f"kind = '{kind}'")
+            for kind, name in zip(PART_KINDS, PART_INDEX_NAMES)
+        ],
+    )
+    forget_index_methods()
+    print(f"✅ Table ready: video_embedding_parts ({', '.join(PART_KINDS)})")
+
+def create_jobs_table():
+    # Work queue for utils/jobs.py; `stage` moves uploaded → analyzed →
+    # scored → embedded → stored, or ends in duplicate/failed
+    _run_autocommit(
+        """
+        CREATE TABLE IF NOT EXISTS video_jobs (
+            id BIGSERIAL PRIMARY KEY,
+            batch_id TEXT,
+            video_name TEXT NOT NULL,
+            video_path TEXT NOT NULL,
+            stage TEXT NOT NULL DEFAULT 'uploaded',
+            metadata JSONB,
+            embeddings JSONB,
+            attempts INT NOT NULL DEFAULT 0,
+            max_attempts INT NOT NULL DEFAULT 3,
+            run_after TIMESTAMPTZ NOT NULL DEFAULT now(),
+            leased_by TEXT,
+            lease_expires_at TIMESTAMPTZ,
+            last_error TEXT,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+        """,
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS video_jobs_ready_idx ON video_jobs (run_after, id) "
+        "WHERE stage NOT IN ('stored', 'duplicate', 'failed')",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS video_jobs_batch_idx ON video_jobs (batch_id)",
+    )
+    print("✅ Table ready: video_jobs")
+
+def create_id_columns():
+    # Row ids the re-scorer keys its updates on (video_name isn't unique) and
+    # the memory index syncs by (video_embeddings is append-only, so new rows
+    # are the ones above the last id seen). Adding them rewrites each table once.
+    _run_autocommit(
+        "ALTER TABLE video_metadata ADD COLUMN IF NOT EXISTS id BIGSERIAL",
+        "ALTER TABLE video_embeddings ADD COLUMN IF NOT EXISTS id BIGSERIAL",
+        "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS video_metadata_id_idx ON video_metadata (id)",
+        "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS video_embeddings_id_idx ON video_embeddings (id)",
+    )
+    print("✅ id columns ready on video_metadata and video_embeddings")
+
+def create_rescore_columns():
+    # Change tracking for utils/rescore.py: which rules and which inputs each
+    # stored score came from, and when a time-dependent score goes stale
+    create_id_columns()
+    _run_autocommit(
+        """
+        ALTER TABLE video_metadata
+            ADD COLUMN IF NOT EXISTS qc_rules_version TEXT,
+            ADD COLUMN IF NOT EXISTS qc_inputs_hash TEXT,
+            ADD COLUMN IF NOT EXISTS qc_expires_at TIMESTAMP
+        """,
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS video_metadata_qc_expires_at_idx "
+        "ON video_metadata (qc_expires_at) WHERE qc_expires_at IS NOT NULL",
+    )
+    from utils.database import invalidate_metadata_writer
+    invalidate_metadata_writer()
+    print("✅ Re-score columns ready on video_metadata")
+
+# Indexes behind the structured filters of search_similar_videos: the join key
+# on both sides, btree for the scalar filters, GIN for array containment/overlap
+FILTER_INDEXES = {
+    "video_metadata_video_name_idx": "video_metadata (video_name)",
+    "video_embeddings_video_name_idx": "video_embeddings (video_name)",
+    "video_metadata_qc_decision_created_at_idx": "video_metadata (qc_decision, created_at)",
+    "video_metadata_created_at_idx": "video_metadata (created_at)",
+    "video_metadata_tags_gin_idx": "video_metadata USING gin (tags)",
+    "video_metadata_rooms_shown_gin_idx": "video_metadata USING gin (rooms_shown)",
+    "video_metadata_activities_shown_gin_idx": "video_metadata USING gin (activities_shown)",
+    "video_metadata_subtitles_languages_gin_idx": "video_metadata USING gin (subtitles_languages)",
+}
+
+def create_filter_indexes():
+    _run_autocommit(*[
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {target}"
+        for name, target in FILTER_INDEXES.items()
+    ])
+    print(f"✅ Filter indexes ready ({len(FILTER_INDEXES)})")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the ANN index and supporting tables")
+    parser.add_argument("action", choices=["create", "reindex", "rebuild", "create-dedup", "create-rescore", "create-ids", "create-filters", "create-parts", "create-jobs"])
+    parser.add_argument("--method", choices=["hnsw", "ivfflat"], default=PG_ANN_INDEX)
+    parser.add_argument("--metric", choices=sorted(OPERATORS), default=PG_VECTOR_METRIC)
+    args = parser.parse_args()
+    if args.metric != PG_VECTOR_METRIC:
+        parser.error(f"--metric {args.metric} differs from PG_VECTOR_METRIC={PG_VECTOR_METRIC}; "
+                     "searches would not use the index")
+
+    if args.action == "create":
+        create_ann_index(args.method, args.metric)
+    elif args.action == "create-dedup":
+        create_dedup_table()
+    elif args.action == "create-rescore":
+        create_rescore_columns()
+    elif args.action == "create-ids":
+        create_id_columns()
+    elif args.action == "create-filters":
+        create_filter_indexes()
+    elif args.action == "create-parts":
+        create_parts_table(args.method, args.metric)
+    elif args.action == "create-jobs":
+        create_jobs_table()
+    elif args.action == "reindex":
+        reindex_ann_index()
+    else:
+        rebuild_ann_index(args.method, args.metric)
@@ -0,0 +1,49 @@
+import numpy as np
+import psycopg2.extensions as ext
+
+# psycopg2 only speaks the text protocol, so vectors still travel as
+# '[x,y,...]' literals. The adapter formats the whole array with a single
+# %-format call (9 significant digits round-trips float32 exactly) instead of
+# one str() per element, and the typecaster parses results with NumPy's C
+# parser straight into a float32 array.
+
+_format_strings = {}
+_registered = False
+
+def _vector_format(dims: int):
+    fmt = _format_strings.get(dims)
+    if fmt is None:
+        fmt = _format_strings[dims] = "'[" + ",".join(["%.9g"] * dims) + "]'::vector"
+    return fmt
+
+def vector_literal(embedding) -> str:
+    values = np.asarray(embedding, dtype=np.float32).ravel()
+    return _vector_format(values.size) % tuple(values.tolist())
+
+def _adapt_ndarray(embedding):
+    # Registered for every ndarray, so anything but a single vector is refused
+    # rather than flattened into one long literal
+    if embedding.ndim != 1:
+        raise ValueError(f"Only 1-D arrays are sent as vectors, got shape {embedding.shape}; "
+                         "pass rows one by one or convert to a list")
+    return ext.AsIs(vector_literal(embedding))
+
+def _cast_vector(value, cur):
+    if value is None:
+        return None
+    return np.fromstring(value[1:-1], sep=",", dtype=np.float32)
+
+def register_vector(conn):
+    global _registered
+    if _registered:
+        return
+    with conn.cursor() as cur:
+        cur.execute("SELECT oid FROM pg_type WHERE typname = 'vector'")
+        row = cur.fetchone()
+    conn.rollback()
+    if row is None:
+        raise RuntimeError("pgvector extension is not installed in this database")
+    ext.register_type(ext.new_type((row[0],), "VECTOR", _cast_vector))
+    _registered = True
+
+ext.register_adapter(np.ndarray, _adapt_ndarray)
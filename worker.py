@@ -0,0 +1,83 @@
+# Drains the video_jobs queue (see utils/jobs.py). Run as many of these as
+# you like, on as many machines as share the database and JOB_STORAGE_DIR:
+#
+#   python worker.py --concurrency 4
+import argparse
+import threading
+import time
+from utils.jobs import LeaseLost, claim_jobs, process_job, release, renew_lease, queue_stats, worker_id
+from utils.metrics import start_metrics_server
+from utils.config import ANALYSIS_WORKERS, JOB_LEASE_SECONDS, JOB_POLL_INTERVAL, METRICS_PORT
+
+_stopping = threading.Event()
+
+def _heartbeat(job, worker, done):
+    # Keeps the lease alive while a stage runs longer than JOB_LEASE_SECONDS
+    while not done.wait(JOB_LEASE_SECONDS / 3):
+        try:
+            if not renew_lease(job, worker):
+                return
+        except Exception as e:
+            print(f"⚠️ Could not renew lease on job {job['id']}: {e}")
+
+def run_worker(poll_interval=JOB_POLL_INTERVAL, once=False):
+    worker = worker_id()
+    while not _stopping.is_set():
+        try:
+            jobs = claim_jobs(worker)
+        except Exception as e:
+            print(f"⚠️ Could not claim jobs: {e}")
+            _stopping.wait(poll_interval)
+            continue
+        if not jobs:
+            if once:
+                return
+            _stopping.wait(poll_interval)
+            continue
+        job = jobs[0]
+        if _stopping.is_set():
+            release(job, worker)
+            return
+        start = time.perf_counter()
+        done = threading.Event()
+        threading.Thread(target=_heartbeat, args=(job, worker, done), daemon=True).start()
+        try:
+            stage = process_job(job, worker, _stopping)
+        except LeaseLost as e:
+            print(f"⚠️ {e}; another worker has taken it over")
+            continue
+        except Exception as e:
+            # The lease runs out and the job is retried; this thread moves on
+            print(f"❌ Job {job['id']} ({job['video_name']}) crashed: {e}")
+            continue
+        finally:
+            done.set()
+        icon = "✅" if stage in ("stored", "duplicate") else "⚠️"
+        print(f"{icon} Job {job['id']} ({job['video_name']}) → {stage} in {time.perf_counter() - start:.1f}s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Process queued video analysis jobs")
+    parser.add_argument("--concurrency", type=int, default=ANALYSIS_WORKERS, help="jobs processed in parallel")
+    parser.add_argument("--poll-interval", type=float, default=JOB_POLL_INTERVAL)
+    parser.add_argument("--once", action="store_true", help="exit when the queue is empty")
+    args = parser.parse_args()
+
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT)
+    threads = [
+        threading.Thread(target=run_worker, args=(args.poll_interval, args.once), daemon=True)
+        for _ in range(args.concurrency)
+    ]
+    for t in threads:
+        t.start()
+    try:
+        while any(t.is_alive() for t in threads):
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        # Jobs in progress finish their current stage and are handed back, so
+        # another worker picks them up at the next stage
+        print("Stopping workers...")
+        _stopping.set()
+        for t in threads:
+            t.join()
+    print("Queue:", queue_stats())